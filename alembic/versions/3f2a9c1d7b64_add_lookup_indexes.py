@@ -0,0 +1,37 @@
+"""add lookup indexes
+
+Indexes for the lookups of the hot paths (retrieve and list products):
+- products (status, id): the products list filters by status and pages through the IDs.
+- product_variants.product_id, product_media.product_id: variants and media of a product.
+
+product_options.product_id, product_option_items.option_id and users_verifications.user_id are already indexed: they
+lead the unique constraints (product_id, option_name), (option_id, item_name) and (user_id).
+
+Revision ID: 3f2a9c1d7b64
+Revises:
+Create Date: 2026-10-18 10:12:41.503217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7b64'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the tables may have been created by `DatabaseManager.create_database_tables()` with the indexes already
+    op.create_index('ix_products_status_id', 'products', ['status', 'id'], if_not_exists=True)
+    op.create_index('ix_product_variants_product_id', 'product_variants', ['product_id'], if_not_exists=True)
+    op.create_index('ix_product_media_product_id', 'product_media', ['product_id'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_media_product_id', table_name='product_media', if_exists=True)
+    op.drop_index('ix_product_variants_product_id', table_name='product_variants', if_exists=True)
+    op.drop_index('ix_products_status_id', table_name='products', if_exists=True)
@@ -0,0 +1,34 @@
+"""add product documents
+
+The materialized payload of each product (see `settings.PRODUCT_DOCUMENTS`), backfill it after the upgrade with
+`python manage.py rebuild-documents`.
+
+Revision ID: 8c4e1b7a2d90
+Revises: 3f2a9c1d7b64
+Create Date: 2026-10-18 14:37:05.118342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4e1b7a2d90'
+down_revision: Union[str, None] = '3f2a9c1d7b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'product_documents',
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('document', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now())
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('product_documents')
@@ -0,0 +1,56 @@
+"""add product search
+
+The full-text index of the products (see `apps.products.search`), backfilled from the existing products: an FTS5
+virtual table on sqlite, a tsvector column with a GIN index on postgres.
+
+Revision ID: c5d2e8f41a73
+Revises: 8c4e1b7a2d90
+Create Date: 2026-10-18 16:02:47.390125
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d2e8f41a73'
+down_revision: Union[str, None] = '8c4e1b7a2d90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ITEMS = (
+    "SELECT {}(product_option_items.item_name, ' ') FROM product_option_items JOIN product_options "
+    "ON product_options.id = product_option_items.option_id WHERE product_options.product_id = products.id"
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE TABLE IF NOT EXISTS product_search ("
+            "product_id INTEGER PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE, document TSVECTOR NOT NULL)"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_product_search_document ON product_search USING GIN (document)")
+        op.execute("DELETE FROM product_search")
+        op.execute(
+            "INSERT INTO product_search (product_id, document) SELECT products.id, "
+            "setweight(to_tsvector('simple', products.product_name), 'A') || "
+            f"setweight(to_tsvector('simple', coalesce(({ITEMS.format('string_agg')}), '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(products.description, '')), 'C') FROM products"
+        )
+    else:
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+            "product_name, description, items, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        op.execute("DELETE FROM product_search")
+        op.execute(
+            "INSERT INTO product_search (rowid, product_name, description, items) "
+            "SELECT products.id, products.product_name, coalesce(products.description, ''), "
+            f"coalesce(({ITEMS.format('group_concat')}), '') FROM products"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS product_search")
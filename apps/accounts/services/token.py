@@ -100,15 +100,15 @@ class TokenService:
 
         # --- get user ---
         # TODO move user data to token and dont fetch them from database
-        user = UserManager.get_user(user_id)
+        user = await UserManager.aget_user(user_id)
         if user is None:
             raise cls.credentials_exception
 
         UserManager.is_active(user)
 
         # --- validate access token ---
-        active_access_token = UserVerification.filter(UserVerification.user_id == user_id).first().active_access_token
-        if token != active_access_token:
+        verifications = await UserVerification.afilter(UserVerification.user_id == user_id)
+        if not verifications or token != verifications[0].active_access_token:
             raise cls.credentials_exception
 
         UserManager.is_active(user)
@@ -52,6 +52,18 @@ class UserManager:
 
         return user
 
+    @staticmethod
+    async def aget_user(user_id: int | None = None, email: str = None) -> User | None:
+        """
+        Awaitable version of `get_user()`.
+        """
+        if user_id:
+            return await User.aget(user_id)
+        elif email:
+            users = await User.afilter(User.email == email)
+            return users[0] if users else None
+        return None
+
     @staticmethod
     def get_user_or_404(user_id: int | None = None, email: str = None):
         user: User | None = None
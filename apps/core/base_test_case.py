@@ -1,3 +1,4 @@
+import re
 from datetime import datetime
 
 from apps.core.date_time import DateTime
@@ -16,3 +17,12 @@ class BaseTestCase:
     @staticmethod
     def convert_datetime_to_string(date):
         return DateTime.string(date)
+
+    @staticmethod
+    def assert_max_queries(response, max_queries: int):
+        """
+        Assert the request ran at most `max_queries` queries, as reported in its `Server-Timing` header.
+        """
+
+        queries = int(re.search(r'desc="(\d+) quer', response.headers['server-timing']).group(1))
+        assert queries <= max_queries, f"{queries} queries executed, expected at most {max_queries}"
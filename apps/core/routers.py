@@ -0,0 +1,41 @@
+from fastapi import APIRouter, status, Depends
+
+from apps.accounts.services.permissions import Permission
+from config.cache import CacheManager
+from config.database import DatabaseManager
+
+router = APIRouter(
+    prefix='/monitoring'
+)
+
+
+# --------------------------
+# --- Monitoring Routers ---
+# --------------------------
+
+
+@router.get(
+    '/database/pool',
+    status_code=status.HTTP_200_OK,
+    summary='Database connection pool statistics',
+    description="""Statistics of each database engine's connection pool: checked-out and overflow connections,
+ timeouts and a histogram of the time spent waiting for a connection.
+
+The numbers are per process, every uvicorn worker has a pool of its own.""",
+    tags=['Monitoring'],
+    dependencies=[Depends(Permission.is_admin)]
+)
+async def database_pool():
+    return DatabaseManager.pool_stats()
+
+
+@router.get(
+    '/cache',
+    status_code=status.HTTP_200_OK,
+    summary='Read-through cache statistics',
+    description="""Hits, misses, evictions, expirations and invalidations of the product cache, per process.""",
+    tags=['Monitoring'],
+    dependencies=[Depends(Permission.is_admin)]
+)
+async def cache():
+    return CacheManager.stats()
@@ -0,0 +1,39 @@
+import hashlib
+import json
+
+from fastapi import Request
+
+
+class ConditionalRequest:
+    """
+    The validator (ETag) of a representation, and the evaluation of the If-None-Match header of a GET against it, so
+    unchanged resources are answered with a bodiless 304.
+
+    The ETag is a strong one: a hash of the serialized body, so it's the same on every worker process and it changes
+    with any change of the body, including a deleted nested row. There is no Last-Modified: the timestamps of the body
+    can't tell a deletion, and the option items have none.
+    """
+
+    @staticmethod
+    def validators(body) -> dict:
+        serialized = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+        return {"etag": f'"{hashlib.sha256(serialized.encode()).hexdigest()[:32]}"'}
+
+    @staticmethod
+    def is_not_modified(request: Request, etag: str) -> bool:
+        """
+        Whether the client's copy is still fresh.
+        """
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # weak comparison, as required for If-None-Match
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags
+
+    @staticmethod
+    def headers(etag: str) -> dict:
+        return {"ETag": etag}
@@ -0,0 +1,25 @@
+import base64
+import binascii
+
+from fastapi import HTTPException, status
+
+
+class Cursor:
+    """
+    Opaque cursors for keyset pagination.
+
+    A cursor encodes the sort key of the last row of a page (e.g. the product ID), the next page starts right after
+    it: `WHERE id < :last_id ORDER BY id DESC LIMIT :limit`. Unlike OFFSET, the database seeks to the position in the
+    index, so deep pages cost the same as the first one, and rows inserted meanwhile don't shift the pages.
+    """
+
+    @staticmethod
+    def encode(last_id: int) -> str:
+        return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode(cursor: str) -> int:
+        try:
+            return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor.")
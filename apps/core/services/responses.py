@@ -0,0 +1,45 @@
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from config import settings
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    A JSON response encoded with orjson. Needs the `orjson` package: pip install orjson
+    """
+
+    def render(self, content) -> bytes:
+        try:
+            import orjson
+        except ImportError as e:
+            raise ImportError("settings.FAST_JSON_RESPONSES needs the `orjson` package: pip install orjson") from e
+        return orjson.dumps(content)
+
+
+class FastResponse:
+    """
+    Opt-in fast path (`settings.FAST_JSON_RESPONSES`) for the bodies built by the services: they are already shaped
+    like the `response_model` of the endpoint, so they are encoded with orjson as they are, instead of being validated
+    against the response model again and encoded with the stdlib json encoder.
+
+    The `response_model` of the endpoint stays declared for the OpenAPI schema, only the validation of the output is
+    skipped: use it for trusted service output only, never for input echoed back.
+
+    Example Usage:
+        @router.get('/{product_id}', response_model=schemas.RetrieveProductOut)
+        async def retrieve_product(product_id: int, response: Response):
+            return FastResponse.json({'product': ProductService.retrieve_product(product_id)}, response)
+    """
+
+    @staticmethod
+    def json(content, response: Response | None = None, status_code: int = 200):
+        """
+        `content` as is when the fast path is disabled (FastAPI validates and encodes it), or an `ORJSONResponse`
+        that carries the headers set on the `response` parameter of the endpoint.
+        """
+
+        if not settings.FAST_JSON_RESPONSES:
+            return content
+        headers = dict(response.headers) if response is not None else None
+        return ORJSONResponse(content, status_code=status_code, headers=headers)
@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
 from config.database import DatabaseManager
+from config.middleware import DatabaseSessionMiddleware
 from config.routers import RouterManager
 from config.settings import MEDIA_DIR
 
@@ -11,6 +12,9 @@ DatabaseManager().create_database_tables()
 # init FastAPI
 app = FastAPI()
 
+# give each request its own database session
+app.add_middleware(DatabaseSessionMiddleware)
+
 # add static-file support, for see images by URL
 app.mount("/media", StaticFiles(directory=MEDIA_DIR), name="media")
 
@@ -0,0 +1,169 @@
+"""
+Streaming export of the whole catalog (the products with their options, variants and media URLs), as NDJSON or CSV,
+optionally gzipped on the fly.
+
+The products are read through a server-side cursor (`yield_per`: a named cursor on postgres, the sqlite cursor is
+lazy already), a partition of `settings.PRODUCT_EXPORT_BATCH_SIZE` products at a time, and the children of each
+partition are fetched with one `IN (...)` query per table. Each partition is encoded and handed to the caller before
+the next one is read, so the memory used is the same whatever the size of the catalog.
+
+The export has a connection of its own (to a read replica when there are some, see `settings.DATABASE_REPLICAS`),
+it doesn't use the session of the request: a StreamingResponse is consumed after the endpoint has returned.
+
+- NDJSON: one product per line, in the `ProductSchema` format.
+- CSV: one row per variant, with the columns of `ProductExport.CSV_COLUMNS`, the media URLs are separated by `|`.
+"""
+import csv
+import io
+import json
+import zlib
+from collections import defaultdict
+
+from sqlalchemy import select
+
+from apps.products.models import Product, ProductOption, ProductOptionItem, ProductVariant, ProductMedia
+from apps.products.services import ProductService
+from config import settings
+from config.database import DatabaseManager
+
+FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class ProductExport:
+    """
+    Example Usage:
+        with open("catalog.ndjson.gz", "wb") as file:
+            for chunk in ProductExport.stream("ndjson", compress=True):
+                file.write(chunk)
+    """
+
+    CSV_COLUMNS = [
+        "product_id", "product_name", "description", "status", "variant_id", "price", "stock",
+        "option1_name", "option1_value", "option2_name", "option2_value", "option3_name", "option3_value", "media"
+    ]
+
+    @staticmethod
+    def engine():
+        return DatabaseManager.replica_engines[0] if DatabaseManager.replica_engines else DatabaseManager.engine
+
+    @classmethod
+    def iter_products(cls, status: str | None = None, batch_size: int | None = None):
+        """
+        Yield the products (dicts in the `ProductSchema` format), a partition of `batch_size` at a time, ordered by
+        ID. `status=None` exports the products of every status.
+        """
+
+        if batch_size is None:
+            batch_size = getattr(settings, "PRODUCT_EXPORT_BATCH_SIZE", 500)
+
+        query = select(Product.__table__).order_by(Product.id)
+        if status is not None:
+            query = query.filter(Product.status == status)
+
+        with cls.engine().connect() as connection:
+            result = connection.execution_options(yield_per=batch_size).execute(query)
+            for products in result.partitions():
+                yield cls.__hydrate(connection, products)
+
+    @staticmethod
+    def __hydrate(connection, products) -> list[dict]:
+        product_ids = [product.id for product in products]
+
+        options = defaultdict(list)
+        option_items = {}
+        for row in connection.execute(
+            select(ProductOption.product_id, ProductOption.id, ProductOption.option_name, ProductOptionItem.id,
+                   ProductOptionItem.item_name)
+            .join(ProductOptionItem, ProductOptionItem.option_id == ProductOption.id)
+            .filter(ProductOption.product_id.in_(product_ids))
+            .order_by(ProductOption.id, ProductOptionItem.id)
+        ):
+            product_id, option_id, option_name, item_id, item_name = row
+            if option_id not in option_items:
+                option_items[option_id] = []
+                options[product_id].append({'options_id': option_id, 'option_name': option_name,
+                                            'items': option_items[option_id]})
+            option_items[option_id].append({'item_id': item_id, 'item_name': item_name})
+
+        variants = defaultdict(list)
+        for variant in connection.execute(
+            select(ProductVariant.__table__).filter(ProductVariant.product_id.in_(product_ids))
+            .order_by(ProductVariant.id)
+        ):
+            variants[variant.product_id].append(ProductService.variant_to_dict(variant))
+
+        media = defaultdict(list)
+        for media_item in connection.execute(
+            select(ProductMedia.__table__).filter(ProductMedia.product_id.in_(product_ids)).order_by(ProductMedia.id)
+        ):
+            media[media_item.product_id].append(ProductService.media_to_dict(media_item))
+
+        return [
+            ProductService.product_to_dict(product, options[product.id] or None, variants[product.id] or None,
+                                           media[product.id] or None)
+            for product in products
+        ]
+
+    # ----------------
+    # --- Encoders ---
+    # ----------------
+
+    @staticmethod
+    def encode_ndjson(products: list[dict]) -> bytes:
+        return "".join(json.dumps(product) + "\n" for product in products).encode()
+
+    @classmethod
+    def encode_csv(cls, products: list[dict], header: bool = False) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(cls.CSV_COLUMNS)
+
+        for product in products:
+            options = product['options'] or []
+            items = {item['item_id']: item['item_name'] for option in options for item in option['items']}
+            names = [option['option_name'] for option in options] + [None] * (3 - len(options))
+            media_urls = "|".join(media['src'] for media in product['media'] or [])
+            for variant in product['variants'] or []:
+                values = [items.get(variant[slot]) for slot in ProductService.VARIANT_SLOTS]
+                writer.writerow([
+                    product['product_id'], product['product_name'], product['description'], product['status'],
+                    variant['variant_id'], variant['price'], variant['stock'],
+                    names[0], values[0], names[1], values[1], names[2], values[2], media_urls
+                ])
+        return buffer.getvalue().encode()
+
+    @classmethod
+    def chunks(cls, file_format: str = "ndjson", status: str | None = None, batch_size: int | None = None):
+        """
+        Yield the export as chunks of bytes, a chunk per partition of products.
+        """
+
+        if file_format == "csv":
+            yield cls.encode_csv([], header=True)
+        for products in cls.iter_products(status=status, batch_size=batch_size):
+            yield cls.encode_csv(products) if file_format == "csv" else cls.encode_ndjson(products)
+
+    @staticmethod
+    def gzip(chunks):
+        """
+        Gzip a stream of chunks of bytes on the fly.
+        """
+
+        compressor = zlib.compressobj(wbits=31)  # 31: with the gzip header and trailer
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    @classmethod
+    def stream(cls, file_format: str = "ndjson", compress: bool = False, status: str | None = None,
+               batch_size: int | None = None):
+        """
+        The export as an iterator of chunks of bytes, gzipped if `compress`.
+        """
+
+        chunks = cls.chunks(file_format, status=status, batch_size=batch_size)
+        return cls.gzip(chunks) if compress else chunks
@@ -0,0 +1,409 @@
+"""
+Faceted filtering of the products: by option items (`color=red,blue&size=m`) and by price range, with the facet counts
+of the results.
+
+The filters are answered from an in-memory inverted index, per worker process: a bitset (a Python int, bit N set for
+the product ID N) per (option name, item name), per product status and per price bucket. A multi-facet query is a few
+bitwise ANDs/ORs, and each facet count is the popcount of an AND, so it takes milliseconds whatever the size of the
+catalog. A 100k products catalog takes ~13KB per bitset.
+
+The price buckets are logarithmic (`PRICE_BUCKET_BOUNDS`: 10 per decade, ~90 from 0.01 to 10M), so their number
+doesn't grow with the price range of the catalog. The products of the buckets on the edges of a price range are picked
+from the sorted prices of the bucket.
+
+The index is built from the tables on first use. The ProductService writes update it incrementally right after their
+commit, so a worker sees its own writes at once. The writes of the other workers are picked up when the index is
+rebuilt, at most `settings.PRODUCT_FACETS_TTL` seconds later (None: never rebuilt, for a single worker). The rebuild
+runs in a background thread, the requests are served from the previous index until it's swapped.
+"""
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+
+from sqlalchemy import select, type_coerce, Float
+
+from apps.products.models import Product, ProductOption, ProductOptionItem, ProductVariant
+from config import settings
+from config.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Lower bounds of the price buckets, 10 per decade from 0.01 to 10M (the prices below 0.01 share a bucket).
+PRICE_BUCKET_BOUNDS = tuple(
+    float(f"{mantissa}e{exponent}") for exponent in range(-2, 7) for mantissa in (1, 1.2, 1.5, 2, 2.5, 3, 4, 5, 6, 8)
+) + (1e7,)
+
+
+def price_bucket(price: float) -> int:
+    """
+    The bucket of a price, -1 for the prices below `PRICE_BUCKET_BOUNDS[0]`.
+    """
+
+    return bisect_right(PRICE_BUCKET_BOUNDS, price) - 1
+
+
+def bucket_bounds(bucket: int) -> tuple[float, float]:
+    """
+    The [lower, upper) prices of a bucket.
+    """
+
+    lower = PRICE_BUCKET_BOUNDS[bucket] if bucket >= 0 else -math.inf
+    upper = PRICE_BUCKET_BOUNDS[bucket + 1] if bucket + 1 < len(PRICE_BUCKET_BOUNDS) else math.inf
+    return lower, upper
+
+
+def bitset(ids) -> int:
+    """
+    The bitset of a collection of IDs.
+    """
+
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for product_id in ids:
+        buffer[product_id >> 3] |= 1 << (product_id & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def bit_ids(bits: int):
+    """
+    The IDs of a bitset, in ascending order.
+    """
+
+    buffer = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for index, byte in enumerate(buffer):
+        while byte:
+            low = byte & -byte
+            yield index * 8 + low.bit_length() - 1
+            byte ^= low
+
+
+class FacetIndex:
+    """
+    The bitsets of the products, see the module docstring. Build it with `FacetIndex.build()`.
+
+    Attributes:
+        items (dict): (option name, item name) -> bitset, the names are lowercased.
+        statuses (dict): status -> bitset.
+        price_buckets (dict): price bucket (`price_bucket()`) -> bitset of the products with a variant in it.
+        bucket_prices (dict): price bucket -> sorted (price, product ID) of the bucket, for the buckets on the edges of
+            a price range.
+        products (dict): product ID -> (status, its item keys), the bitsets a product is in.
+        prices (dict): product ID -> the distinct prices of its variants.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.statuses = {}
+        self.price_buckets = {}
+        self.bucket_prices = {}
+        self.products = {}
+        self.prices = {}
+        self.built_at = time.monotonic()
+
+    @staticmethod
+    def key(option_name: str, item_name: str) -> tuple[str, str]:
+        return option_name.strip().lower(), item_name.strip().lower()
+
+    @classmethod
+    def build(cls) -> "FacetIndex":
+        index = cls()
+        items, statuses, buckets = defaultdict(list), defaultdict(list), defaultdict(list)
+        product_items, prices, keys = defaultdict(list), defaultdict(set), {}
+
+        # plain Core rows: the ORM row processing would take most of the time on a big catalog
+        with DatabaseManager.session_context() as session:
+            connection = session.connection()
+            product_statuses = dict(connection.execute(select(Product.id, Product.status)).all())
+            for product_id, option_name, item_name in connection.execute(
+                select(ProductOption.product_id, ProductOption.option_name, ProductOptionItem.item_name)
+                .join(ProductOptionItem, ProductOptionItem.option_id == ProductOption.id)
+            ):
+                # the same item may be spelled differently by products ("Red", "red")
+                key = keys.get((option_name, item_name))
+                if key is None:
+                    key = keys[option_name, item_name] = cls.key(option_name, item_name)
+                items[key].append(product_id)
+                product_items[product_id].append(key)
+            for product_id, price in connection.execute(
+                select(ProductVariant.product_id, type_coerce(ProductVariant.price, Float)).distinct()
+                .filter(ProductVariant.price.is_not(None))
+            ):
+                prices[product_id].add(price)
+
+        for product_id, status in product_statuses.items():
+            statuses[status].append(product_id)
+            index.products[product_id] = (status, tuple(set(product_items[product_id])))
+        for product_id, product_prices in prices.items():
+            index.prices[product_id] = tuple(product_prices)
+            for price in product_prices:
+                buckets[price_bucket(price)].append((price, product_id))
+
+        index.items = {key: bitset(ids) for key, ids in items.items()}
+        index.statuses = {status: bitset(ids) for status, ids in statuses.items()}
+        index.price_buckets = {bucket: bitset(product_id for _, product_id in entries)
+                               for bucket, entries in buckets.items()}
+        index.bucket_prices = {bucket: sorted(entries) for bucket, entries in buckets.items()}
+        return index
+
+    # ---------------------------
+    # --- Incremental updates ---
+    # ---------------------------
+
+    def remove(self, product_id: int):
+        """
+        Drop a product from the bitsets it's in, the others are left untouched.
+        """
+
+        mask = ~(1 << product_id)
+        status, keys = self.products.pop(product_id, (None, ()))
+        if status in self.statuses:
+            self.statuses[status] &= mask
+        for key in keys:
+            self.items[key] &= mask
+        for price in self.prices.pop(product_id, ()):
+            bucket = price_bucket(price)
+            entries = self.bucket_prices[bucket]
+            del entries[bisect_left(entries, (price, product_id))]
+            self.price_buckets[bucket] &= mask
+
+    def add(self, product_id: int, status: str, items: list[tuple[str, str]], prices: list[float]):
+        mask = 1 << product_id
+        self.statuses[status] = self.statuses.get(status, 0) | mask
+        keys = {self.key(option_name, item_name) for option_name, item_name in items}
+        for key in keys:
+            self.items[key] = self.items.get(key, 0) | mask
+        self.products[product_id] = (status, tuple(keys))
+        prices = tuple(set(prices))
+        if prices:
+            self.prices[product_id] = prices
+        for price in prices:
+            bucket = price_bucket(price)
+            self.price_buckets[bucket] = self.price_buckets.get(bucket, 0) | mask
+            insort(self.bucket_prices.setdefault(bucket, []), (price, product_id))
+
+    # ---------------
+    # --- Queries ---
+    # ---------------
+
+    def price_range(self, candidates: int, min_price: float | None, max_price: float | None) -> int:
+        """
+        The candidates with a variant priced in [min_price, max_price]. The buckets inside the range are taken as they
+        are, the products of the buckets on the edges are picked from their sorted prices.
+        """
+
+        low = -math.inf if min_price is None else min_price
+        high = math.inf if max_price is None else max_price
+
+        matched = 0
+        for bucket in range(price_bucket(low), price_bucket(high) + 1):
+            bits = self.price_buckets.get(bucket, 0) & candidates
+            if not bits:
+                continue
+            lower, upper = bucket_bounds(bucket)
+            if low <= lower and upper <= high:
+                matched |= bits
+                continue
+            entries = self.bucket_prices[bucket]
+            edge = entries[bisect_left(entries, (low, -1)):bisect_right(entries, (high, math.inf))]
+            matched |= bitset(product_id for _, product_id in edge) & candidates
+        return matched
+
+    def filter(self, facets: dict[str, list[str]], min_price: float | None = None, max_price: float | None = None,
+               status: str | None = "active") -> tuple[int, dict]:
+        """
+        The bitset of the products that match every facet (any of its items) and the price range, and the facet
+        counts: for each option, the number of products per item among the products matching all the other filters
+        (so the shopper sees what choosing another item of the same option would give).
+        """
+
+        base = self.statuses.get(status, 0) if status is not None else _or(self.statuses.values())
+        if min_price is not None or max_price is not None:
+            base = self.price_range(base, min_price, max_price)
+
+        selected = {}
+        for option_name, item_names in facets.items():
+            option_name = option_name.strip().lower()
+            selected[option_name] = _or(self.items.get(self.key(option_name, item), 0) for item in item_names)
+
+        matched = base
+        for bits in selected.values():
+            matched &= bits
+
+        counts, others = defaultdict(dict), {}
+        for (option_name, item_name), bits in self.items.items():
+            if option_name not in others:
+                others[option_name] = base
+                for selected_option, selected_bits in selected.items():
+                    if selected_option != option_name:
+                        others[option_name] &= selected_bits
+            count = (others[option_name] & bits).bit_count()
+            if count:
+                counts[option_name][item_name] = count
+        return matched, dict(counts)
+
+
+def _or(bitsets) -> int:
+    result = 0
+    for bits in bitsets:
+        result |= bits
+    return result
+
+
+class ProductFacets:
+    """
+    The facet index of the worker process.
+
+    Example Usage:
+        product_ids, total, facets, next_cursor = ProductFacets.filter({"color": ["red"]}, max_price=50)
+        ProductFacets.refresh_product(product_id)  # after a write is committed
+    """
+
+    index: FacetIndex | None = None
+    _lock = threading.Lock()
+    # the products written while a background rebuild runs, they're re-indexed once the new index is swapped in
+    _written: set[int] | None = None
+
+    @classmethod
+    def current(cls) -> FacetIndex:
+        """
+        The index, built first if it's missing. If it's older than `settings.PRODUCT_FACETS_TTL`, a rebuild is
+        started in the background and the current index is returned meanwhile.
+        """
+
+        index = cls.index
+        if index is None:
+            with cls._lock:
+                if cls.index is None:
+                    cls.index = FacetIndex.build()
+                return cls.index
+
+        ttl = getattr(settings, "PRODUCT_FACETS_TTL", None)
+        if ttl is not None and time.monotonic() - index.built_at > ttl:
+            cls.rebuild(index)
+        return index
+
+    @classmethod
+    def rebuild(cls, index: FacetIndex) -> threading.Thread | None:
+        """
+        Rebuild the index in a background thread and swap it for `index`, unless a rebuild is running already.
+        """
+
+        with cls._lock:
+            if cls._written is not None:
+                return None
+            written = cls._written = set()
+
+        def target():
+            try:
+                with DatabaseManager.session_scope(sticky=False):
+                    rebuilt = FacetIndex.build()
+            except Exception:
+                logger.exception("rebuilding the facet index failed, the current one is kept")
+                rebuilt = None
+
+            with cls._lock:
+                if cls._written is written:
+                    cls._written = None
+                if cls.index is not index:  # cleared meanwhile
+                    return
+                if rebuilt is None:
+                    index.built_at = time.monotonic()  # retry after the TTL
+                    return
+                cls.index = rebuilt
+            # the writes committed while the tables were read may be missing from the new index
+            cls.refresh_products(sorted(written))
+
+        thread = threading.Thread(target=target, name="product-facets-rebuild", daemon=True)
+        thread.start()
+        return thread
+
+    @classmethod
+    def clear(cls):
+        """
+        Drop the index, it's rebuilt on next use (e.g. after rows were written without ProductService).
+        """
+
+        with cls._lock:
+            cls.index = None
+            cls._written = None
+
+    @classmethod
+    def refresh_product(cls, product_id: int):
+        """
+        Re-index a product from its tables, call it after the write is committed. A no-op until the index is built.
+        """
+
+        cls.refresh_products([product_id])
+
+    @classmethod
+    def refresh_products(cls, product_ids: list[int]):
+        """
+        Re-index products from their tables, with one query per table whatever their number (see `refresh_product()`).
+        """
+
+        if cls.index is None or not product_ids:
+            return
+
+        items, prices = defaultdict(list), defaultdict(list)
+        with DatabaseManager.session_context() as session:
+            statuses = dict(session.execute(
+                select(Product.id, Product.status).filter(Product.id.in_(product_ids))
+            ).all())
+            for product_id, option_name, item_name in session.execute(
+                select(ProductOption.product_id, ProductOption.option_name, ProductOptionItem.item_name)
+                .join(ProductOptionItem, ProductOptionItem.option_id == ProductOption.id)
+                .filter(ProductOption.product_id.in_(product_ids))
+            ):
+                items[product_id].append((option_name, item_name))
+            for product_id, price in session.execute(
+                select(ProductVariant.product_id, ProductVariant.price).distinct()
+                .filter(ProductVariant.product_id.in_(product_ids), ProductVariant.price.is_not(None))
+            ):
+                prices[product_id].append(float(price))
+
+        with cls._lock:
+            if cls.index is None:
+                return
+            if cls._written is not None:
+                cls._written.update(product_ids)
+            for product_id in product_ids:
+                cls.index.remove(product_id)
+                if product_id in statuses:
+                    cls.index.add(product_id, statuses[product_id], items[product_id], prices[product_id])
+
+    @classmethod
+    def remove_product(cls, product_id: int):
+        with cls._lock:
+            if cls._written is not None:
+                cls._written.add(product_id)
+            if cls.index is not None:
+                cls.index.remove(product_id)
+
+    @classmethod
+    def filter(cls, facets: dict[str, list[str]], min_price: float | None = None, max_price: float | None = None,
+               status: str | None = "active", limit: int = 12, before_id: int | None = None):
+        """
+        A page of the IDs of the matching products, newest first, below `before_id` (keyset pagination).
+
+        Returns:
+            The product IDs of the page, the total number of matching products, the facet counts, and whether there
+            is a next page.
+        """
+
+        matched, counts = cls.current().filter(facets, min_price, max_price, status)
+        total = matched.bit_count()
+
+        page = matched if before_id is None else matched & ((1 << before_id) - 1)
+        product_ids = []
+        while page and len(product_ids) <= limit:
+            product_id = page.bit_length() - 1
+            product_ids.append(product_id)
+            page ^= 1 << product_id
+
+        has_next = len(product_ids) > limit
+        return product_ids[:limit], total, counts, has_next
@@ -62,6 +62,26 @@ class FakeProduct:
             }
         ]
 
+    @classmethod
+    def generate_random_options(cls):
+        """
+        Up to three random options, each one with a few random items.
+        """
+
+        options = {
+            'color': cls.option_color_items,
+            'size': cls.option_size_items,
+            'material': cls.option_material_items,
+            'Style': cls.option_style_items
+        }
+        return [
+            {
+                "option_name": option_name,
+                "items": random.sample(options[option_name], random.randint(1, min(3, len(options[option_name]))))
+            }
+            for option_name in random.sample(cls.options, random.randint(0, 3))
+        ]
+
     @classmethod
     def get_payload(cls):
         payload = {
@@ -157,6 +177,27 @@ class FakeProduct:
         for i in range(9):
             cls.populate_product_with_options()
 
+    @classmethod
+    def bulk_populate_products(cls, count: int, with_options: bool = True, batch_size: int = 500) -> list[int]:
+        """
+        Insert `count` active products with random options and their variants, a batch of products at a time.
+
+        Each batch costs a few multi-row inserts (products, options, items, variants), so it's the way to seed a big
+        demo or benchmark catalog, rather than calling `ProductService.create_product()` per product.
+
+        Returns:
+            IDs of the new products.
+        """
+
+        product_ids = []
+        for start in range(0, count, batch_size):
+            payloads = [cls.get_payload() for _ in range(min(batch_size, count - start))]
+            for payload in payloads:
+                payload['options'] = cls.generate_random_options() if with_options else []
+            product_ids.extend(ProductService.bulk_create_products(payloads))
+
+        return product_ids
+
 
 class FakeMedia:
     product_demo_dir = f'{DEMO_PRODUCTS_MEDIA_DIR}'
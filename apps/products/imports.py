@@ -0,0 +1,290 @@
+"""
+Bulk import of a product catalog from an NDJSON or CSV file, as a job whose progress can be polled.
+
+The file is streamed: its rows are validated one by one with `CreateProductIn` and written a batch at a time with
+`ProductService.bulk_create_products()` (a transaction and a few multi-row inserts per batch), so a big catalog is
+never held in memory and costs a few statements per batch instead of a request per product. The invalid rows are
+skipped and reported with their row number, they don't stop the import.
+
+- NDJSON: one `CreateProductIn` payload per line.
+- CSV: a header row with `product_name`, `description`, `status`, `price`, `stock` and up to three options as
+  `option1_name`, `option1_items` (the items separated by `|`), `option2_name`, ... Empty cells are left out.
+
+The jobs are kept in memory by the worker process that runs them: `python manage.py import-products` for a single
+process, or poll `GET /products/imports/{job_id}` on the worker that accepted the upload. A finished job is dropped
+`ProductImport.FINISHED_JOBS_TTL` seconds after its end.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+
+from apps.products.schemas import CreateProductIn
+from apps.products.services import ProductService
+from config import settings
+from config.database import DatabaseManager
+
+FORMATS = ("ndjson", "csv")
+CSV_ITEMS_SEPARATOR = "|"
+
+
+class ImportJob:
+    """
+    The progress of an import.
+
+    Attributes:
+        processed (int): Rows read so far.
+        created (int): Products created so far.
+        failed (int): Rows skipped, the first `MAX_ERRORS` of them are reported in `errors`.
+        errors (list): {"row": row number (1 is the first row after the CSV header), "errors": [messages]}.
+    """
+
+    MAX_ERRORS = 1000
+
+    def __init__(self, file_format: str):
+        self.id = uuid.uuid4().hex
+        self.format = file_format
+        self.status = "pending"
+        self.processed = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.detail = None
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def fail_row(self, row: int, messages: list[str]):
+        self.failed += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append({"row": row, "errors": messages})
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "format": self.format,
+            "status": self.status,
+            "processed": self.processed,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "detail": self.detail,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class ProductImport:
+    """
+    Example Usage:
+        with open("catalog.ndjson", "rb") as file:
+            job = ProductImport.run(file, "ndjson")
+        print(job.created, job.failed, job.errors)
+    """
+
+    FINISHED_JOBS_TTL = 3600
+    UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+    jobs: dict[str, ImportJob] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def detect_format(filename: str | None, file_format: str | None = None) -> str:
+        """
+        The format given, or the one of the file extension (.ndjson/.jsonl or .csv).
+        """
+
+        if file_format is None and filename:
+            extension = os.path.splitext(filename)[1].lower()
+            file_format = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}.get(extension)
+        if file_format not in FORMATS:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown import format, expected one of: {', '.join(FORMATS)}.")
+        return file_format
+
+    # ---------------
+    # --- Parsers ---
+    # ---------------
+
+    @staticmethod
+    def read_ndjson(lines):
+        """
+        Yield (row number, payload or error message) for each non-blank line.
+        """
+
+        for row, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield row, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row, f"Invalid JSON: {e.msg}"
+
+    @staticmethod
+    def read_csv(lines):
+        """
+        Yield (row number, payload) for each row, the options are rebuilt from the `optionN_name`/`optionN_items`
+        columns.
+        """
+
+        for row, record in enumerate(csv.DictReader(lines), start=1):
+            payload = {key: value for key, value in record.items()
+                       if key and value not in (None, "") and not key.startswith("option")}
+            options = []
+            for index in range(1, 4):
+                option_name = record.get(f"option{index}_name")
+                if option_name:
+                    items = record.get(f"option{index}_items") or ""
+                    items = [item.strip() for item in items.split(CSV_ITEMS_SEPARATOR) if item.strip()]
+                    options.append({"option_name": option_name, "items": items})
+            if options:
+                payload["options"] = options
+            yield row, payload
+
+    @classmethod
+    def read_rows(cls, file, file_format: str):
+        """
+        Stream the rows of a binary file object.
+        """
+
+        lines = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        if file_format == "csv":
+            return cls.read_csv(lines)
+        return cls.read_ndjson(lines)
+
+    # -----------
+    # --- Run ---
+    # -----------
+
+    @staticmethod
+    def validate(payload) -> dict:
+        if not isinstance(payload, dict):
+            raise ValueError("A row must be an object.")
+        product = CreateProductIn.model_validate(payload).model_dump()
+        ProductService.check_variants_count(product["options"])
+        return product
+
+    @classmethod
+    def run(cls, file, file_format: str, batch_size: int | None = None, job: ImportJob | None = None,
+            on_progress=None) -> ImportJob:
+        """
+        Import the products of a binary file object, a batch of valid rows per transaction.
+
+        Args:
+            on_progress: Called with the job after each batch.
+        """
+
+        if batch_size is None:
+            batch_size = getattr(settings, "PRODUCT_IMPORT_BATCH_SIZE", 500)
+        job = job or ImportJob(file_format)
+        job.status = "running"
+
+        def write(batch: list[tuple[int, dict]]):
+            try:
+                job.created += len(ProductService.bulk_create_products([payload for _, payload in batch]))
+            except Exception:
+                # the transaction of the batch is rolled back as a whole: retry its rows one by one, so only the
+                # offending ones are rejected
+                for row, payload in batch:
+                    try:
+                        job.created += len(ProductService.bulk_create_products([payload]))
+                    except Exception as e:
+                        job.fail_row(row, [str(e)])
+            if on_progress is not None:
+                on_progress(job)
+
+        try:
+            batch = []
+            for row, payload in cls.read_rows(file, file_format):
+                job.processed += 1
+                if isinstance(payload, str):
+                    job.fail_row(row, [payload])
+                    continue
+                try:
+                    batch.append((row, cls.validate(payload)))
+                except ValidationError as e:
+                    job.fail_row(row, [f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}"
+                                       for error in e.errors()])
+                except HTTPException as e:
+                    job.fail_row(row, [e.detail])
+                except (TypeError, ValueError) as e:
+                    job.fail_row(row, [str(e)])
+
+                if len(batch) >= batch_size:
+                    write(batch)
+                    batch = []
+            if batch:
+                write(batch)
+        except Exception as e:
+            job.status = "failed"
+            job.detail = str(e)
+        else:
+            job.status = "done"
+        job.finished_at = time.time()
+        return job
+
+    # ------------
+    # --- Jobs ---
+    # ------------
+
+    @classmethod
+    async def start(cls, upload, file_format: str) -> ImportJob:
+        """
+        Run the import of an uploaded file (an `UploadFile`) in a background thread, and return its job right away.
+
+        The upload is copied to a temporary file first, as it's closed once the request is answered. The chunks are
+        read and written off the event loop.
+        """
+
+        job = ImportJob(file_format)
+        with cls._lock:
+            cls.prune_jobs()
+            cls.jobs[job.id] = job
+
+        temporary = tempfile.NamedTemporaryFile(prefix="product-import-", delete=False)
+        try:
+            with temporary:
+                while chunk := await upload.read(cls.UPLOAD_CHUNK_SIZE):
+                    await run_in_threadpool(temporary.write, chunk)
+        except BaseException:
+            os.remove(temporary.name)
+            with cls._lock:
+                cls.jobs.pop(job.id, None)
+            raise
+
+        def target():
+            try:
+                with DatabaseManager.session_scope(sticky=False), open(temporary.name, "rb") as file:
+                    cls.run(file, file_format, job=job)
+            finally:
+                os.remove(temporary.name)
+
+        threading.Thread(target=target, name=f"product-import-{job.id}", daemon=True).start()
+        return job
+
+    @classmethod
+    def prune_jobs(cls):
+        """
+        Drop the jobs finished more than `FINISHED_JOBS_TTL` seconds ago, call it with the lock held.
+        """
+
+        expired = time.time() - cls.FINISHED_JOBS_TTL
+        for job_id in [job_id for job_id, job in cls.jobs.items()
+                       if job.finished_at is not None and job.finished_at < expired]:
+            del cls.jobs[job_id]
+
+    @classmethod
+    def get_or_404(cls, job_id: str) -> ImportJob:
+        with cls._lock:
+            cls.prune_jobs()
+            job = cls.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Import job not found")
+        return job
@@ -1,5 +1,6 @@
 import enum
-from sqlalchemy import Column, ForeignKey, Integer, String, UniqueConstraint, Text, DateTime, func, Numeric, Enum
+from sqlalchemy import Column, ForeignKey, Integer, String, UniqueConstraint, Text, DateTime, func, Numeric, Enum, \
+    Index, JSON, DDL, event
 from sqlalchemy.orm import relationship
 
 from config.database import FastModel
@@ -26,9 +27,16 @@ class Product(FastModel):
     updated_at = Column(DateTime, nullable=True)
     published_at = Column(DateTime, nullable=True)
 
-    options = relationship("ProductOption", back_populates="product", cascade="all, delete-orphan")
-    variants = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan")
-    media = relationship("ProductMedia", back_populates="product", cascade="all, delete-orphan")
+    # the products list filters by status and pages through the IDs (keyset pagination)
+    __table_args__ = (Index('ix_products_status_id', 'status', 'id'),)
+    options = relationship("ProductOption", back_populates="product", cascade="all, delete-orphan",
+                           order_by="ProductOption.id")
+    variants = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan",
+                            order_by="ProductVariant.id")
+    media = relationship("ProductMedia", back_populates="product", cascade="all, delete-orphan",
+                         order_by="ProductMedia.id")
+    document = relationship("ProductDocument", back_populates="product", cascade="all, delete-orphan",
+                            uselist=False)
 
 
 class ProductOption(FastModel):
@@ -42,7 +50,8 @@ class ProductOption(FastModel):
 
     __table_args__ = (UniqueConstraint('product_id', 'option_name'),)
     product = relationship("Product", back_populates="options")
-    option_items = relationship("ProductOptionItem", back_populates="product_option", cascade="all, delete-orphan")
+    option_items = relationship("ProductOptionItem", back_populates="product_option", cascade="all, delete-orphan",
+                                order_by="ProductOptionItem.id")
 
 
 class ProductOptionItem(FastModel):
@@ -60,7 +69,7 @@ class ProductVariant(FastModel):
     __tablename__ = "product_variants"
 
     id = Column(Integer, primary_key=True)
-    product_id = Column(Integer, ForeignKey("products.id"))
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     price = Column(Numeric(12, 2), default=0)
     stock = Column(Integer, default=0)
 
@@ -82,7 +91,7 @@ class ProductMedia(FastModel):
     __tablename__ = "product_media"
 
     id = Column(Integer, primary_key=True)
-    product_id = Column(Integer, ForeignKey("products.id"))
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
 
     # TODO attach image to product variants (optional)
     # variant_ids = Column(ARRAY(Integer))
@@ -96,3 +105,44 @@ class ProductMedia(FastModel):
     updated_at = Column(DateTime, onupdate=func.now())
 
     product = relationship("Product", back_populates="media")
+
+
+class ProductDocument(FastModel):
+    """
+    The materialized payload of a product (`ProductSchema`: the product with its options, variants and media), so a
+    product is read with a single primary-key lookup instead of being assembled from four tables.
+
+    Optional, see `settings.PRODUCT_DOCUMENTS`. ProductService refreshes the document in the transaction of each write,
+    and `python manage.py rebuild-documents` backfills or repairs them.
+    """
+
+    __tablename__ = "product_documents"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    document = Column(JSON, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    product = relationship("Product", back_populates="document")
+
+
+# The full-text index of the products (`apps.products.search.ProductSearch`): the name, the description and the option
+# items of each product. It's not a model, its type depends on the database: an FTS5 virtual table on sqlite (rowid =
+# product ID), a tsvector column with a GIN index on postgres. It's created (if it doesn't exist yet) and dropped along
+# with the tables of the models.
+SEARCH_TABLE_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+        "product_name, description, items, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ],
+    "postgresql": [
+        "CREATE TABLE IF NOT EXISTS product_search ("
+        "product_id INTEGER PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE, document TSVECTOR NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_product_search_document ON product_search USING GIN (document)"
+    ]
+}
+
+for dialect, statements in SEARCH_TABLE_DDL.items():
+    for statement in statements:
+        event.listen(FastModel.metadata, "after_create", DDL(statement).execute_if(dialect=dialect))
+    event.listen(FastModel.metadata, "before_drop",
+                 DDL("DROP TABLE IF EXISTS product_search").execute_if(dialect=dialect))
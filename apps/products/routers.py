@@ -29,19 +29,35 @@ attached to it.
 """
 from typing import Optional
 
-from fastapi import APIRouter, status, Depends, Form, UploadFile, File, HTTPException, Query, Path
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, status, Depends, Form, UploadFile, File, HTTPException, Query, Path, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from apps.accounts.services.token import TokenService
 from apps.accounts.services.user import User
+from apps.core.services.conditional import ConditionalRequest
 from apps.core.services.media import MediaService
+from apps.core.services.responses import FastResponse
 from apps.products import schemas
+from apps.products.exports import ProductExport, MEDIA_TYPES
+from apps.products.imports import ProductImport
 from apps.products.services import ProductService
+from config import settings
+from config.database import DatabaseManager
 
 router = APIRouter(
     prefix="/products"
 )
 
+
+def check_superuser(current_user: User = Depends(TokenService.fetch_user)):
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='You are not allowed to update a product.'
+        )
+
+
 """
 ---------------------------------------
 ----------- Product Routers -----------
@@ -57,21 +73,178 @@ router = APIRouter(
     description='Create a new product.',
     tags=["Product"]
 )
-async def create_product(product: schemas.CreateProductIn):
+def create_product(product: schemas.CreateProductIn):
     return {'product': ProductService.create_product(product.model_dump())}
 
 
+@router.post(
+    '/imports',
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=schemas.ImportJobOut,
+    summary='Import products from a file',
+    description='Bulk import of a catalog from an NDJSON or CSV file (the format is taken from `?format=` or from the '
+                'file extension). The file is imported in the background, poll the returned job for its progress '
+                'and the errors of the rejected rows.',
+    tags=["Product"],
+    dependencies=[Depends(check_superuser)]
+)
+async def import_products(file: UploadFile = File(), file_format: str | None = Query(None, alias='format')):
+    file_format = ProductImport.detect_format(file.filename, file_format)
+    return (await ProductImport.start(file, file_format)).to_dict()
+
+
+@router.get(
+    '/imports/{job_id}',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.ImportJobOut,
+    summary='Retrieve the progress of an import',
+    description='The progress of a bulk import, and the errors of its rejected rows.',
+    tags=["Product"],
+    dependencies=[Depends(check_superuser)]
+)
+def retrieve_import(job_id: str):
+    return ProductImport.get_or_404(job_id).to_dict()
+
+
+@router.get(
+    '/export',
+    status_code=status.HTTP_200_OK,
+    summary='Export the catalog',
+    description='Streams every product with its options, variants and media URLs, as NDJSON (a product per line) or '
+                'CSV (a row per variant), optionally gzipped (`?gzip=true`). The memory used by the export is the '
+                'same whatever the size of the catalog.',
+    tags=["Product"],
+    dependencies=[Depends(check_superuser)]
+)
+def export_products(file_format: str = Query('ndjson', alias='format', pattern='^(ndjson|csv)$'),
+                    gzip: bool = False,
+                    product_status: Optional[str] = Query(None, description='Export only this status')):
+    filename = f"products.{file_format}" + ('.gz' if gzip else '')
+    return StreamingResponse(
+        ProductExport.stream(file_format, compress=gzip, status=product_status),
+        media_type='application/gzip' if gzip else MEDIA_TYPES[file_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get(
+    '/summary',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.ListProductSummaryOut,
+    summary='Retrieve a page of product summaries',
+    description='Retrieve a page of light product cards for the category grids, newest first: the name, the min/max '
+                'price and the total stock of the variants, and the first image. Pass the `next_cursor` of a page as '
+                '`cursor` to get the next one.',
+    tags=["Product"],
+    dependencies=[Depends(DatabaseManager.query_budget(3))]
+)
+def list_product_summaries(
+    product_status: Optional[str] = Query(None, description='Filter products by status'),
+    limit: int = Query(settings.products_list_limit, ge=1, le=settings.products_list_max_limit,
+                       description='Number of products per page'),
+    cursor: Optional[str] = Query(None, description='The `next_cursor` of the previous page'),
+    current_user: User = Depends(TokenService.fetch_user)
+):
+    if not current_user.is_superuser:
+        product_status = 'active'
+    products, next_cursor = ProductService.list_product_summaries(limit=limit, cursor=cursor, status=product_status)
+    if products:
+        return FastResponse.json({'products': products, 'next_cursor': next_cursor})
+    return JSONResponse(
+        content=None,
+        status_code=status.HTTP_204_NO_CONTENT
+    )
+
+
+@router.get(
+    '/search',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.ListProductSummaryOut,
+    summary='Search the products',
+    description='Full-text search over the name, the description and the option items of the products, most relevant '
+                'first. Every word of `q` must match, as a prefix. Pass the `next_cursor` of a page as `cursor` to get '
+                'the next one.',
+    tags=["Product"],
+    dependencies=[Depends(DatabaseManager.query_budget(4))]
+)
+def search_products(
+    q: str = Query(..., min_length=1, max_length=255, description='Words to search for'),
+    product_status: Optional[str] = Query(None, description='Filter products by status'),
+    limit: int = Query(settings.products_list_limit, ge=1, le=settings.products_list_max_limit,
+                       description='Number of products per page'),
+    cursor: Optional[str] = Query(None, description='The `next_cursor` of the previous page'),
+    current_user: User = Depends(TokenService.fetch_user)
+):
+    if not current_user.is_superuser:
+        product_status = 'active'
+    products, next_cursor = ProductService.search_products(q, limit=limit, cursor=cursor, status=product_status)
+    if products:
+        return FastResponse.json({'products': products, 'next_cursor': next_cursor})
+    return JSONResponse(
+        content=None,
+        status_code=status.HTTP_204_NO_CONTENT
+    )
+
+
+@router.get(
+    '/filter',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.FilterProductsOut,
+    summary='Filter the products by option items and price',
+    description='Filter the products by option items and price range, newest first, e.g. '
+                '`/products/filter?facet=color:red,blue&facet=size:m&max_price=50`: each `facet` is an option name and '
+                'the items to match (any of them), separated by commas. A product matches the price range when one of '
+                'its variants is priced in it. `facets` counts the products per option item, among the products '
+                'matching all the other filters.',
+    tags=["Product"],
+    dependencies=[Depends(DatabaseManager.query_budget(6))]
+)
+def filter_products(
+    facet: list[str] = Query([], description='`option:item1,item2`, repeat it to filter by several options'),
+    min_price: Optional[float] = Query(None, ge=0, description='Lowest variant price'),
+    max_price: Optional[float] = Query(None, ge=0, description='Highest variant price'),
+    product_status: Optional[str] = Query(None, description='Filter products by status'),
+    limit: int = Query(settings.products_list_limit, ge=1, le=settings.products_list_max_limit,
+                       description='Number of products per page'),
+    cursor: Optional[str] = Query(None, description='The `next_cursor` of the previous page'),
+    current_user: User = Depends(TokenService.fetch_user)
+):
+    if not current_user.is_superuser:
+        product_status = 'active'
+    facets = {}
+    for value in facet:
+        option_name, separator, items = value.partition(':')
+        if not separator or not option_name.strip():
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                detail=f"Invalid facet '{value}', expected `option:item1,item2`.")
+        items = [item for item in items.split(',') if item]
+        if items:
+            facets.setdefault(option_name, []).extend(items)
+    products, total, counts, next_cursor = ProductService.filter_products(
+        facets, min_price=min_price, max_price=max_price, limit=limit, cursor=cursor, status=product_status
+    )
+    return FastResponse.json({'products': products, 'total': total, 'facets': counts, 'next_cursor': next_cursor})
+
+
 @router.get(
     '/{product_id}',
     status_code=status.HTTP_200_OK,
     response_model=schemas.RetrieveProductOut,
     summary='Retrieve a single product',
-    description="Retrieve a single product.",
-    tags=["Product"]
+    description="Retrieve a single product. Supports conditional requests (`If-None-Match`).",
+    tags=["Product"],
+    dependencies=[Depends(DatabaseManager.query_budget(5))]
 )
-async def retrieve_product(product_id: int):
-    product = ProductService.retrieve_product(product_id)
-    return {"product": product}
+async def retrieve_product(product_id: int, request: Request, response: Response):
+    validators = ProductService.cached_validators(product_id)
+    if validators and ConditionalRequest.is_not_modified(request, **validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=ConditionalRequest.headers(**validators))
+
+    product, validators = await ProductService.aretrieve_with_validators(product_id)
+    if ConditionalRequest.is_not_modified(request, **validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=ConditionalRequest.headers(**validators))
+    response.headers.update(ConditionalRequest.headers(**validators))
+    return FastResponse.json({"product": product}, response)
 
 
 @router.get(
@@ -79,18 +252,23 @@ async def retrieve_product(product_id: int):
     status_code=status.HTTP_200_OK,
     response_model=schemas.ListProductOut,
     summary='Retrieve a list of products',
-    description='Retrieve a list of products.',
-    tags=["Product"]
+    description='Retrieve a page of products, newest first. Pass the `next_cursor` of a page as `cursor` to get the '
+                'next one.',
+    tags=["Product"],
+    dependencies=[Depends(DatabaseManager.query_budget(8))]
 )
-async def list_produces(
+def list_produces(
     product_status: Optional[str] = Query(None, description='Filter products by status'),
+    limit: int = Query(settings.products_list_limit, ge=1, le=settings.products_list_max_limit,
+                       description='Number of products per page'),
+    cursor: Optional[str] = Query(None, description='The `next_cursor` of the previous page'),
     current_user: User = Depends(TokenService.fetch_user)
 ):
     if not current_user.is_superuser:
         product_status = 'active'
-    products = ProductService.list_products(status=product_status)
+    products, next_cursor = ProductService.list_products(limit=limit, cursor=cursor, status=product_status)
     if products:
-        return {'products': products}
+        return FastResponse.json({'products': products, 'next_cursor': next_cursor})
     return JSONResponse(
         content=None,
         status_code=status.HTTP_204_NO_CONTENT
@@ -105,7 +283,7 @@ async def list_produces(
     description='Updates a product.',
     tags=["Product"]
 )
-async def update_product(
+def update_product(
     product_id: int, 
     payload: schemas.UpdateProductIn,
     current_user: User = Depends(TokenService.fetch_user)
@@ -139,10 +317,73 @@ async def update_product(
     description='Deletes an existing product.',
     tags=['Product']
 )
-async def delete_product(product_id: int):
+def delete_product(product_id: int):
     ProductService.delete_product(product_id)
 
 
+"""
+---------------------------------------
+-------- Product-Option Routers --------
+---------------------------------------
+
+Options and items can be added to or removed from an existing product, only the variants of the change are inserted
+or deleted (the other variants keep their price and stock).
+"""
+
+
+@router.post(
+    '/{product_id}/options',
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas.UpdateProductOut,
+    summary='Add an option to a product',
+    description='Add an option with its items to an existing product. The existing variants take its first item, '
+                'new variants are created for its other items.',
+    tags=['Product Option'],
+    dependencies=[Depends(check_superuser)]
+)
+def add_option(product_id: int, payload: schemas.AddOptionIn):
+    return {'product': ProductService.add_option(product_id, **payload.model_dump())}
+
+
+@router.delete(
+    '/{product_id}/options/{option_id}',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.UpdateProductOut,
+    summary='Remove an option from a product',
+    description='Remove an option from a product. The variants of its first item are kept, the others are deleted.',
+    tags=['Product Option'],
+    dependencies=[Depends(check_superuser)]
+)
+def remove_option(product_id: int, option_id: int):
+    return {'product': ProductService.remove_option(product_id, option_id)}
+
+
+@router.post(
+    '/{product_id}/options/{option_id}/items',
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas.UpdateProductOut,
+    summary='Add items to an option of a product',
+    description='Add items to an option of a product, only the variants of the new items are created.',
+    tags=['Product Option'],
+    dependencies=[Depends(check_superuser)]
+)
+def add_option_items(product_id: int, option_id: int, payload: schemas.AddOptionItemsIn):
+    return {'product': ProductService.add_option_items(product_id, option_id, **payload.model_dump())}
+
+
+@router.delete(
+    '/{product_id}/options/{option_id}/items/{item_id}',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.UpdateProductOut,
+    summary='Remove an item from an option of a product',
+    description='Remove an item from an option of a product, with its variants.',
+    tags=['Product Option'],
+    dependencies=[Depends(check_superuser)]
+)
+def remove_option_item(product_id: int, option_id: int, item_id: int):
+    return {'product': ProductService.remove_option_item(product_id, option_id, item_id)}
+
+
 """
 ---------------------------------------
 -------- Product-Variant Routers --------
@@ -150,6 +391,36 @@ async def delete_product(product_id: int):
 """
 
 
+@router.post(
+    '/variants/preview',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.PreviewVariantsOut,
+    summary='Preview the variants of options',
+    description='Dry run of the variants generation: the number of variants the options would generate, whether it is '
+                'within the limit, and the first combinations of their items. Nothing is written.',
+    tags=['Product Variant']
+)
+def preview_variants(payload: schemas.PreviewVariantsIn,
+                     limit: int = Query(10, ge=0, le=settings.products_list_max_limit)):
+    return ProductService.preview_variants(payload.model_dump()['options'], limit)
+
+
+@router.put(
+    '/variants/bulk',
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.BulkUpdateVariantsOut,
+    summary='Updates many product variants',
+    description='Sets the price and/or the stock of up to 10000 variants in a single transaction, and returns the '
+                'status of each update (`updated` or `not_found`).',
+    tags=['Product Variant'],
+    dependencies=[Depends(check_superuser)]
+)
+def bulk_update_variants(payload: schemas.BulkUpdateVariantsIn):
+    results = ProductService.bulk_update_variants(payload.model_dump()['variants'])
+    updated = sum(result['status'] == 'updated' for result in results)
+    return FastResponse.json({'updated': updated, 'not_found': len(results) - updated, 'results': results})
+
+
 @router.put(
     '/variants/{variant_id}',
     status_code=status.HTTP_200_OK,
@@ -158,7 +429,7 @@ async def delete_product(product_id: int):
     description='Modify an existing Product Variant.',
     tags=['Product Variant']
 )
-async def update_variant(variant_id: int, payload: schemas.UpdateVariantIn):
+def update_variant(variant_id: int, payload: schemas.UpdateVariantIn):
     update_data = {}
 
     for key, value in payload.model_dump().items():
@@ -177,10 +448,11 @@ async def update_variant(variant_id: int, payload: schemas.UpdateVariantIn):
     response_model=schemas.RetrieveVariantOut,
     summary='Retrieve a single product variant',
     description='Retrieves a single product variant.',
-    tags=['Product Variant']
+    tags=['Product Variant'],
+    dependencies=[Depends(DatabaseManager.query_budget(1))]
 )
 async def retrieve_variant(variant_id: int):
-    return {'variant': ProductService.retrieve_variant(variant_id)}
+    return FastResponse.json({'variant': await ProductService.aretrieve_variant(variant_id)})
 
 
 @router.get(
@@ -188,11 +460,20 @@ async def retrieve_variant(variant_id: int):
     status_code=status.HTTP_200_OK,
     response_model=schemas.ListVariantsOut,
     summary='Retrieves a list of product variants',
-    description='Retrieves a list of product variants.',
-    tags=['Product Variant']
+    description='Retrieves a list of product variants. Supports conditional requests (`If-None-Match`).',
+    tags=['Product Variant'],
+    dependencies=[Depends(DatabaseManager.query_budget(1))]
 )
-async def list_variants(product_id: int):
-    return {'variants': ProductService.retrieve_variants(product_id)}
+async def list_variants(product_id: int, request: Request, response: Response):
+    validators = ProductService.cached_validators(product_id, 'variants')
+    if validators and ConditionalRequest.is_not_modified(request, **validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=ConditionalRequest.headers(**validators))
+
+    variants, validators = await ProductService.aretrieve_with_validators(product_id, 'variants')
+    if ConditionalRequest.is_not_modified(request, **validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=ConditionalRequest.headers(**validators))
+    response.headers.update(ConditionalRequest.headers(**validators))
+    return FastResponse.json({'variants': variants}, response)
 
 
 """
@@ -221,7 +502,7 @@ async def create_product_media(x_files: list[UploadFile] = File(), product_id: i
         MediaService.is_allowed_extension(file)
         await MediaService.is_allowed_file_size(file)
 
-    media = ProductService.create_media(product_id=product_id, alt=alt, files=x_files)
+    media = await run_in_threadpool(ProductService.create_media, product_id=product_id, alt=alt, files=x_files)
     return {'media': media}
 
 
@@ -233,7 +514,7 @@ async def create_product_media(x_files: list[UploadFile] = File(), product_id: i
     description='Get a single product image by id.',
     tags=['Product Image']
 )
-async def retrieve_single_media(media_id: int):
+def retrieve_single_media(media_id: int):
     return {'media': ProductService.retrieve_single_media(media_id)}
 
 
@@ -242,13 +523,21 @@ async def retrieve_single_media(media_id: int):
     status_code=status.HTTP_200_OK,
     response_model=schemas.RetrieveProductMediaOut,
     summary="Receive a list of all Product Images",
-    description="Receive a list of all Product Images.",
-    tags=['Product Image']
+    description="Receive a list of all Product Images. Supports conditional requests (`If-None-Match`).",
+    tags=['Product Image'],
+    dependencies=[Depends(DatabaseManager.query_budget(1))]
 )
-async def list_product_media(product_id: int):
-    media = ProductService.retrieve_media_list(product_id=product_id)
+async def list_product_media(product_id: int, request: Request, response: Response):
+    validators = ProductService.cached_validators(product_id, 'media')
+    if validators and ConditionalRequest.is_not_modified(request, **validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=ConditionalRequest.headers(**validators))
+
+    media, validators = await ProductService.aretrieve_with_validators(product_id, 'media')
+    if ConditionalRequest.is_not_modified(request, **validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=ConditionalRequest.headers(**validators))
     if media:
-        return {'media': media}
+        response.headers.update(ConditionalRequest.headers(**validators))
+        return FastResponse.json({'media': media}, response)
     return JSONResponse(
         content=None,
         status_code=status.HTTP_204_NO_CONTENT
@@ -263,7 +552,7 @@ async def list_product_media(product_id: int):
     description='Updates an existing image.',
     tags=['Product Image']
 )
-async def update_media(media_id: int, file: UploadFile = File(), alt: str | None = Form(None)):
+def update_media(media_id: int, file: UploadFile = File(), alt: str | None = Form(None)):
     update_data = {}
 
     if file is not None:
@@ -286,7 +575,7 @@ async def update_media(media_id: int, file: UploadFile = File(), alt: str | None
     description='Delete image from a product.',
     tags=['Product Image']
 )
-async def delete_product_media(product_id: int, media_ids: str = Query(...)):
+def delete_product_media(product_id: int, media_ids: str = Query(...)):
     media_ids_list = list(map(int, media_ids.split(',')))
     ProductService.delete_product_media(product_id, media_ids_list)
 
@@ -298,5 +587,5 @@ async def delete_product_media(product_id: int, media_ids: str = Query(...)):
     description='Delete a media file.',
     tags=['Product Image']
 )
-async def delete_media_file(media_id: int):
+def delete_media_file(media_id: int):
     ProductService.delete_media_file(media_id)
@@ -1,7 +1,7 @@
 from typing import Annotated, List
 
 from fastapi import Query, UploadFile
-from pydantic import BaseModel, constr, field_validator, model_validator
+from pydantic import BaseModel, Field, constr, field_validator, model_validator
 
 """
 ---------------------------------------
@@ -31,6 +31,52 @@ class UpdateVariantOut(BaseModel):
     variant: VariantSchema
 
 
+class BulkVariantUpdate(BaseModel):
+    variant_id: int
+    price: float | None = None
+    stock: int | None = None
+
+    @field_validator('price')
+    def validate_price(cls, price):
+        if price is not None and price < 0:
+            raise ValueError('Price must be a positive number.')
+        return price
+
+    @field_validator('stock')
+    def validate_stock(cls, stock):
+        if stock is not None and stock < 0:
+            raise ValueError('Stock must be a positive number.')
+        return stock
+
+    @model_validator(mode='after')
+    def validate_not_empty(self):
+        if self.price is None and self.stock is None:
+            raise ValueError('Set the price or the stock of the variant.')
+        return self
+
+
+class BulkUpdateVariantsIn(BaseModel):
+    variants: list[BulkVariantUpdate] = Field(min_length=1, max_length=10000)
+
+    @field_validator('variants')
+    def validate_uniqueness(cls, variants):
+        variant_ids = [variant.variant_id for variant in variants]
+        if len(set(variant_ids)) != len(variant_ids):
+            raise ValueError('Each variant can be updated once per request.')
+        return variants
+
+
+class BulkVariantResult(BaseModel):
+    variant_id: int
+    status: str
+
+
+class BulkUpdateVariantsOut(BaseModel):
+    updated: int
+    not_found: int
+    results: list[BulkVariantResult]
+
+
 class RetrieveVariantOut(BaseModel):
     variant: VariantSchema
 
@@ -68,6 +114,55 @@ class OptionIn(BaseModel):
         return value
 
 
+class AddOptionItemsIn(BaseModel):
+    items: list[str]
+
+    # price and stock of the new variants, the price defaults to the price of the variant they're copied from
+    price: float | None = None
+    stock: int = 0
+
+    @field_validator('items')
+    def not_empty(cls, value):
+        if value is None or value == []:
+            raise ValueError('items must not be None or empty')
+        if len(set(value)) != len(value):
+            raise ValueError('items must be unique')
+        return value
+
+    @field_validator('price')
+    def validate_price(cls, price):
+        if price is not None and price < 0:
+            raise ValueError('Price must be a positive number.')
+        return price
+
+    @field_validator('stock')
+    def validate_stock(cls, stock):
+        if stock < 0:
+            raise ValueError('Stock must be a positive number.')
+        return stock
+
+
+class AddOptionIn(AddOptionItemsIn):
+    option_name: constr(min_length=1)
+
+
+class PreviewVariantsIn(BaseModel):
+    options: list[OptionIn] | None = None
+
+
+class VariantCombination(BaseModel):
+    option1: str | None
+    option2: str | None
+    option3: str | None
+
+
+class PreviewVariantsOut(BaseModel):
+    count: int
+    max_variants: int | None
+    allowed: bool
+    sample: list[VariantCombination]
+
+
 """
 ---------------------------------------
 ---------------- Media ----------------
@@ -208,6 +303,51 @@ class ListProductIn(BaseModel):
 
 class ListProductOut(BaseModel):
     products: list[ProductSchema]
+    next_cursor: str | None = None
+
+
+class ProductSummaryMedia(BaseModel):
+    src: str
+    alt: str | None
+
+
+class ProductSummarySchema(BaseModel):
+    product_id: int
+    product_name: str
+    min_price: float | None
+    max_price: float | None
+    total_stock: int
+    media: ProductSummaryMedia | None
+
+
+class ListProductSummaryOut(BaseModel):
+    products: list[ProductSummarySchema]
+    next_cursor: str | None = None
+
+
+class FilterProductsOut(BaseModel):
+    products: list[ProductSummarySchema]
+    total: int
+    facets: dict[str, dict[str, int]]
+    next_cursor: str | None = None
+
+
+class ImportErrorSchema(BaseModel):
+    row: int
+    errors: list[str]
+
+
+class ImportJobOut(BaseModel):
+    job_id: str
+    format: str
+    status: str
+    processed: int
+    created: int
+    failed: int
+    errors: list[ImportErrorSchema]
+    detail: str | None
+    started_at: float
+    finished_at: float | None
 
 
 class UpdateProductIn(BaseModel):
@@ -0,0 +1,190 @@
+"""
+Full-text search of the products, over their name, description and option items, ranked by relevance.
+
+The index (the `product_search` table, see `apps.products.models.SEARCH_TABLE_DDL`) is maintained incrementally by the
+ProductService writes, in their transaction: a product is (re)indexed when it's created or updated, and removed when
+it's deleted. `python manage.py rebuild-search-index` rebuilds it from the tables, to backfill an existing catalog.
+
+- sqlite: an FTS5 table, ranked with bm25().
+- postgres: a tsvector with a GIN index, ranked with ts_rank().
+
+In both, the name weighs more than the option items, which weigh more than the description, and every word of the
+query must match, as a prefix ("blu shi" finds "Blue shirt").
+"""
+import re
+
+from sqlalchemy import text, select
+
+from apps.products.models import Product, ProductOption, ProductOptionItem
+from config.database import DatabaseManager
+
+WORD = re.compile(r"\w+")
+
+
+class ProductSearch:
+
+    # (product_name, description, items) weights
+    SQLITE_BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+    # the option item names of `products.id`, joined by spaces, {} is the aggregate function of the dialect
+    ITEMS_SUBQUERY = (
+        "SELECT {}(product_option_items.item_name, ' ') FROM product_option_items JOIN product_options "
+        "ON product_options.id = product_option_items.option_id WHERE product_options.product_id = products.id"
+    )
+
+    @staticmethod
+    def dialect() -> str:
+        return DatabaseManager.engine.dialect.name
+
+    @classmethod
+    def match_expression(cls, query: str) -> str | None:
+        """
+        The full-text query of the words of `query`, each matched as a prefix, or None if it has no word.
+
+        The words are quoted (sqlite) or reduced to `\\w+` (both), so the operators of the query languages can't be
+        injected through the search box.
+        """
+
+        words = WORD.findall(query.lower())
+        if not words:
+            return None
+        if cls.dialect() == "postgresql":
+            return " & ".join(f"{word}:*" for word in words)
+        return " ".join(f'"{word}"*' for word in words)
+
+    # ---------------------
+    # --- Index updates ---
+    # ---------------------
+
+    @classmethod
+    def index_products(cls, rows: list[dict]):
+        """
+        Index or re-index products, in the current transaction.
+
+        Args:
+            rows: dicts with `product_id`, `product_name`, `description` and `items` (the option item names).
+        """
+
+        if not rows:
+            return
+
+        rows = [
+            {
+                "product_id": row["product_id"],
+                "product_name": row["product_name"] or "",
+                "description": row["description"] or "",
+                "items": " ".join(row["items"])
+            }
+            for row in rows
+        ]
+        with DatabaseManager.session_context() as session:
+            if cls.dialect() == "postgresql":
+                session.execute(text(
+                    "INSERT INTO product_search (product_id, document) VALUES (:product_id, "
+                    "setweight(to_tsvector('simple', :product_name), 'A') || "
+                    "setweight(to_tsvector('simple', :items), 'B') || "
+                    "setweight(to_tsvector('simple', :description), 'C')) "
+                    "ON CONFLICT (product_id) DO UPDATE SET document = excluded.document"
+                ), rows)
+            else:
+                session.execute(text("DELETE FROM product_search WHERE rowid = :product_id"), rows)
+                session.execute(text(
+                    "INSERT INTO product_search (rowid, product_name, description, items) "
+                    "VALUES (:product_id, :product_name, :description, :items)"
+                ), rows)
+            Product._commit(session)
+
+    @classmethod
+    def reindex_product(cls, product_id: int):
+        """
+        Re-index a product from its tables (after its name, description or options changed), in the current
+        transaction.
+        """
+
+        with DatabaseManager.session_context() as session:
+            product = session.execute(
+                select(Product.product_name, Product.description).filter(Product.id == product_id)
+            ).first()
+            if product is None:
+                cls.remove_product(product_id)
+                return
+            items = session.scalars(
+                select(ProductOptionItem.item_name).join(ProductOption)
+                .filter(ProductOption.product_id == product_id).order_by(ProductOptionItem.id)
+            ).all()
+
+        cls.index_products([{"product_id": product_id, "product_name": product.product_name,
+                             "description": product.description, "items": items}])
+
+    @classmethod
+    def remove_product(cls, product_id: int):
+        with DatabaseManager.session_context() as session:
+            column = "product_id" if cls.dialect() == "postgresql" else "rowid"
+            session.execute(text(f"DELETE FROM product_search WHERE {column} = :product_id"),
+                            {"product_id": product_id})
+            Product._commit(session)
+
+    @classmethod
+    def rebuild(cls) -> int:
+        """
+        Rebuild the whole index from the tables, in a single transaction. Only needed to backfill an existing catalog
+        (or to repair the index), the writes keep it up to date.
+
+        Returns:
+            Number of products indexed.
+        """
+
+        with DatabaseManager.transaction() as session:
+            session.execute(text("DELETE FROM product_search"))
+            if cls.dialect() == "postgresql":
+                items = cls.ITEMS_SUBQUERY.format("string_agg")
+                session.execute(text(
+                    "INSERT INTO product_search (product_id, document) SELECT products.id, "
+                    "setweight(to_tsvector('simple', products.product_name), 'A') || "
+                    f"setweight(to_tsvector('simple', coalesce(({items}), '')), 'B') || "
+                    "setweight(to_tsvector('simple', coalesce(products.description, '')), 'C') FROM products"
+                ))
+            else:
+                items = cls.ITEMS_SUBQUERY.format("group_concat")
+                session.execute(text(
+                    "INSERT INTO product_search (rowid, product_name, description, items) "
+                    "SELECT products.id, products.product_name, coalesce(products.description, ''), "
+                    f"coalesce(({items}), '') FROM products"
+                ))
+            return session.scalar(text("SELECT count(*) FROM product_search"))
+
+    # --------------
+    # --- Search ---
+    # --------------
+
+    @classmethod
+    def search(cls, query: str, status: str | None = "active", limit: int = 12, offset: int = 0) -> list[int]:
+        """
+        The IDs of the products matching `query`, most relevant first (then newest first), from `offset`.
+        `status=None` searches the products of every status.
+        """
+
+        match = cls.match_expression(query)
+        if match is None:
+            return []
+
+        parameters = {"match": match, "limit": limit, "offset": offset, "status": status}
+        status_filter = "AND products.status = :status" if status is not None else ""
+        if cls.dialect() == "postgresql":
+            statement = (
+                "SELECT products.id FROM product_search JOIN products ON products.id = product_search.product_id "
+                f"WHERE product_search.document @@ to_tsquery('simple', :match) {status_filter} "
+                "ORDER BY ts_rank(product_search.document, to_tsquery('simple', :match)) DESC, products.id DESC "
+                "LIMIT :limit OFFSET :offset"
+            )
+        else:
+            weights = ", ".join(map(str, cls.SQLITE_BM25_WEIGHTS))
+            statement = (
+                "SELECT products.id FROM product_search JOIN products ON products.id = product_search.rowid "
+                f"WHERE product_search MATCH :match {status_filter} "
+                f"ORDER BY bm25(product_search, {weights}), products.id DESC "
+                "LIMIT :limit OFFSET :offset"
+            )
+
+        with DatabaseManager.session_context() as session:
+            return session.scalars(text(statement), parameters).all()
@@ -1,70 +1,186 @@
-from itertools import product as options_combination
+import math
+from collections import defaultdict
+from itertools import product as options_combination, islice
 
-from sqlalchemy import select, and_, or_
+from fastapi import HTTPException
+from sqlalchemy import select, and_, or_, delete, update, insert, func
+from sqlalchemy.orm import selectinload
 from typing import Optional
 
 from apps.core.date_time import DateTime
+from apps.core.services.conditional import ConditionalRequest
 from apps.core.services.media import MediaService
-from apps.products.models import Product, ProductOption, ProductOptionItem, ProductVariant, ProductMedia
+from apps.core.services.pagination import Cursor
+from apps.products.models import Product, ProductOption, ProductOptionItem, ProductVariant, ProductMedia, \
+    ProductDocument
+from apps.products.facets import ProductFacets
+from apps.products.search import ProductSearch
 from config import settings
+from config.cache import CacheManager, MISSING
 from config.database import DatabaseManager
 from config.settings import BASE_URL
 
 
 class ProductService:
-    product = None
-    price: int | float
-    stock: int
-    options: list | None = []
-    options_data: list = []
-    variants: list = []
-    media: list | None = None
+    """
+    The product use cases. The service holds no state: everything a call works on is passed along in local variables,
+    so concurrent calls (threads of the threadpool, tasks of the event loop) never see each other's data.
+    """
 
     @classmethod
     def create_product(cls, data: dict, get_obj: bool = False):
+        """
+        Create a product with its options, items and variants as a single unit of work: the rows are flushed to get
+        their IDs, the transaction is committed once, and the response is built from the in-memory objects.
+        """
+
+        with DatabaseManager.transaction():
+            product, price, stock, options_data = cls._create_product(data)
+            options = cls.__create_product_options(product.id, options_data)
+            variants = cls.__create_variants(product.id, options, price, stock)
+            product_dict = cls.product_to_dict(product, options, variants, None)
+            cls.save_document(product.id, product_dict)
+            ProductSearch.index_products([{
+                'product_id': product.id,
+                'product_name': product.product_name,
+                'description': product.description,
+                'items': [item['item_name'] for option in options or [] for item in option['items']]
+            }])
 
-        cls._create_product(data)
-        cls.__create_product_options()
-        cls.__create_variants()
+        # the ID may be reused after a delete, and the reads of a missing product may have been cached
+        cls.invalidate_cache(product.id, 'variants', 'media')
+        ProductFacets.refresh_product(product.id)
 
         if get_obj:
-            return cls.product
-        return cls.retrieve_product(cls.product.id)
+            return product
+        return product_dict
 
     @classmethod
     def _create_product(cls, data: dict):
-        cls.price = data.pop('price', 0)
-        cls.stock = data.pop('stock', 0)
-        cls.options_data = data.pop('options', [])
+        """
+        Create the product row. Returns it with the price, the stock and the options of its variants, which are not
+        product columns.
+        """
+
+        data = dict(data)
+        price = data.pop('price', 0)
+        stock = data.pop('stock', 0)
+        options_data = data.pop('options', None) or []
+        cls.check_variants_count(options_data)
 
         if 'status' in data:
-            # Check if the value is one of the specified values, if not, set it to 'draft'
-            valid_statuses = ['active', 'archived', 'draft']
-            if data['status'] not in valid_statuses:
-                data['status'] = 'draft'
+            data['status'] = cls.valid_status(data['status'])
 
         # create a product
-        cls.product = Product.create(**data)
+        return Product.create(**data), price, stock, options_data
+
+    @staticmethod
+    def valid_status(status: str | None) -> str:
+        # Check if the value is one of the specified values, if not, set it to 'draft'
+        valid_statuses = ['active', 'archived', 'draft']
+        return status if status in valid_statuses else 'draft'
+
+    @classmethod
+    def bulk_create_products(cls, payloads: list[dict]) -> list[int]:
+        """
+        Create many products (`CreateProductIn` payloads) in a single transaction, with a few multi-row inserts for
+        the whole batch (products, options, items, variants) instead of a unit of work per product. The search index
+        and the documents are written in the same transaction, the cache and the facet index are refreshed after the
+        commit.
+
+        Returns:
+            IDs of the new products, in the order of `payloads`.
+        """
+
+        if not payloads:
+            return []
+        for payload in payloads:
+            cls.check_variants_count(payload.get('options'))
+
+        with DatabaseManager.transaction() as session:
+
+            # --- products ---
+            product_ids = Product.bulk_create([
+                {'product_name': payload['product_name'], 'description': payload.get('description'),
+                 'status': cls.valid_status(payload.get('status'))}
+                for payload in payloads
+            ])
+
+            # --- options & items ---
+            options = [(product_id, option) for product_id, payload in zip(product_ids, payloads)
+                       for option in payload.get('options') or []]
+            option_ids = ProductOption.bulk_create(
+                [{'product_id': product_id, 'option_name': option['option_name']} for product_id, option in options]
+            )
+            item_ids = iter(ProductOptionItem.bulk_create([
+                {'option_id': option_id, 'item_name': item}
+                for option_id, (_, option) in zip(option_ids, options)
+                for item in option['items']
+            ]))
+            items_by_product = defaultdict(list)
+            for product_id, option in options:
+                items_by_product[product_id].append([next(item_ids) for _ in option['items']])
+
+            # --- variants ---
+            # their IDs are not needed: a plain executemany, the ORM bulk insert would split the rows into a
+            # statement per run of rows with the same NULL options
+            rows = (
+                row
+                for product_id, payload in zip(product_ids, payloads)
+                for row in cls.variant_rows(product_id, items_by_product[product_id], payload.get('price', 0),
+                                            payload.get('stock', 0))
+            )
+            while batch := list(islice(rows, getattr(settings, 'VARIANTS_BATCH_SIZE', 500))):
+                session.execute(insert(ProductVariant), batch)
+
+            # --- search index & documents ---
+            ProductSearch.index_products([
+                {'product_id': product_id, 'product_name': payload['product_name'],
+                 'description': payload.get('description'),
+                 'items': [item for option in payload.get('options') or [] for item in option['items']]}
+                for product_id, payload in zip(product_ids, payloads)
+            ])
+            if settings.PRODUCT_DOCUMENTS:
+                ProductDocument.bulk_create([
+                    {'product_id': document['product_id'], 'document': document}
+                    for document in cls.__hydrate_from_tables(product_ids)
+                ])
+
+        # the IDs may be reused after a delete, and the reads of a missing product may have been cached
+        for product_id in product_ids:
+            cls.invalidate_cache(product_id, 'variants', 'media')
+        ProductFacets.refresh_products(product_ids)
+        return product_ids
 
     @classmethod
-    def __create_product_options(cls):
+    def __create_product_options(cls, product_id: int, options_data: list[dict]):
         """
         Create new option if it doesn't exist and update its items,
         and ensures that options are uniq in a product and also items in each option are uniq.
         """
 
-        if cls.options_data:
-            for option in cls.options_data:
+        if not options_data:
+            return None
 
-                # Creates a new instance of the ProductOption model, adds it to the database,
-                # and commits the transaction. Returns the newly created model instance
-                new_option = ProductOption.create(product_id=cls.product.id, option_name=option['option_name'])
+        # Creates all options, then all of their items, each with a single multi-row insert.
+        # Returns the primary keys in the same order as the rows.
+        option_ids = ProductOption.bulk_create(
+            [{'product_id': product_id, 'option_name': option['option_name']} for option in options_data]
+        )
+        item_ids = iter(ProductOptionItem.bulk_create([
+            {'option_id': option_id, 'item_name': item}
+            for option_id, option in zip(option_ids, options_data)
+            for item in option['items']
+        ]))
 
-                for item in option['items']:
-                    ProductOptionItem.create(option_id=new_option.id, item_name=item)
-            cls.options = cls.retrieve_options(cls.product.id)
-        else:
-            cls.options = None
+        return [
+            {
+                'options_id': option_id,
+                'option_name': option['option_name'],
+                'items': [{'item_id': next(item_ids), 'item_name': item} for item in option['items']]
+            }
+            for option_id, option in zip(option_ids, options_data)
+        ]
 
     @classmethod
     def retrieve_options(cls, product_id):
@@ -72,59 +188,116 @@ class ProductService:
         Get all options of a product
         """
 
-        product_options = []
-        options = ProductOption.filter(ProductOption.product_id == product_id).all()
-        for option in options:
-            # Retrieves records from the database based on a given filter condition.
-            # Returns a list of model instances matching the filter condition.
-            items = ProductOptionItem.filter(ProductOptionItem.option_id == option.id).all()
+        options = ProductOption.filter(ProductOption.product_id == product_id).options(
+            selectinload(ProductOption.option_items)
+        ).all()
+        return cls.options_to_dict(options)
 
-            product_options.append({
+    @staticmethod
+    def options_to_dict(options: list[ProductOption]):
+        product_options = [
+            {
                 'options_id': option.id,
                 'option_name': option.option_name,
-                'items': [{'item_id': item.id, 'item_name': item.item_name} for item in items]
-            })
+                'items': [{'item_id': item.id, 'item_name': item.item_name} for item in option.option_items]
+            }
+            for option in options
+        ]
         if product_options:
             return product_options
         else:
             return None
 
     @classmethod
-    def __create_variants(cls):
+    def __create_variants(cls, product_id: int, options: list[dict] | None, price, stock):
         """
         Create a default variant or create variants by options combination.
         """
 
-        if cls.options:
+        # create variants by options combination, or a default variant if there is no option. The combinations are
+        # streamed into multi-row inserts of `settings.VARIANTS_BATCH_SIZE` rows, never all held as rows at once.
+        items_id = [[item['item_id'] for item in option['items']] for option in options or []]
+        return cls.__insert_variants(cls.variant_rows(product_id, items_id, price, stock))
 
-            # create variants by options combination
-            items_id = cls.get_item_ids_by_product_id(cls.product.id)
-            variants = list(options_combination(*items_id))
-            for variant in variants:
-                values_tuple = tuple(variant)
+    @classmethod
+    def __insert_variants(cls, rows):
+        """
+        Insert the variant rows of an iterable, `settings.VARIANTS_BATCH_SIZE` rows per multi-row insert.
+        """
 
-                # set each value to an option and set none if it doesn't exist
-                while len(values_tuple) < 3:
-                    values_tuple += (None,)
-                option1, option2, option3 = values_tuple
+        batch_size = getattr(settings, 'VARIANTS_BATCH_SIZE', 500)
+        variants = []
+        while batch := list(islice(rows, batch_size)):
+            created = ProductVariant.bulk_create(batch, returning=[ProductVariant.id, ProductVariant.created_at])
+            variants.extend(
+                cls.variant_to_dict(ProductVariant(id=variant.id, created_at=variant.created_at, **row))
+                for variant, row in zip(created, batch)
+            )
+        return variants
 
-                ProductVariant.create(
-                    product_id=cls.product.id,
-                    option1=option1,
-                    option2=option2,
-                    option3=option3,
-                    price=cls.price,
-                    stock=cls.stock
-                )
-        else:
-            # set a default variant
-            ProductVariant.create(
-                product_id=cls.product.id,
-                price=cls.price,
-                stock=cls.stock
+    @staticmethod
+    def count_variants(options_data: list[dict] | None) -> int:
+        """
+        The number of variants the options would generate (the product of their numbers of items), without
+        generating them.
+        """
+
+        return math.prod(len(option['items']) for option in options_data or [])
+
+    @classmethod
+    def check_variants_count(cls, options_data: list[dict] | None):
+        """
+        Reject (422) the options generating more variants than `settings.MAX_PRODUCT_VARIANTS`.
+        """
+
+        max_variants = getattr(settings, 'MAX_PRODUCT_VARIANTS', None)
+        count = cls.count_variants(options_data)
+        if max_variants is not None and count > max_variants:
+            raise HTTPException(
+                status_code=422,
+                detail=f"The options generate {count} variants, a product can have at most {max_variants}."
             )
 
-        cls.variants = cls.retrieve_variants(cls.product.id)
+    @classmethod
+    def preview_variants(cls, options_data: list[dict] | None, limit: int = 10):
+        """
+        Dry run of the variants generation: their number and the first `limit` combinations of the options items,
+        nothing is written.
+        """
+
+        names = [option['items'] for option in options_data or []]
+        sample = [
+            dict(zip(('option1', 'option2', 'option3'), combination + (None,) * (3 - len(combination))))
+            for combination in islice(options_combination(*names), limit)
+        ]
+        max_variants = getattr(settings, 'MAX_PRODUCT_VARIANTS', None)
+        count = cls.count_variants(options_data)
+        return {
+            'count': count,
+            'max_variants': max_variants,
+            'allowed': max_variants is None or count <= max_variants,
+            'sample': sample
+        }
+
+    @staticmethod
+    def variant_rows(product_id: int, items_id: list[list[int]], price, stock):
+        """
+        Yield a variant row for each combination of the options items. Without options (an empty `items_id`)
+        it yields a single default variant.
+        """
+
+        for variant in options_combination(*items_id):
+
+            # set each value to an option and set none if it doesn't exist
+            option1, option2, option3 = variant + (None,) * (3 - len(variant))
+            yield {
+                'product_id': product_id,
+                'option1': option1,
+                'option2': option2,
+                'option3': option3,
+                'price': price,
+                'stock': stock
+            }
 
     @classmethod
     def retrieve_variants(cls, product_id):
@@ -132,33 +305,27 @@ class ProductService:
         Get all variants of a product
         """
 
-        product_variants = []
-        variants: list[ProductVariant] = ProductVariant.filter(ProductVariant.product_id == product_id).all()
-        for variant in variants:
-            product_variants.append(
-                {
-                    "variant_id": variant.id,
-                    "product_id": variant.product_id,
-                    "price": variant.price,
-                    "stock": variant.stock,
-                    "option1": variant.option1,
-                    "option2": variant.option2,
-                    "option3": variant.option3,
-                    "created_at": DateTime.string(variant.created_at),
-                    "updated_at": DateTime.string(variant.updated_at)
-                })
-
-        if product_variants:
-            return product_variants
-        return None
+        def load():
+            document = cls.retrieve_document(product_id)
+            if document is not None:
+                return document['variants']
 
-    @staticmethod
-    def retrieve_variant(variant_id: int):
+            variants: list[ProductVariant] = ProductVariant.filter(ProductVariant.product_id == product_id).all()
+            return [cls.variant_to_dict(variant) for variant in variants] or None
+
+        return CacheManager.get_or_set(cls.cache_key(product_id, 'variants'), load)
+
+    @classmethod
+    def retrieve_variant(cls, variant_id: int):
         variant = ProductVariant.get_or_404(variant_id)
-        variant_data = {
+        return cls.variant_to_dict(variant)
+
+    @staticmethod
+    def variant_to_dict(variant: ProductVariant):
+        return {
             "variant_id": variant.id,
             "product_id": variant.product_id,
-            "price": variant.price,
+            "price": float(variant.price) if variant.price is not None else None,
             "stock": variant.stock,
             "option1": variant.option1,
             "option2": variant.option2,
@@ -166,54 +333,268 @@ class ProductService:
             "created_at": DateTime.string(variant.created_at),
             "updated_at": DateTime.string(variant.updated_at)
         }
-        return variant_data
 
-    @classmethod
-    def get_item_ids_by_product_id(cls, product_id):
-        item_ids_by_option = []
-        item_ids_dict = {}
-        with DatabaseManager.session as session:
+    @staticmethod
+    def product_graph():
+        """
+        Loader options fetching the whole product graph (options with their items, variants and media) along with the
+        product: one query per table, 5 in total, whatever the number of options, items and variants.
+        """
 
-            # Query the ProductOptionItem table to retrieve item_ids
-            items = (
-                session.query(ProductOptionItem.option_id, ProductOptionItem.id)
-                .join(ProductOption)
-                .filter(ProductOption.product_id == product_id)
-                .all()
-            )
+        return (
+            selectinload(Product.options).selectinload(ProductOption.option_items),
+            selectinload(Product.variants),
+            selectinload(Product.media)
+        )
 
-            # Separate item_ids by option_id
-            for option_id, item_id in items:
-                if option_id not in item_ids_dict:
-                    item_ids_dict[option_id] = []
-                item_ids_dict[option_id].append(item_id)
+    @classmethod
+    def retrieve_product(cls, product_id):
+        def load():
+            document = cls.retrieve_document(product_id)
+            if document is not None:
+                if document['status'] == 'draft':
+                    raise HTTPException(status_code=404, detail="Product not found")
+                return document
 
-            # Append `item_ids` lists to the result list
-            item_ids_by_option.extend(item_ids_dict.values())
+            product = Product.filter(and_(Product.id == product_id, Product.status != 'draft')).options(
+                *cls.product_graph()
+            ).first()
+            if product is None:
+                raise HTTPException(status_code=404, detail="Product not found")
+            return cls.product_graph_to_dict(product)
 
-        return item_ids_by_option
+        return CacheManager.get_or_set(cls.cache_key(product_id), load)
 
     @classmethod
-    def retrieve_product(cls, product_id):
-        products = Product.filter(Product.status != 'draft')
-        cls.product = products.get(product_id)
-        cls.options = cls.retrieve_options(product_id)
-        cls.variants = cls.retrieve_variants(product_id)
-        cls.media = cls.retrieve_media_list(product_id)
-
-        product = {
-            'product_id': cls.product.id,
-            'product_name': cls.product.product_name,
-            'description': cls.product.description,
-            'status': cls.product.status,
-            'created_at': DateTime.string(cls.product.created_at),
-            'updated_at': DateTime.string(cls.product.updated_at),
-            'published_at': DateTime.string(cls.product.published_at),
-            'options': cls.options,
-            'variants': cls.variants,
-            'media': cls.media
+    def product_graph_to_dict(cls, product: Product):
+        """
+        Serialize a product loaded with `product_graph()`.
+        """
+
+        return cls.product_to_dict(
+            product,
+            cls.options_to_dict(product.options),
+            [cls.variant_to_dict(variant) for variant in product.variants] or None,
+            [cls.media_to_dict(media) for media in product.media] or None
+        )
+
+    @staticmethod
+    def product_to_dict(product: Product, options: list | None, variants: list | None, media: list | None):
+        return {
+            'product_id': product.id,
+            'product_name': product.product_name,
+            'description': product.description,
+            'status': product.status,
+            'created_at': DateTime.string(product.created_at),
+            'updated_at': DateTime.string(product.updated_at),
+            'published_at': DateTime.string(product.published_at),
+            'options': options,
+            'variants': variants,
+            'media': media
         }
-        return product
+
+    # ----------------------------------------------
+    # --- Awaitable readers (see FastModel.a*()) ---
+    # ----------------------------------------------
+
+    @classmethod
+    async def aretrieve_product(cls, product_id):
+        async def load():
+            document = await cls.aretrieve_document(product_id)
+            if document is not None:
+                if document['status'] == 'draft':
+                    raise HTTPException(status_code=404, detail="Product not found")
+                return document
+
+            products = await Product.afilter(and_(Product.id == product_id, Product.status != 'draft'),
+                                             *cls.product_graph())
+            if not products:
+                raise HTTPException(status_code=404, detail="Product not found")
+            return cls.product_graph_to_dict(products[0])
+
+        return await CacheManager.aget_or_set(cls.cache_key(product_id), load)
+
+    @classmethod
+    async def aretrieve_options(cls, product_id):
+        options = await ProductOption.afilter(ProductOption.product_id == product_id,
+                                              selectinload(ProductOption.option_items))
+        return cls.options_to_dict(options)
+
+    @classmethod
+    async def aretrieve_variants(cls, product_id):
+        async def load():
+            document = await cls.aretrieve_document(product_id)
+            if document is not None:
+                return document['variants']
+
+            variants = await ProductVariant.afilter(ProductVariant.product_id == product_id)
+            return [cls.variant_to_dict(variant) for variant in variants] or None
+
+        return await CacheManager.aget_or_set(cls.cache_key(product_id, 'variants'), load)
+
+    @classmethod
+    async def aretrieve_variant(cls, variant_id: int):
+        variant = await ProductVariant.aget_or_404(variant_id)
+        return cls.variant_to_dict(variant)
+
+    @classmethod
+    async def aretrieve_media_list(cls, product_id):
+        async def load():
+            document = await cls.aretrieve_document(product_id)
+            if document is not None:
+                return document['media']
+
+            product_media = await ProductMedia.afilter(ProductMedia.product_id == product_id)
+            return [cls.media_to_dict(media) for media in product_media] or None
+
+        return await CacheManager.aget_or_set(cls.cache_key(product_id, 'media'), load)
+
+    # ------------------------------------------
+    # --- Read-through cache (config.cache) ---
+    # ------------------------------------------
+
+    @staticmethod
+    def cache_key(product_id: int, part: str | None = None):
+        """
+        Cache key of a product (`retrieve_product()`), or of its 'variants' or 'media' list.
+        """
+
+        return f"product:{product_id}:{part}" if part else f"product:{product_id}"
+
+    @classmethod
+    def invalidate_cache(cls, product_id: int, *parts: str):
+        """
+        Drop the cached product, which embeds its variants and media, and the cached lists of `parts`, along with
+        their validators.
+        """
+
+        keys = [cls.cache_key(product_id)] + [cls.cache_key(product_id, part) for part in parts]
+        CacheManager.delete(*keys, *(f"{key}:validators" for key in keys))
+
+    @classmethod
+    def cached_validators(cls, product_id: int, part: str | None = None) -> dict | None:
+        """
+        The cached validators (ETag) of a product, or of its 'variants' or 'media' list, None if they aren't cached.
+        A conditional GET of an unchanged resource is answered from them, without a query or loading the body.
+        """
+
+        validators = CacheManager.get(f"{cls.cache_key(product_id, part)}:validators")
+        return None if validators is MISSING else validators
+
+    @classmethod
+    async def aretrieve_with_validators(cls, product_id: int, part: str | None = None):
+        """
+        A product (`aretrieve_product()`), or its 'variants' or 'media' list, along with its validators (ETag),
+        computed from the body loaded once, and cached for `cached_validators()`.
+
+        Returns:
+            (body, validators)
+        """
+
+        readers = {None: cls.aretrieve_product, 'variants': cls.aretrieve_variants, 'media': cls.aretrieve_media_list}
+        body = await readers[part](product_id)
+        validators = ConditionalRequest.validators(body)
+        CacheManager.set(f"{cls.cache_key(product_id, part)}:validators", validators)
+        return body, validators
+
+    # ------------------------------------------------------------
+    # --- Materialized documents (settings.PRODUCT_DOCUMENTS) ---
+    # ------------------------------------------------------------
+
+    @classmethod
+    def save_document(cls, product_id: int, document: dict):
+        """
+        Store the document of a product, in the current transaction.
+        """
+
+        if not settings.PRODUCT_DOCUMENTS:
+            return
+
+        with DatabaseManager.session_context() as session:
+            session.merge(ProductDocument(product_id=product_id, document=document))
+            ProductDocument._commit(session)
+
+    @classmethod
+    def refresh_document(cls, product_id: int):
+        """
+        Rebuild the document of a product from its tables, in the current transaction (call it after the write, in
+        the same `DatabaseManager.transaction()`), or drop it if the product is gone.
+        """
+
+        if not settings.PRODUCT_DOCUMENTS:
+            return
+
+        with DatabaseManager.session_context() as session:
+            product = session.scalars(
+                select(Product).filter(Product.id == product_id).options(*cls.product_graph())
+                .execution_options(populate_existing=True)
+            ).first()
+            if product is None:
+                session.execute(delete(ProductDocument).filter(ProductDocument.product_id == product_id))
+                ProductDocument._commit(session)
+                return
+
+        cls.save_document(product_id, cls.product_graph_to_dict(product))
+
+    @classmethod
+    def retrieve_document(cls, product_id: int):
+        if not settings.PRODUCT_DOCUMENTS:
+            return None
+        document = ProductDocument.get(product_id)
+        return document.document if document else None
+
+    @classmethod
+    async def aretrieve_document(cls, product_id: int):
+        if not settings.PRODUCT_DOCUMENTS:
+            return None
+        document = await ProductDocument.aget(product_id)
+        return document.document if document else None
+
+    @classmethod
+    def retrieve_documents(cls, product_ids: list[int]) -> dict:
+        """
+        The documents of `product_ids` by product ID, empty when `settings.PRODUCT_DOCUMENTS` is disabled.
+        """
+
+        if not settings.PRODUCT_DOCUMENTS:
+            return {}
+        with DatabaseManager.session_context() as session:
+            documents = session.scalars(select(ProductDocument).filter(ProductDocument.product_id.in_(product_ids)))
+            return {document.product_id: document.document for document in documents}
+
+    @classmethod
+    def rebuild_documents(cls, batch_size: int = 500) -> int:
+        """
+        Backfill or repair the documents of every product, a batch of products per transaction, and drop the
+        documents of deleted products.
+
+        Returns:
+            Number of documents written.
+        """
+
+        count, last_id = 0, 0
+        while True:
+            with DatabaseManager.session_context() as session:
+                product_ids = session.scalars(
+                    select(Product.id).filter(Product.id > last_id).order_by(Product.id).limit(batch_size)
+                ).all()
+            if not product_ids:
+                break
+
+            documents = cls.__hydrate_from_tables(product_ids)
+            with DatabaseManager.transaction() as session:
+                session.execute(delete(ProductDocument).filter(ProductDocument.product_id.in_(product_ids)))
+                ProductDocument.bulk_create(
+                    [{'product_id': document['product_id'], 'document': document} for document in documents]
+                )
+            for product_id in product_ids:
+                cls.invalidate_cache(product_id, 'variants', 'media')
+            count += len(documents)
+            last_id = product_ids[-1]
+
+        with DatabaseManager.transaction() as session:
+            session.execute(delete(ProductDocument).filter(ProductDocument.product_id.not_in(select(Product.id))))
+        return count
 
     @classmethod
     def update_product(cls, product_id, **kwargs):
@@ -223,68 +604,506 @@ class ProductService:
         kwargs['updated_at'] = DateTime.now()
 
         # --- update product ---
-        Product.update(product_id, **kwargs)
+        with DatabaseManager.transaction():
+            Product.update(product_id, **kwargs)
+            cls.refresh_document(product_id)
+            if 'product_name' in kwargs or 'description' in kwargs:
+                ProductSearch.reindex_product(product_id)
+        cls.invalidate_cache(product_id)
+        if 'status' in kwargs:
+            ProductFacets.refresh_product(product_id)
         return cls.retrieve_product(product_id)
 
     @classmethod
     def update_variant(cls, variant_id, **kwargs):
         # check variant exist
-        ProductVariant.get_or_404(variant_id)
+        variant = ProductVariant.get_or_404(variant_id)
 
         # TODO `updated_at` is autoupdate dont need to code
         kwargs['updated_at'] = DateTime.now()
-        ProductVariant.update(variant_id, **kwargs)
+        with DatabaseManager.transaction():
+            ProductVariant.update(variant_id, **kwargs)
+            cls.refresh_document(variant.product_id)
+        cls.invalidate_cache(variant.product_id, 'variants')
+        if 'price' in kwargs:
+            ProductFacets.refresh_product(variant.product_id)
 
         return cls.retrieve_variant(variant_id)
 
     @classmethod
-    def list_products(cls, limit: int = 12, status: Optional[str] = 'active'):
+    def bulk_update_variants(cls, updates: list[dict]) -> list[dict]:
+        """
+        Update the price and/or the stock of many variants in a single transaction: one `IN (...)` query to find the
+        variants, then one executemany `UPDATE` by primary key (`FastModel.bulk_update()`). The documents of their
+        products are refreshed in the transaction, the cache and the facet index (for the new prices) after the commit.
+
+        Args:
+            updates: Dicts with a `variant_id` and the `price` and/or `stock` to set (a None value is left as it is).
+
+        Returns:
+            {'variant_id', 'status'} per update, in the same order, the status is 'updated' or 'not_found'.
+        """
+
+        if not updates:
+            return []
+
+        now = DateTime.now()
+        with DatabaseManager.transaction() as session:
+            variant_ids = [update_data['variant_id'] for update_data in updates]
+            products = dict(session.execute(
+                select(ProductVariant.id, ProductVariant.product_id).filter(ProductVariant.id.in_(variant_ids))
+            ).all())
+
+            rows = []
+            for update_data in updates:
+                if update_data['variant_id'] not in products:
+                    continue
+                row = {'id': update_data['variant_id'], 'updated_at': now}
+                for key in ('price', 'stock'):
+                    if update_data.get(key) is not None:
+                        row[key] = update_data[key]
+                rows.append(row)
+            ProductVariant.bulk_update(rows)
+
+            product_ids = sorted({products[row['id']] for row in rows})
+            repriced = sorted({products[row['id']] for row in rows if 'price' in row})
+            cls.__refresh_documents(product_ids)
+
+        for product_id in product_ids:
+            cls.invalidate_cache(product_id, 'variants')
+        ProductFacets.refresh_products(repriced)
+        return [
+            {'variant_id': update_data['variant_id'],
+             'status': 'updated' if update_data['variant_id'] in products else 'not_found'}
+            for update_data in updates
+        ]
+
+    @classmethod
+    def __refresh_documents(cls, product_ids: list[int]):
+        """
+        `refresh_document()` of many products, with one query per table.
+        """
+
+        if not settings.PRODUCT_DOCUMENTS or not product_ids:
+            return
+
+        with DatabaseManager.session_context() as session:
+            session.execute(delete(ProductDocument).filter(ProductDocument.product_id.in_(product_ids)))
+            ProductDocument.bulk_create(
+                [{'product_id': document['product_id'], 'document': document}
+                 for document in cls.__hydrate_from_tables(product_ids)]
+            )
+
+    # ------------------------------------------------------
+    # --- Options editing (delta maintenance of variants) ---
+    # ------------------------------------------------------
+
+    # the variant column of the items of each option, the options in ID order
+    VARIANT_SLOTS = ('option1', 'option2', 'option3')
+
+    @staticmethod
+    def __product_options(session, product_id: int) -> list[ProductOption]:
+        Product.get_or_404(product_id)
+        return session.scalars(
+            select(ProductOption).filter(ProductOption.product_id == product_id).order_by(ProductOption.id)
+            .options(selectinload(ProductOption.option_items))
+        ).all()
+
+    @staticmethod
+    def __find_option(options: list[ProductOption], option_id: int) -> int:
+        """
+        The position of an option among the options of its product (the variant slot of its items).
+        """
+
+        for position, option in enumerate(options):
+            if option.id == option_id:
+                return position
+        raise HTTPException(status_code=404, detail="ProductOption not found")
+
+    @staticmethod
+    def __check_new_items(options: list[ProductOption], items: list[str]):
+        """
+        Items are unique in a product, as in `schemas.CreateProductIn`.
+        """
+
+        existing = {item.item_name for option in options for item in option.option_items}
+        for item in items:
+            if item in existing:
+                raise HTTPException(status_code=422, detail=f"Duplicate item found: {item}")
+            existing.add(item)
+
+    @classmethod
+    def __options_changed(cls, product_id: int):
+        """
+        Bring the derived data of a product up to date after its options changed: in the transaction the document and
+        the search index, after the commit the cache and the facet index.
+        """
+
+        cls.refresh_document(product_id)
+        ProductSearch.reindex_product(product_id)
+
+    @classmethod
+    def __after_options_commit(cls, product_id: int):
+        cls.invalidate_cache(product_id, 'variants')
+        ProductFacets.refresh_product(product_id)
+        return cls.hydrate_products([product_id])[0]
+
+    @classmethod
+    def add_option(cls, product_id: int, option_name: str, items: list[str], price: float | None = None,
+                   stock: int = 0):
+        """
+        Add an option to an existing product. The existing variants take its first item and keep their price and
+        stock, a copy of each of them is inserted for every other item (at `price`, or the price of the variant it
+        copies, and `stock`).
+        """
+
+        with DatabaseManager.transaction() as session:
+            options = cls.__product_options(session, product_id)
+            if len(options) >= len(cls.VARIANT_SLOTS):
+                raise HTTPException(status_code=422, detail="The number of options cannot exceed 3.")
+            if any(option.option_name == option_name for option in options):
+                raise HTTPException(status_code=422, detail=f"Duplicate option name found: {option_name}")
+            cls.__check_new_items(options, items)
+            cls.check_variants_count([{'items': option.option_items} for option in options] + [{'items': items}])
+
+            option_id = ProductOption.bulk_create([{'product_id': product_id, 'option_name': option_name}])[0]
+            item_ids = ProductOptionItem.bulk_create([{'option_id': option_id, 'item_name': item} for item in items])
+
+            slot = cls.VARIANT_SLOTS[len(options)]
+            variants = session.execute(
+                select(ProductVariant.option1, ProductVariant.option2, ProductVariant.option3, ProductVariant.price)
+                .filter(ProductVariant.product_id == product_id).order_by(ProductVariant.id)
+            ).all()
+            session.execute(
+                update(ProductVariant).filter(ProductVariant.product_id == product_id).values({slot: item_ids[0]})
+            )
+            cls.__insert_variants(
+                {**variant._asdict(), slot: item_id, 'product_id': product_id, 'stock': stock,
+                 'price': variant.price if price is None else price}
+                for item_id in item_ids[1:] for variant in variants
+            )
+            cls.__options_changed(product_id)
+
+        return cls.__after_options_commit(product_id)
+
+    @classmethod
+    def remove_option(cls, product_id: int, option_id: int):
+        """
+        Remove an option from a product. The variants of its first item are kept (with the option dropped from their
+        combination), the variants of its other items are deleted.
+        """
+
+        with DatabaseManager.transaction() as session:
+            options = cls.__product_options(session, product_id)
+            position = cls.__find_option(options, option_id)
+            slot = getattr(ProductVariant, cls.VARIANT_SLOTS[position])
+
+            session.execute(delete(ProductVariant).filter(
+                ProductVariant.product_id == product_id, slot != options[position].option_items[0].id
+            ))
+
+            # the items of the next options move down one slot
+            shifted = {
+                cls.VARIANT_SLOTS[index]: getattr(ProductVariant, cls.VARIANT_SLOTS[index + 1])
+                for index in range(position, len(cls.VARIANT_SLOTS) - 1)
+            }
+            shifted[cls.VARIANT_SLOTS[-1]] = None
+            session.execute(update(ProductVariant).filter(ProductVariant.product_id == product_id).values(shifted))
+
+            session.execute(delete(ProductOptionItem).filter(ProductOptionItem.option_id == option_id))
+            session.execute(delete(ProductOption).filter(ProductOption.id == option_id))
+            cls.__options_changed(product_id)
+
+        return cls.__after_options_commit(product_id)
+
+    @classmethod
+    def add_option_items(cls, product_id: int, option_id: int, items: list[str], price: float | None = None,
+                         stock: int = 0):
+        """
+        Add items to an option of a product, and insert only their variants: one per combination of the items of the
+        other options, at `price` (or the price of the same combination with the first item of the option) and
+        `stock`. The existing variants are untouched.
+        """
+
+        with DatabaseManager.transaction() as session:
+            options = cls.__product_options(session, product_id)
+            position = cls.__find_option(options, option_id)
+            cls.__check_new_items(options, items)
+            cls.check_variants_count([
+                {'items': option.option_items + (items if index == position else [])}
+                for index, option in enumerate(options)
+            ])
+
+            item_ids = ProductOptionItem.bulk_create([{'option_id': option_id, 'item_name': item} for item in items])
+
+            slot = cls.VARIANT_SLOTS[position]
+            siblings = session.execute(
+                select(ProductVariant.option1, ProductVariant.option2, ProductVariant.option3, ProductVariant.price)
+                .filter(ProductVariant.product_id == product_id,
+                        getattr(ProductVariant, slot) == options[position].option_items[0].id)
+                .order_by(ProductVariant.id)
+            ).all()
+            cls.__insert_variants(
+                {**sibling._asdict(), slot: item_id, 'product_id': product_id, 'stock': stock,
+                 'price': sibling.price if price is None else price}
+                for item_id in item_ids for sibling in siblings
+            )
+            cls.__options_changed(product_id)
+
+        return cls.__after_options_commit(product_id)
+
+    @classmethod
+    def remove_option_item(cls, product_id: int, option_id: int, item_id: int):
+        """
+        Remove an item from an option of a product, with only its variants.
+        """
+
+        with DatabaseManager.transaction() as session:
+            options = cls.__product_options(session, product_id)
+            position = cls.__find_option(options, option_id)
+            option = options[position]
+            if item_id not in {item.id for item in option.option_items}:
+                raise HTTPException(status_code=404, detail="ProductOptionItem not found")
+            if len(option.option_items) == 1:
+                raise HTTPException(status_code=422,
+                                    detail="An option needs at least one item, remove the option instead.")
+
+            slot = getattr(ProductVariant, cls.VARIANT_SLOTS[position])
+            session.execute(delete(ProductVariant).filter(ProductVariant.product_id == product_id, slot == item_id))
+            session.execute(delete(ProductOptionItem).filter(ProductOptionItem.id == item_id))
+            cls.__options_changed(product_id)
+
+        return cls.__after_options_commit(product_id)
+
+    @classmethod
+    def list_products(cls, limit: int | None = None, cursor: str | None = None, status: Optional[str] = 'active'):
+        """
+        A page of products, newest first, with keyset pagination on the product ID (backed by the `(status, id)`
+        index).
+
+        Returns the products and the cursor of the next page, None on the last page. `status=None` lists the
+        products of every status.
+        """
+
         # - if "default variant" is not set, first variant will be
         # - on list of products, for price, get it from "default variant"
         # - if price or stock of default variant is 0 then select first variant that is not 0
         # - or for price, get it from "less price"
         # do all of them with graphql and let the front devs decide witch query should be run.
 
-        # also can override the list `limit` in settings.py
-        if hasattr(settings, 'products_list_limit'):
+        # the default page size can be set in settings.py
+        if limit is None:
+            limit = settings.products_list_limit
+        limit = min(limit, settings.products_list_max_limit)
+
+        query = select(Product.id).order_by(Product.id.desc()).limit(limit + 1)
+        if status is not None:
+            query = query.filter(Product.status == status)
+        if cursor is not None:
+            query = query.filter(Product.id < Cursor.decode(cursor))
+
+        with DatabaseManager.session_context() as session:
+            product_ids = session.scalars(query).all()
+
+        next_cursor = None
+        if len(product_ids) > limit:
+            product_ids = product_ids[:limit]
+            next_cursor = Cursor.encode(product_ids[-1])
+
+        return cls.hydrate_products(product_ids), next_cursor
+
+    @classmethod
+    def list_product_summaries(cls, limit: int | None = None, cursor: str | None = None,
+                               status: Optional[str] = 'active'):
+        """
+        A page of light product cards for the category grids, newest first: the name, the min/max price and the total
+        stock of the variants, and the first media item. Paginated like `list_products()`.
+
+        The page costs one aggregated query (`GROUP BY` the product), the products are not hydrated. The IDs of the
+        page are picked first in a subquery (on the `(status, id)` index), so only the variants of the page are
+        aggregated.
+        """
+
+        if limit is None:
+            limit = settings.products_list_limit
+        limit = min(limit, settings.products_list_max_limit)
+
+        page = select(Product.id).order_by(Product.id.desc()).limit(limit + 1)
+        if status is not None:
+            page = page.filter(Product.status == status)
+        if cursor is not None:
+            page = page.filter(Product.id < Cursor.decode(cursor))
+
+        with DatabaseManager.session_context() as session:
+            rows = session.execute(cls.summary_query(page.scalar_subquery()).order_by(Product.id.desc())).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = Cursor.encode(rows[-1].id)
+
+        return [cls.summary_to_dict(row) for row in rows], next_cursor
+
+    @classmethod
+    def search_products(cls, query: str, limit: int | None = None, cursor: str | None = None,
+                        status: Optional[str] = 'active'):
+        """
+        A page of the product cards (see `list_product_summaries()`) matching the full-text `query`, most relevant
+        first (see `ProductSearch`).
+
+        Returns the products and the cursor of the next page, None on the last page. The ranking is not a keyset, so
+        the cursor holds the offset of the next page. A page costs two queries: the search, then the cards.
+        """
+
+        if limit is None:
             limit = settings.products_list_limit
+        limit = min(limit, settings.products_list_max_limit)
+        offset = Cursor.decode(cursor) if cursor is not None else 0
+
+        product_ids = ProductSearch.search(query, status=status, limit=limit + 1, offset=offset)
+        next_cursor = None
+        if len(product_ids) > limit:
+            product_ids = product_ids[:limit]
+            next_cursor = Cursor.encode(offset + limit)
+        if not product_ids:
+            return [], None
+
+        with DatabaseManager.session_context() as session:
+            rows = {row.id: row for row in session.execute(cls.summary_query(product_ids))}
+        return [cls.summary_to_dict(rows[product_id]) for product_id in product_ids if product_id in rows], next_cursor
 
-        products_list = []
+    @classmethod
+    def filter_products(cls, facets: dict[str, list[str]], min_price: float | None = None,
+                        max_price: float | None = None, limit: int | None = None, cursor: str | None = None,
+                        status: Optional[str] = 'active'):
+        """
+        A page of the product cards (see `list_product_summaries()`) matching the facets (`{'color': ['red', 'blue'],
+        'size': ['m']}`: any of the items of each option) and having a variant priced in [min_price, max_price], newest
+        first, with the facet counts (see `ProductFacets`).
 
-        with DatabaseManager.session as session:
-            products = session.execute(
-                select(Product.id).limit(limit).filter(Product.status == status)
+        Returns:
+            The products, the total number of matching products, the facet counts and the cursor of the next page.
+        """
+
+        if limit is None:
+            limit = settings.products_list_limit
+        limit = min(limit, settings.products_list_max_limit)
+        before_id = Cursor.decode(cursor) if cursor is not None else None
+
+        product_ids, total, counts, has_next = ProductFacets.filter(
+            facets, min_price=min_price, max_price=max_price, status=status, limit=limit, before_id=before_id
+        )
+        next_cursor = Cursor.encode(product_ids[-1]) if has_next else None
+
+        products = []
+        if product_ids:
+            with DatabaseManager.session_context() as session:
+                rows = {row.id: row for row in session.execute(cls.summary_query(product_ids))}
+            products = [cls.summary_to_dict(rows[product_id]) for product_id in product_ids if product_id in rows]
+        return products, total, counts, next_cursor
+
+    @staticmethod
+    def summary_query(product_ids):
+        """
+        The aggregated query of the product cards of `product_ids` (a list or a subquery of IDs).
+        """
+
+        first_media_id = (
+            select(func.min(ProductMedia.id)).filter(ProductMedia.product_id == Product.id)
+            .correlate(Product).scalar_subquery()
+        )
+        return (
+            select(
+                Product.id, Product.product_name,
+                func.min(ProductVariant.price).label('min_price'),
+                func.max(ProductVariant.price).label('max_price'),
+                func.coalesce(func.sum(ProductVariant.stock), 0).label('total_stock'),
+                ProductMedia.alt, ProductMedia.src
             )
+            .filter(Product.id.in_(product_ids))
+            .outerjoin(ProductVariant, ProductVariant.product_id == Product.id)
+            .outerjoin(ProductMedia, ProductMedia.id == first_media_id)
+            .group_by(Product.id, ProductMedia.id)
+        )
+
+    @classmethod
+    def summary_to_dict(cls, row):
+        return {
+            'product_id': row.id,
+            'product_name': row.product_name,
+            'min_price': float(row.min_price) if row.min_price is not None else None,
+            'max_price': float(row.max_price) if row.max_price is not None else None,
+            'total_stock': row.total_stock,
+            'media': {'src': cls.get_media_url(row.id, row.src), 'alt': row.alt} if row.src is not None else None
+        }
+
+    @classmethod
+    def hydrate_products(cls, product_ids: list[int]):
+        """
+        Serialize the products of `product_ids`, in that order, with their options, items, variants and media.
+
+        The products are read from their documents with one `IN (...)` query when `settings.PRODUCT_DOCUMENTS` is
+        enabled. Otherwise (or for the products without a document) the children of the whole page are fetched with one
+        `IN (...)` query per table and grouped in memory, so a page costs 5 queries whatever its size (instead of one
+        `retrieve_product()` per product).
+        """
+
+        if not product_ids:
+            return []
 
-        for product in products:
-            products_list.append(cls.retrieve_product(product.id))
-
-        return products_list
-        # --- list by join ----
-        # products_list = []
-        # with DatabaseManager.session as session:
-        #     products = select(
-        #         Product.id,
-        #         Product.product_name,
-        #         coalesce(ProductMedia.alt, None).label('alt'),
-        #         coalesce(ProductMedia.src, None).label('src'),
-        #         # media.alt,
-        #         ProductVariant.price,
-        #         ProductVariant.stock
-        #     ).outerjoin(ProductMedia).outerjoin(ProductVariant)
-        #     products = session.execute(products)
-        #
-        # for product in products:
-        #     media = {'src': product.src, 'alt': product.alt} if product.src is not None else None
-        #     products_list.append(
-        #         {
-        #             'product_id': product.id,
-        #             'product_name': product.product_name,
-        #             'price': product.price,
-        #             'stock': product.stock,
-        #             'media': media
-        #         }
-        #     )
+        documents = cls.retrieve_documents(product_ids)
+        missing = [product_id for product_id in product_ids if product_id not in documents]
+        if missing:
+            documents.update({product['product_id']: product for product in cls.__hydrate_from_tables(missing)})
+        return [documents[product_id] for product_id in product_ids if product_id in documents]
+
+    @classmethod
+    def __hydrate_from_tables(cls, product_ids: list[int]):
+
+        with DatabaseManager.session_context() as session:
+            products = session.scalars(select(Product).filter(Product.id.in_(product_ids))).all()
+            options = session.scalars(
+                select(ProductOption).filter(ProductOption.product_id.in_(product_ids)).order_by(ProductOption.id)
+            ).all()
+            items = session.scalars(
+                select(ProductOptionItem)
+                .filter(ProductOptionItem.option_id.in_([option.id for option in options]))
+                .order_by(ProductOptionItem.id)
+            ).all() if options else []
+            variants = session.scalars(
+                select(ProductVariant).filter(ProductVariant.product_id.in_(product_ids)).order_by(ProductVariant.id)
+            ).all()
+            media = session.scalars(
+                select(ProductMedia).filter(ProductMedia.product_id.in_(product_ids)).order_by(ProductMedia.id)
+            ).all()
+
+        items_by_option = defaultdict(list)
+        for item in items:
+            items_by_option[item.option_id].append({'item_id': item.id, 'item_name': item.item_name})
+        options_by_product = defaultdict(list)
+        for option in options:
+            options_by_product[option.product_id].append({
+                'options_id': option.id,
+                'option_name': option.option_name,
+                'items': items_by_option[option.id]
+            })
+        variants_by_product = defaultdict(list)
+        for variant in variants:
+            variants_by_product[variant.product_id].append(cls.variant_to_dict(variant))
+        media_by_product = defaultdict(list)
+        for media_item in media:
+            media_by_product[media_item.product_id].append(cls.media_to_dict(media_item))
+
+        products_by_id = {product.id: product for product in products}
+        return [
+            cls.product_to_dict(
+                products_by_id[product_id],
+                options_by_product.get(product_id),
+                variants_by_product.get(product_id),
+                media_by_product.get(product_id)
+            )
+            for product_id in product_ids if product_id in products_by_id
+        ]
 
     @classmethod
     def create_media(cls, product_id, alt, files):
@@ -295,14 +1114,17 @@ class ProductService:
         product: Product = Product.get_or_404(product_id)
         media_service = MediaService(parent_directory="/products", sub_directory=product_id)
 
-        for file in files:
-            file_name, file_extension = media_service.save_file(file)
-            ProductMedia.create(
-                product_id=product_id,
-                alt=alt if alt is not None else product.product_name,
-                src=file_name,
-                type=file_extension
-            )
+        with DatabaseManager.transaction():
+            for file in files:
+                file_name, file_extension = media_service.save_file(file)
+                ProductMedia.create(
+                    product_id=product_id,
+                    alt=alt if alt is not None else product.product_name,
+                    src=file_name,
+                    type=file_extension
+                )
+            cls.refresh_document(product_id)
+        cls.invalidate_cache(product_id, 'media')
 
         media = cls.retrieve_media_list(product_id)
         return media
@@ -312,23 +1134,16 @@ class ProductService:
         """
         Get all media of a product.
         """
-        media_list = []
-        product_media: list[ProductMedia] = ProductMedia.filter(ProductMedia.product_id == product_id).all()
-        for media in product_media:
-            media_list.append(
-                {
-                    "media_id": media.id,
-                    "product_id": media.product_id,
-                    "alt": media.alt,
-                    "src": cls.get_media_url(media.product_id, media.src),
-                    "type": media.type,
-                    "created_at": DateTime.string(media.created_at),
-                    "updated_at": DateTime.string(media.updated_at)
-                })
-        if media_list:
-            return media_list
-        else:
-            return None
+
+        def load():
+            document = cls.retrieve_document(product_id)
+            if document is not None:
+                return document['media']
+
+            product_media: list[ProductMedia] = ProductMedia.filter(ProductMedia.product_id == product_id).all()
+            return [cls.media_to_dict(media) for media in product_media] or None
+
+        return CacheManager.get_or_set(cls.cache_key(product_id, 'media'), load)
 
     @classmethod
     def retrieve_single_media(cls, media_id):
@@ -337,19 +1152,22 @@ class ProductService:
         """
         media_obj = ProductMedia.filter(ProductMedia.id == media_id).first()
         if media_obj:
-            media = {
-                "media_id": media_obj.id,
-                "product_id": media_obj.product_id,
-                "alt": media_obj.alt,
-                "src": cls.get_media_url(media_obj.product_id, media_obj.src),
-                "type": media_obj.type,
-                "created_at": DateTime.string(media_obj.created_at),
-                "updated_at": DateTime.string(media_obj.updated_at)
-            }
-            return media
+            return cls.media_to_dict(media_obj)
         else:
             return None
 
+    @classmethod
+    def media_to_dict(cls, media: ProductMedia):
+        return {
+            "media_id": media.id,
+            "product_id": media.product_id,
+            "alt": media.alt,
+            "src": cls.get_media_url(media.product_id, media.src),
+            "type": media.type,
+            "created_at": DateTime.string(media.created_at),
+            "updated_at": DateTime.string(media.updated_at)
+        }
+
     @staticmethod
     def get_media_url(product_id, file_name: str):
         return f"{BASE_URL}/media/products/{product_id}/{file_name}" if file_name is not None else None
@@ -367,15 +1185,18 @@ class ProductService:
 
         # TODO `updated_at` is autoupdate dont need to code
         kwargs['updated_at'] = DateTime.now()
-        ProductMedia.update(media_id, **kwargs)
+        with DatabaseManager.transaction():
+            ProductMedia.update(media_id, **kwargs)
+            cls.refresh_document(media.product_id)
+        cls.invalidate_cache(media.product_id, 'media')
 
         return cls.retrieve_single_media(media_id)
 
-    @staticmethod
-    def delete_product_media(product_id, media_ids: list[int]):
+    @classmethod
+    def delete_product_media(cls, product_id, media_ids: list[int]):
 
         # Fetch the product media records to be deleted
-        with DatabaseManager.session as session:
+        with DatabaseManager.transaction() as session:
             filters = [
                 and_(ProductMedia.product_id == product_id, ProductMedia.id == media_id)
                 for media_id in media_ids
@@ -385,11 +1206,17 @@ class ProductService:
             # Delete the product media records
             for media in media_to_delete:
                 ProductMedia.delete(ProductMedia.get_or_404(media.id))
+            cls.refresh_document(product_id)
+        cls.invalidate_cache(product_id, 'media')
         return None
 
-    @staticmethod
-    def delete_product(product_id):
-        Product.delete(Product.get_or_404(product_id))
+    @classmethod
+    def delete_product(cls, product_id):
+        with DatabaseManager.transaction():
+            Product.delete(Product.get_or_404(product_id))
+            ProductSearch.remove_product(product_id)
+        ProductFacets.remove_product(product_id)
+        cls.invalidate_cache(product_id, 'variants', 'media')
 
     @classmethod
     def delete_media_file(cls, media_id: int):
@@ -399,6 +1226,9 @@ class ProductService:
         media_service = MediaService(parent_directory="/products", sub_directory=product_id)
         is_fie_deleted = media_service.delete_file(media.src)
         if is_fie_deleted:
-            ProductMedia.delete(ProductMedia.get_or_404(media_id))
+            with DatabaseManager.transaction():
+                ProductMedia.delete(ProductMedia.get_or_404(media_id))
+                cls.refresh_document(product_id)
+            cls.invalidate_cache(product_id, 'media')
             return True
         return False
@@ -1,13 +1,16 @@
 import asyncio
 
 import pytest
-from fastapi import status
+from fastapi import status, HTTPException
 from fastapi.testclient import TestClient
 
+from apps.accounts.faker.data import FakeUser
 from apps.core.base_test_case import BaseTestCase
 from apps.main import app
 from apps.products.faker.data import FakeProduct
+from apps.products.models import Product, ProductVariant, ProductMedia
 from apps.products.services import ProductService
+from config import settings
 from config.database import DatabaseManager
 
 
@@ -247,6 +250,91 @@ class TestCreateProduct(ProductTestBase):
         # --- media ---
         assert expected['media'] is None
 
+    def test_create_product_is_atomic(self, monkeypatch):
+        """
+        Test a failure while creating the variants doesn't leave a half-built product.
+        """
+
+        def fail(*args, **kwargs):
+            raise RuntimeError('variants failed')
+
+        payload = FakeProduct.get_payload_with_options()
+        monkeypatch.setattr(ProductVariant, 'bulk_create', fail)
+        with pytest.raises(RuntimeError):
+            ProductService.create_product(payload.copy())
+
+        assert Product.filter(Product.product_name == payload['product_name']).count() == 0
+
+    def test_create_product_variants_in_batches(self, monkeypatch):
+        """
+        Test the variants are inserted in batches of `settings.VARIANTS_BATCH_SIZE`, in the order of the combinations.
+        """
+
+        monkeypatch.setattr(settings, 'VARIANTS_BATCH_SIZE', 4)
+        payload = FakeProduct.get_payload()
+        payload['options'] = [
+            {'option_name': 'color', 'items': ['red', 'green', 'blue']},
+            {'option_name': 'size', 'items': ['S', 'M', 'L']},
+            {'option_name': 'material', 'items': ['Cotton', 'Wool']}
+        ]
+        response = self.client.post(self.product_endpoint, json=payload)
+        assert response.status_code == status.HTTP_201_CREATED
+        product = response.json()['product']
+
+        items = {item['item_name']: item['item_id'] for option in product['options'] for item in option['items']}
+        combinations = [(variant['option1'], variant['option2'], variant['option3'])
+                        for variant in product['variants']]
+        assert len(combinations) == 18
+        assert len({variant['variant_id'] for variant in product['variants']}) == 18
+        assert combinations[0] == (items['red'], items['S'], items['Cotton'])
+        assert combinations[-1] == (items['blue'], items['L'], items['Wool'])
+        assert ProductVariant.filter(ProductVariant.product_id == product['product_id']).count() == 18
+
+    def test_create_product_over_max_variants(self, monkeypatch):
+        """
+        Test a product whose options generate more than `settings.MAX_PRODUCT_VARIANTS` variants is rejected, and
+        nothing is written.
+        """
+
+        monkeypatch.setattr(settings, 'MAX_PRODUCT_VARIANTS', 100)
+        payload = FakeProduct.get_payload()
+        payload['options'] = [
+            {'option_name': f'option{i}', 'items': [f'item{i}-{j}' for j in range(5)]} for i in range(3)
+        ]
+        response = self.client.post(self.product_endpoint, json=payload)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert '125 variants' in response.json()['detail']
+        assert Product.filter(Product.product_name == payload['product_name']).count() == 0
+
+    def test_preview_variants(self, monkeypatch):
+        """
+        Test the dry run of the variants generation returns their number and a sample, without writing anything.
+        """
+
+        monkeypatch.setattr(settings, 'MAX_PRODUCT_VARIANTS', 1000)
+        options = [
+            {'option_name': f'option{i}', 'items': [f'item{i}-{j}' for j in range(15)]} for i in range(3)
+        ]
+        products = Product.filter(Product.id > 0).count()
+        response = self.client.post(f'{self.product_endpoint}variants/preview', params={'limit': 3},
+                                    json={'options': options})
+        assert response.status_code == status.HTTP_200_OK
+        expected = response.json()
+        assert expected['count'] == 3375
+        assert expected['max_variants'] == 1000
+        assert expected['allowed'] is False
+        assert expected['sample'] == [
+            {'option1': 'item0-0', 'option2': 'item1-0', 'option3': 'item2-0'},
+            {'option1': 'item0-0', 'option2': 'item1-0', 'option3': 'item2-1'},
+            {'option1': 'item0-0', 'option2': 'item1-0', 'option3': 'item2-2'}
+        ]
+        assert Product.filter(Product.id > 0).count() == products
+
+        # without options, a product has a single default variant
+        response = self.client.post(f'{self.product_endpoint}variants/preview', json={})
+        assert response.json() == {'count': 1, 'max_variants': 1000, 'allowed': True,
+                                   'sample': [{'option1': None, 'option2': None, 'option3': None}]}
+
     # ---------------------
     # --- Test Payloads ---
     # ---------------------
@@ -534,6 +622,9 @@ class TestRetrieveProduct(ProductTestBase):
         response = self.client.get(f"{self.product_endpoint}{product.id}")
         assert response.status_code == status.HTTP_200_OK
 
+        # --- one query per table, whatever the number of options ---
+        self.assert_max_queries(response, 5)
+
         # --- response data ---
         expected = response.json()
         assert isinstance(expected['product'], dict)
@@ -705,6 +796,24 @@ class TestRetrieveProduct(ProductTestBase):
         response = self.client.get(f"{self.product_endpoint}{999999999}")
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
+    def test_retrieve_product_query_count(self):
+        """
+        Test the product graph is loaded in at most 5 queries (one per table), whatever the number of options and
+        variants. Without options the items query is skipped.
+        """
+
+        _, simple_product = FakeProduct.populate_product()
+        _, variable_product = FakeProduct.populate_product_with_options()
+
+        for product in (simple_product, variable_product):
+            with DatabaseManager.track_queries() as stats:
+                ProductService.retrieve_product(product.id)
+            assert stats.count <= 5
+
+            with DatabaseManager.track_queries() as stats:
+                asyncio.run(ProductService.aretrieve_product(product.id))
+            assert stats.count <= 5
+
     # ---------------------
     # --- Test Payloads ---
     # ---------------------
@@ -745,6 +854,98 @@ class TestListProduct(ProductTestBase):
             assert isinstance(product['product_id'], int)
             assert isinstance(product['product_name'], str)
 
+    def test_list_products_pagination(self):
+        """
+        Test paging through the products with the cursor: newest first, no product repeated or skipped.
+        """
+
+        DatabaseManager.drop_all_tables()
+        DatabaseManager.create_database_tables()
+        product_ids = [FakeProduct.populate_product()[1].id for _ in range(30)]
+
+        pages, cursor = [], None
+        while True:
+            products, cursor = ProductService.list_products(limit=12, cursor=cursor)
+            pages.append([product['product_id'] for product in products])
+            if cursor is None:
+                break
+
+        assert [len(page) for page in pages] == [12, 12, 6]
+        assert sum(pages, []) == sorted(product_ids, reverse=True)
+
+    def test_list_products_query_count(self):
+        """
+        Test a page costs the same number of queries whatever its size: the page IDs, then one query per table.
+        """
+
+        for _ in range(5):
+            FakeProduct.populate_product_with_options()
+
+        counts = []
+        for limit in (1, 5, 20):
+            with DatabaseManager.track_queries() as stats:
+                ProductService.list_products(limit=limit)
+            counts.append(stats.count)
+        assert counts == [6, 6, 6]
+
+    def test_list_products_max_limit(self):
+        products, _ = ProductService.list_products(limit=settings.products_list_max_limit + 1, status=None)
+        assert len(products) <= settings.products_list_max_limit
+
+    def test_list_products_invalid_cursor(self):
+        with pytest.raises(HTTPException) as error:
+            ProductService.list_products(cursor='not a cursor')
+        assert error.value.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_list_product_summaries(self):
+        """
+        Test a summary aggregates the variants (min/max price, total stock) and picks the first media item.
+        """
+
+        DatabaseManager.drop_all_tables()
+        DatabaseManager.create_database_tables()
+        _, product = FakeProduct.populate_product_with_options()
+        _, bare = FakeProduct.populate_product()
+        ProductMedia.create(product_id=product.id, alt='front', src='front.jpg', type='jpg')
+        ProductMedia.create(product_id=product.id, alt='back', src='back.jpg', type='jpg')
+
+        variants = ProductService.retrieve_variants(product.id)
+        with DatabaseManager.track_queries() as stats:
+            summaries, next_cursor = ProductService.list_product_summaries(limit=2)
+        assert stats.count == 1
+        assert next_cursor is None
+        assert [summary['product_id'] for summary in summaries] == [bare.id, product.id]
+
+        summary = summaries[1]
+        assert summary['min_price'] == min(variant['price'] for variant in variants)
+        assert summary['max_price'] == max(variant['price'] for variant in variants)
+        assert summary['total_stock'] == sum(variant['stock'] for variant in variants)
+        assert summary['media']['alt'] == 'front'
+        assert summary['media']['src'].endswith(f'/media/products/{product.id}/front.jpg')
+        assert summaries[0]['media'] is None
+
+    def test_list_product_summaries_pagination(self):
+        DatabaseManager.drop_all_tables()
+        DatabaseManager.create_database_tables()
+        product_ids = [FakeProduct.populate_product()[1].id for _ in range(5)]
+
+        pages, cursor = [], None
+        while True:
+            summaries, cursor = ProductService.list_product_summaries(limit=2, cursor=cursor)
+            pages.append([summary['product_id'] for summary in summaries])
+            if cursor is None:
+                break
+        assert sum(pages, []) == sorted(product_ids, reverse=True)
+
+    def test_list_product_summaries_endpoint(self):
+        FakeProduct.populate_product_with_options()
+        _, access_token = FakeUser.populate_admin()
+
+        response = self.client.get(f"{self.product_endpoint}summary", params={'token': access_token, 'limit': 50})
+        assert response.status_code == status.HTTP_200_OK
+        assert {'product_id', 'product_name', 'min_price', 'max_price', 'total_stock', 'media'} == \
+            set(response.json()['products'][0])
+
     # ---------------------
     # --- Test Payloads ---
     # ---------------------
@@ -0,0 +1,157 @@
+import pytest
+from fastapi import status, HTTPException
+
+from apps.products.faker.data import FakeProduct
+from apps.products.services import ProductService
+from apps.products.tests.test_product import ProductTestBase
+from config import settings
+from config.cache import CacheManager
+from config.database import DatabaseManager
+
+
+class TestProductCache(ProductTestBase):
+    """
+    Test the product reads are served from the cache, and the writes invalidate it.
+    """
+
+    @classmethod
+    def setup_class(cls):
+        settings.CACHE['backend'] = 'memory'
+        super().setup_class()
+
+    @classmethod
+    def teardown_class(cls):
+        settings.CACHE['backend'] = None
+        CacheManager()
+        super().teardown_class()
+
+    def test_retrieve_product_is_cached(self):
+        _, product = FakeProduct.populate_product_with_options()
+
+        ProductService.retrieve_product(product.id)
+        with DatabaseManager.track_queries() as stats:
+            response = self.client.get(f"{self.product_endpoint}{product.id}")
+            ProductService.retrieve_variants(product.id)
+            ProductService.retrieve_variants(product.id)
+        assert response.status_code == status.HTTP_200_OK
+        assert stats.count == 1  # the variants, the first time
+
+    def test_update_product_invalidates(self):
+        _, product = FakeProduct.populate_product()
+        ProductService.retrieve_product(product.id)
+
+        ProductService.update_product(product.id, product_name='Updated Name')
+        assert ProductService.retrieve_product(product.id)['product_name'] == 'Updated Name'
+
+    def test_update_variant_invalidates(self):
+        _, product = FakeProduct.populate_product()
+        variant = ProductService.retrieve_variants(product.id)[0]
+        ProductService.retrieve_product(product.id)
+
+        ProductService.update_variant(variant['variant_id'], price=99)
+        assert ProductService.retrieve_variants(product.id)[0]['price'] == 99
+        assert ProductService.retrieve_product(product.id)['variants'][0]['price'] == 99
+
+    def test_delete_product_invalidates(self):
+        _, product = FakeProduct.populate_product()
+        ProductService.retrieve_product(product.id)
+        ProductService.retrieve_media_list(product.id)
+
+        ProductService.delete_product(product.id)
+        with pytest.raises(HTTPException):
+            ProductService.retrieve_product(product.id)
+        assert ProductService.retrieve_variants(product.id) is None
+
+
+class TestConditionalRequests(ProductTestBase):
+    """
+    Test the product, variants and media endpoints answer conditional GETs with 304 while nothing changed.
+    """
+
+    @classmethod
+    def setup_class(cls):
+        settings.CACHE['backend'] = 'memory'
+        super().setup_class()
+
+    @classmethod
+    def teardown_class(cls):
+        settings.CACHE['backend'] = None
+        CacheManager()
+        super().teardown_class()
+
+    def test_retrieve_product_etag(self):
+        _, product = FakeProduct.populate_product_with_options()
+
+        response = self.client.get(f"{self.product_endpoint}{product.id}")
+        assert response.status_code == status.HTTP_200_OK
+        etag = response.headers['etag']
+        assert etag.startswith('"') and etag.endswith('"')
+
+        response = self.client.get(f"{self.product_endpoint}{product.id}", headers={'If-None-Match': etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b''
+        assert response.headers['etag'] == etag
+        self.assert_max_queries(response, 0)
+
+    def test_update_changes_etag(self):
+        _, product = FakeProduct.populate_product()
+        etag = self.client.get(f"{self.product_endpoint}{product.id}").headers['etag']
+
+        ProductService.update_product(product.id, product_name='Renamed Product')
+        response = self.client.get(f"{self.product_endpoint}{product.id}", headers={'If-None-Match': etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers['etag'] != etag
+        assert response.json()['product']['product_name'] == 'Renamed Product'
+
+    def test_deleted_variants_change_etag(self):
+        product = ProductService.create_product({
+            'product_name': 'Shirt', 'status': 'active', 'price': 10,
+            'options': [{'option_name': 'color', 'items': ['red', 'blue']}, {'option_name': 'size', 'items': ['S']}]
+        })
+        color = product['options'][0]
+        blue = color['items'][1]['item_id']
+        endpoints = [f"{self.product_endpoint}{product['product_id']}",
+                     f"{self.product_endpoint}{product['product_id']}/variants"]
+        etags = [self.client.get(endpoint).headers['etag'] for endpoint in endpoints]
+
+        # only rows are deleted, no timestamp moves forward
+        ProductService.remove_option_item(product['product_id'], color['options_id'], blue)
+        for endpoint, etag in zip(endpoints, etags):
+            response = self.client.get(endpoint, headers={'If-None-Match': etag})
+            assert response.status_code == status.HTTP_200_OK
+            assert 'last-modified' not in response.headers
+
+    def test_list_variants_etag(self):
+        _, product = FakeProduct.populate_product_with_options()
+        endpoint = f"{self.product_endpoint}{product.id}/variants"
+        etag = self.client.get(endpoint).headers['etag']
+
+        response = self.client.get(endpoint, headers={'If-None-Match': f'W/{etag}, "other"'})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        variant = ProductService.retrieve_variants(product.id)[0]
+        ProductService.update_variant(variant['variant_id'], stock=variant['stock'] + 1)
+        response = self.client.get(endpoint, headers={'If-None-Match': etag})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_without_cache(self, monkeypatch):
+        """
+        Without the cache, the body is loaded once per request: the validators are computed from it.
+        """
+
+        monkeypatch.setitem(settings.CACHE, 'backend', None)
+        CacheManager()
+        try:
+            _, product = FakeProduct.populate_product_with_options()
+            for endpoint, max_queries in ((f"{self.product_endpoint}{product.id}", 5),
+                                          (f"{self.product_endpoint}{product.id}/variants", 1)):
+                response = self.client.get(endpoint)
+                assert response.status_code == status.HTTP_200_OK
+                self.assert_max_queries(response, max_queries)
+
+                response = self.client.get(endpoint, headers={'If-None-Match': response.headers['etag']})
+                assert response.status_code == status.HTTP_304_NOT_MODIFIED
+                self.assert_max_queries(response, max_queries)
+        finally:
+            monkeypatch.undo()
+            CacheManager()
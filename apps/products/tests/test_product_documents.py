@@ -0,0 +1,188 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import delete
+from fastapi import status
+
+from apps.accounts.faker.data import FakeUser
+from apps.products.faker.data import FakeProduct
+from apps.products.models import Product, ProductDocument, ProductMedia
+from apps.products.services import ProductService
+from apps.products.tests.test_product import ProductTestBase
+from config import settings
+from config.cache import CacheManager
+from config.database import DatabaseManager
+
+
+class TestProductDocuments(ProductTestBase):
+    """
+    Test the materialized product documents (settings.PRODUCT_DOCUMENTS) stay equal to the normalized tables.
+    """
+
+    @classmethod
+    def setup_class(cls):
+        super().setup_class()
+        settings.PRODUCT_DOCUMENTS = True
+
+    @classmethod
+    def teardown_class(cls):
+        settings.PRODUCT_DOCUMENTS = False
+        super().teardown_class()
+
+    @staticmethod
+    def assert_document_is_fresh(product_id):
+        with DatabaseManager.session_context() as session:
+            product = session.get(Product, product_id, options=ProductService.product_graph(), populate_existing=True)
+            expected = ProductService.product_graph_to_dict(product)
+        assert ProductService.retrieve_document(product_id) == expected
+
+    def test_create_product(self):
+        _, product = FakeProduct.populate_product_with_options()
+        self.assert_document_is_fresh(product.id)
+
+    def test_writes_refresh_document(self):
+        _, product = FakeProduct.populate_product_with_options()
+
+        ProductService.update_product(product.id, product_name='Renamed Product')
+        self.assert_document_is_fresh(product.id)
+
+        variant = ProductService.retrieve_variants(product.id)[0]
+        ProductService.update_variant(variant['variant_id'], price=42)
+        self.assert_document_is_fresh(product.id)
+        assert ProductService.retrieve_product(product.id)['variants'][0]['price'] == 42
+
+    def test_delete_product_deletes_document(self):
+        _, product = FakeProduct.populate_product()
+        ProductService.delete_product(product.id)
+        assert ProductService.retrieve_document(product.id) is None
+
+    def test_retrieve_product_single_query(self):
+        _, product = FakeProduct.populate_product_with_options()
+        CacheManager.clear()
+
+        response = self.client.get(f"{self.product_endpoint}{product.id}")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers['server-timing'].endswith('desc="1 query"')
+
+    def test_rebuild_documents(self):
+        _, product = FakeProduct.populate_product_with_options()
+        _, other = FakeProduct.populate_product()
+        with DatabaseManager.transaction() as session:
+            session.execute(delete(ProductDocument).filter(ProductDocument.product_id == other.id))
+            ProductDocument.update(product.id, document={'product_id': product.id, 'corrupted': True})
+
+        assert ProductService.rebuild_documents(batch_size=1) >= 2
+        self.assert_document_is_fresh(product.id)
+        self.assert_document_is_fresh(other.id)
+
+
+class TestFastResponses(ProductTestBase):
+    """
+    Test the orjson fast path (settings.FAST_JSON_RESPONSES) sends the same bodies and headers as the validated one.
+    """
+
+    @classmethod
+    def setup_class(cls):
+        # an optional dependency, see settings.FAST_JSON_RESPONSES
+        pytest.importorskip("orjson")
+        super().setup_class()
+
+    @classmethod
+    def teardown_class(cls):
+        settings.FAST_JSON_RESPONSES = False
+        super().teardown_class()
+
+    def get_both(self, endpoint, **kwargs):
+        responses = []
+        for enabled in (False, True):
+            settings.FAST_JSON_RESPONSES = enabled
+            CacheManager.clear()
+            responses.append(self.client.get(endpoint, **kwargs))
+        settings.FAST_JSON_RESPONSES = False
+        return responses
+
+    def test_product_endpoints(self):
+        _, product = FakeProduct.populate_product_with_options()
+        ProductMedia.create(product_id=product.id, alt='front', src='front.jpg', type='jpg')
+        variant = ProductService.retrieve_variants(product.id)[0]
+
+        for endpoint in (f"{self.product_endpoint}{product.id}",
+                         f"{self.product_endpoint}{product.id}/variants",
+                         f"{self.product_endpoint}{product.id}/media",
+                         f"{self.product_endpoint}variants/{variant['variant_id']}"):
+            validated, fast = self.get_both(endpoint)
+            assert validated.status_code == fast.status_code == status.HTTP_200_OK
+            assert validated.json() == fast.json()
+            assert validated.headers.get('etag') == fast.headers.get('etag')
+            assert fast.headers['content-type'] == 'application/json'
+
+    def test_list_products(self):
+        for _ in range(3):
+            FakeProduct.populate_product_with_options()
+        _, access_token = FakeUser.populate_admin()
+
+        validated, fast = self.get_both(self.product_endpoint, params={'token': access_token})
+        assert validated.status_code == fast.status_code == status.HTTP_200_OK
+        assert validated.json() == fast.json()
+
+
+class TestConcurrentProductService(ProductTestBase):
+    """
+    Stress ProductService from a threadpool: concurrent creates and retrieves must never see each other's data.
+    """
+
+    THREADS = 16
+    PRODUCTS = 200
+
+    @staticmethod
+    def payload(index: int):
+        options = [
+            {'option_name': f'option-{index}-{number}', 'items': [f'item-{index}-{number}-{item}' for item in range(2)]}
+            for number in range(index % 4)
+        ]
+        return {'product_name': f'product-{index}', 'status': 'active', 'price': index, 'stock': index,
+                'options': options}
+
+    @staticmethod
+    def assert_consistent(product: dict, index: int):
+        assert product['product_name'] == f'product-{index}'
+        assert [option['option_name'] for option in product['options'] or []] == \
+            [f'option-{index}-{number}' for number in range(index % 4)]
+        assert len(product['variants']) == 2 ** (index % 4)
+        for variant in product['variants']:
+            assert variant['product_id'] == product['product_id']
+            assert variant['price'] == variant['stock'] == index
+
+    @staticmethod
+    def in_session(function, *args):
+        with DatabaseManager.session_scope():
+            return function(*args)
+
+    def test_concurrent_create_and_retrieve(self):
+        seeded = {index: ProductService.create_product(self.payload(index))['product_id'] for index in range(20)}
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+            creates = {
+                index: executor.submit(self.in_session, ProductService.create_product, self.payload(index))
+                for index in range(20, 20 + self.PRODUCTS)
+            }
+            retrieves = [
+                (index, executor.submit(self.in_session, ProductService.retrieve_product, product_id))
+                for _ in range(10) for index, product_id in seeded.items()
+            ]
+
+            for index, future in creates.items():
+                self.assert_consistent(future.result(), index)
+            for index, future in retrieves:
+                self.assert_consistent(future.result(), index)
+
+            created = {index: future.result()['product_id'] for index, future in creates.items()}
+            assert len(set(created.values())) == self.PRODUCTS
+
+            CacheManager.clear()
+            retrieves = [
+                (index, executor.submit(self.in_session, ProductService.retrieve_product, product_id))
+                for index, product_id in created.items()
+            ]
+            for index, future in retrieves:
+                self.assert_consistent(future.result(), index)
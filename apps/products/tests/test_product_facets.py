@@ -0,0 +1,156 @@
+import threading
+import time
+
+from fastapi import status
+
+from apps.accounts.faker.data import FakeUser
+from apps.products.models import Product
+from apps.products.facets import ProductFacets, FacetIndex
+from apps.products.services import ProductService
+from apps.products.tests.test_product import ProductTestBase
+from config import settings
+from config.database import DatabaseManager
+
+
+class TestProductFacets(ProductTestBase):
+    """
+    Test the faceted filtering of the products, and the incremental updates of the facet index.
+    """
+
+    def setup_method(self):
+        DatabaseManager.drop_all_tables()
+        DatabaseManager.create_database_tables()
+        ProductFacets.clear()
+
+    @classmethod
+    def teardown_class(cls):
+        ProductFacets.clear()
+        super().teardown_class()
+
+    @staticmethod
+    def create(options, price=10, product_status='active'):
+        return ProductService.create_product({'product_name': 'Shirt', 'status': product_status, 'price': price,
+                                              'options': options})['product_id']
+
+    @staticmethod
+    def filter_ids(facets, **kwargs):
+        products, total, counts, _ = ProductService.filter_products(facets, **kwargs)
+        assert total >= len(products)
+        return [product['product_id'] for product in products]
+
+    def test_filter_by_items(self):
+        red_m = self.create([{'option_name': 'Color', 'items': ['Red']}, {'option_name': 'size', 'items': ['M', 'L']}])
+        red_s = self.create([{'option_name': 'color', 'items': ['red']}, {'option_name': 'size', 'items': ['S']}])
+        blue_m = self.create([{'option_name': 'color', 'items': ['blue']}, {'option_name': 'size', 'items': ['M']}])
+
+        assert self.filter_ids({'color': ['red']}) == [red_s, red_m]
+        assert self.filter_ids({'color': ['red'], 'size': ['m']}) == [red_m]
+        assert self.filter_ids({'color': ['red', 'blue'], 'size': ['M']}) == [blue_m, red_m]
+        assert self.filter_ids({'color': ['green']}) == []
+        assert self.filter_ids({}) == [blue_m, red_s, red_m]
+
+    def test_filter_by_price(self):
+        cheap = self.create(None, price=9.99)
+        edge = self.create(None, price=50)
+        expensive = self.create(None, price=50.01)
+
+        assert self.filter_ids({}, max_price=50) == [edge, cheap]
+        assert self.filter_ids({}, min_price=50) == [expensive, edge]
+        assert self.filter_ids({}, min_price=9.995, max_price=50.005) == [edge]
+
+    def test_facet_counts(self):
+        self.create([{'option_name': 'color', 'items': ['red']}, {'option_name': 'size', 'items': ['M']}])
+        self.create([{'option_name': 'color', 'items': ['red']}, {'option_name': 'size', 'items': ['S']}])
+        self.create([{'option_name': 'color', 'items': ['blue']}, {'option_name': 'size', 'items': ['M']}])
+
+        _, total, counts, _ = ProductService.filter_products({'color': ['red']})
+        assert total == 2
+        # the counts of an option ignore its own selection
+        assert counts == {'color': {'red': 2, 'blue': 1}, 'size': {'m': 1, 's': 1}}
+
+    def test_writes_update_index(self):
+        ProductFacets.current()
+        product_id = self.create([{'option_name': 'color', 'items': ['red']}], price=20)
+        assert self.filter_ids({'color': ['red']}) == [product_id]
+
+        variant = ProductService.retrieve_variants(product_id)[0]
+        ProductService.update_variant(variant['variant_id'], price=80)
+        assert self.filter_ids({}, max_price=50) == []
+        assert self.filter_ids({}, min_price=50) == [product_id]
+
+        ProductService.update_product(product_id, status='archived')
+        assert self.filter_ids({'color': ['red']}) == []
+        assert self.filter_ids({'color': ['red']}, status='archived') == [product_id]
+
+        ProductService.delete_product(product_id)
+        assert self.filter_ids({'color': ['red']}, status=None) == []
+
+    def test_filter_by_wide_price_range(self):
+        prices = [0, 0.5, 1, 99.99, 100, 1234.5, 9999, 25000000]
+        product_ids = [self.create(None, price=price) for price in prices]
+
+        index = ProductFacets.current()
+        assert len(index.price_buckets) == len(prices)  # log buckets, not one per currency unit
+        assert self.filter_ids({}, min_price=1, max_price=9999) == product_ids[2:7][::-1]
+        assert self.filter_ids({}, min_price=100, max_price=1234.5) == product_ids[4:6][::-1]
+        assert self.filter_ids({}, min_price=10000) == [product_ids[-1]]
+        assert self.filter_ids({}, max_price=0.5) == product_ids[1::-1]
+
+        ProductService.delete_product(product_ids[3])
+        assert self.filter_ids({}, min_price=99, max_price=100) == [product_ids[4]]
+
+    def test_stale_index_is_rebuilt_in_background(self, monkeypatch):
+        index = ProductFacets.current()
+        # written by another worker: the index of this one isn't refreshed
+        other = Product.create(product_name='Other worker', status='active')
+
+        build = FacetIndex.build
+        written = []
+
+        def slow_build():
+            rebuilt = build()
+            # committed after the tables were read, applied to the previous index
+            written.append(self.create([{'option_name': 'color', 'items': ['red']}]))
+            return rebuilt
+
+        monkeypatch.setattr(FacetIndex, 'build', slow_build)
+        monkeypatch.setattr(settings, 'PRODUCT_FACETS_TTL', 0)
+        time.sleep(0.01)
+        assert ProductFacets.current() is index  # served from the stale index meanwhile
+        monkeypatch.setattr(settings, 'PRODUCT_FACETS_TTL', None)
+        for thread in threading.enumerate():
+            if thread.name == 'product-facets-rebuild':
+                thread.join(timeout=10)
+
+        assert ProductFacets.index is not index
+        assert self.filter_ids({}) == [written[0], other.id]
+        assert self.filter_ids({'color': ['red']}) == written
+
+    def test_filter_pagination(self):
+        product_ids = [self.create([{'option_name': 'color', 'items': ['red']}]) for _ in range(5)]
+
+        pages, cursor = [], None
+        while True:
+            products, total, _, cursor = ProductService.filter_products({'color': ['red']}, limit=2, cursor=cursor)
+            assert total == 5
+            pages.append([product['product_id'] for product in products])
+            if cursor is None:
+                break
+        assert sum(pages, []) == sorted(product_ids, reverse=True)
+
+    def test_filter_endpoint(self):
+        red = self.create([{'option_name': 'color', 'items': ['red']}, {'option_name': 'size', 'items': ['M']}])
+        self.create([{'option_name': 'color', 'items': ['blue']}, {'option_name': 'size', 'items': ['M']}], price=99)
+        _, access_token = FakeUser.populate_admin()
+
+        response = self.client.get(f"{self.product_endpoint}filter",
+                                   params={'token': access_token, 'facet': ['color:red,blue', 'size:m'],
+                                           'max_price': 50, 'utm_source': 'newsletter'})
+        assert response.status_code == status.HTTP_200_OK
+        body = response.json()
+        assert [product['product_id'] for product in body['products']] == [red]
+        assert body['total'] == 1
+        assert body['facets']['color'] == {'red': 1}
+
+        response = self.client.get(f"{self.product_endpoint}filter", params={'token': access_token, 'facet': 'color'})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
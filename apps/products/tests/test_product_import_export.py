@@ -0,0 +1,189 @@
+import csv
+import gzip
+import io
+import json
+import time
+
+import pytest
+from fastapi import status, HTTPException
+
+from apps.accounts.faker.data import FakeUser
+from apps.products.models import ProductMedia
+from apps.products.exports import ProductExport
+from apps.products.imports import ProductImport, ImportJob
+from apps.products.search import ProductSearch
+from apps.products.services import ProductService
+from apps.products.tests.test_product import ProductTestBase
+from config import settings
+from config.database import DatabaseManager
+
+
+class TestProductImport(ProductTestBase):
+    """
+    Test the bulk import of products from NDJSON and CSV files.
+    """
+
+    @staticmethod
+    def ndjson(*rows):
+        return io.BytesIO("\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows).encode())
+
+    def test_import_ndjson(self, monkeypatch):
+        monkeypatch.setattr(settings, 'MAX_PRODUCT_VARIANTS', 10)
+        file = self.ndjson(
+            {'product_name': 'Imported shirt', 'status': 'active', 'price': 20, 'stock': 3,
+             'options': [{'option_name': 'color', 'items': ['red', 'blue']}]},
+            {'product_name': 'Imported hat'},
+            '{"product_name": ',
+            {'product_name': 'Imported sock', 'price': -1},
+            '',
+            {'product_name': 'Imported coat', 'options': [{'option_name': 'size', 'items': list('abcdefghijk')}]},
+            {'product_name': 'Imported scarf', 'status': 'active'}
+        )
+        progress = []
+        job = ProductImport.run(file, 'ndjson', batch_size=2, on_progress=lambda job: progress.append(job.created))
+
+        assert (job.status, job.processed, job.created, job.failed) == ('done', 6, 3, 3)
+        assert [error['row'] for error in job.errors] == [3, 4, 6]
+        assert job.errors[0]['errors'][0].startswith('Invalid JSON')
+        assert job.errors[1]['errors'] == ['price: Value error, Price must be a positive number.']
+        assert '11 variants' in job.errors[2]['errors'][0]
+        assert progress == [2, 3]
+
+        product_id = ProductSearch.search('imported shirt')[0]
+        product = ProductService.retrieve_product(product_id)
+        assert [variant['price'] for variant in product['variants']] == [20, 20]
+        assert [variant['stock'] for variant in product['variants']] == [3, 3]
+
+    def test_import_csv(self):
+        file = io.BytesIO(
+            b"product_name,description,status,price,stock,option1_name,option1_items,option2_name,option2_items\n"
+            b"CSV shirt,A shirt,active,9.5,4,color,red|blue,size,S|M|L\n"
+            b"CSV hat,,active,,,,,,\n"
+            b",no name,active,1,1,,,,\n"
+        )
+        job = ProductImport.run(file, 'csv')
+
+        assert (job.status, job.created, job.failed) == ('done', 2, 1)
+        assert job.errors[0]['row'] == 3
+        product = ProductService.retrieve_product(ProductSearch.search('csv shirt')[0])
+        assert product['description'] == 'A shirt'
+        assert [option['option_name'] for option in product['options']] == ['color', 'size']
+        assert len(product['variants']) == 6
+        assert product['variants'][0]['price'] == 9.5
+        hat = ProductService.retrieve_product(ProductSearch.search('csv hat')[0])
+        assert hat['description'] is None
+        assert len(hat['variants']) == 1
+
+    def test_failed_batch_is_retried_row_by_row(self, monkeypatch):
+        bulk_create_products = ProductService.bulk_create_products
+
+        def fail(payloads):
+            if any(payload['product_name'] == 'Rejected' for payload in payloads):
+                raise RuntimeError('constraint failed')
+            return bulk_create_products(payloads)
+
+        monkeypatch.setattr(ProductService, 'bulk_create_products', fail)
+        file = self.ndjson({'product_name': 'Kept'}, {'product_name': 'Rejected'}, {'product_name': 'Kept too'})
+        job = ProductImport.run(file, 'ndjson')
+        assert (job.status, job.created, job.failed) == ('done', 2, 1)
+        assert job.errors == [{'row': 2, 'errors': ['constraint failed']}]
+        assert len(ProductSearch.search('kept', status=None)) == 2
+
+    def test_import_endpoint(self):
+        _, access_token = FakeUser.populate_admin()
+        file = self.ndjson({'product_name': 'Uploaded product', 'status': 'active'}, {'price': 1})
+        response = self.client.post(f"{self.product_endpoint}imports", params={'token': access_token},
+                                    files={'file': ('catalog.ndjson', file)})
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job_id = response.json()['job_id']
+
+        for _ in range(100):
+            response = self.client.get(f"{self.product_endpoint}imports/{job_id}", params={'token': access_token})
+            if response.json()['status'] in ('done', 'failed'):
+                break
+            time.sleep(0.05)
+        job = response.json()
+        assert (job['status'], job['created'], job['failed']) == ('done', 1, 1)
+        assert job['errors'][0]['row'] == 2
+        assert ProductSearch.search('uploaded product')
+
+        response = self.client.post(f"{self.product_endpoint}imports", params={'token': access_token},
+                                    files={'file': ('catalog.xml', io.BytesIO(b'<products/>'))})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        _, user_token = FakeUser.populate_user()
+        response = self.client.get(f"{self.product_endpoint}imports/{job_id}", params={'token': user_token})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_finished_jobs_are_dropped(self, monkeypatch):
+        finished, running = ImportJob('ndjson'), ImportJob('ndjson')
+        finished.finished_at = time.time() - ProductImport.FINISHED_JOBS_TTL - 1
+        monkeypatch.setattr(ProductImport, 'jobs', {finished.id: finished, running.id: running})
+
+        assert ProductImport.get_or_404(running.id) is running
+        assert finished.id not in ProductImport.jobs
+        with pytest.raises(HTTPException):
+            ProductImport.get_or_404(finished.id)
+
+
+class TestProductExport(ProductTestBase):
+    """
+    Test the streaming catalog export.
+    """
+
+    def setup_method(self):
+        DatabaseManager.drop_all_tables()
+        DatabaseManager.create_database_tables()
+        self.product_ids = [
+            ProductService.create_product({'product_name': 'Shirt', 'status': 'active', 'price': 10, 'stock': 2,
+                                           'options': [{'option_name': 'color', 'items': ['red', 'blue']},
+                                                       {'option_name': 'size', 'items': ['S']}]})['product_id'],
+            ProductService.create_product({'product_name': 'Hat', 'status': 'draft', 'price': 5})['product_id'],
+            ProductService.create_product({'product_name': 'Coat, "long"', 'status': 'active'})['product_id']
+        ]
+        ProductMedia.create(product_id=self.product_ids[0], src='shirt.jpg', alt='Shirt', type='jpg')
+
+    def test_export_ndjson(self):
+        partitions = list(ProductExport.iter_products(batch_size=2))
+        assert [len(products) for products in partitions] == [2, 1]
+
+        lines = b''.join(ProductExport.stream('ndjson', batch_size=2)).decode().splitlines()
+        assert [json.loads(line) for line in lines] == ProductService.hydrate_products(self.product_ids)
+
+        lines = b''.join(ProductExport.stream('ndjson', status='active')).decode().splitlines()
+        assert [json.loads(line)['product_id'] for line in lines] == [self.product_ids[0], self.product_ids[2]]
+
+    def test_export_csv(self):
+        rows = list(csv.DictReader(io.StringIO(b''.join(ProductExport.stream('csv', batch_size=1)).decode())))
+        assert len(rows) == 4
+        assert [(row['product_name'], row['option1_value'], row['option2_value']) for row in rows] == [
+            ('Shirt', 'red', 'S'), ('Shirt', 'blue', 'S'), ('Hat', '', ''), ('Coat, "long"', '', '')
+        ]
+        assert rows[0]['option1_name'] == 'color'
+        assert rows[0]['price'] == '10.0'
+        assert rows[0]['media'].endswith(f'/media/products/{self.product_ids[0]}/shirt.jpg')
+        assert rows[2]['media'] == ''
+
+    def test_export_gzip(self):
+        assert gzip.decompress(b''.join(ProductExport.stream('csv', compress=True))) == \
+            b''.join(ProductExport.stream('csv'))
+
+    def test_export_endpoint(self):
+        _, access_token = FakeUser.populate_admin()
+        response = self.client.get(f"{self.product_endpoint}export",
+                                   params={'token': access_token, 'format': 'csv', 'gzip': True})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers['content-type'] == 'application/gzip'
+        assert response.headers['content-disposition'] == 'attachment; filename="products.csv.gz"'
+        assert gzip.decompress(response.content).decode().startswith('product_id,product_name,')
+
+        response = self.client.get(f"{self.product_endpoint}export", params={'token': access_token})
+        assert response.headers['content-type'] == 'application/x-ndjson'
+        assert len(response.text.splitlines()) == 3
+
+        response = self.client.get(f"{self.product_endpoint}export", params={'token': access_token, 'format': 'xml'})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+        _, user_token = FakeUser.populate_user()
+        response = self.client.get(f"{self.product_endpoint}export", params={'token': user_token})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,171 @@
+import pytest
+from fastapi import status, HTTPException
+
+from apps.accounts.faker.data import FakeUser
+from apps.products.facets import ProductFacets
+from apps.products.search import ProductSearch
+from apps.products.services import ProductService
+from apps.products.tests.test_product import ProductTestBase
+from config import settings
+
+
+class TestEditOptions(ProductTestBase):
+    """
+    Test adding and removing options and items of an existing product: only the variants of the change are inserted
+    or deleted, the others keep their IDs, price and stock.
+    """
+
+    @classmethod
+    def teardown_class(cls):
+        ProductFacets.clear()
+        super().teardown_class()
+
+    @staticmethod
+    def create():
+        product = ProductService.create_product({
+            'product_name': 'Shirt', 'status': 'active', 'price': 10, 'stock': 5,
+            'options': [{'option_name': 'color', 'items': ['red', 'green']},
+                        {'option_name': 'size', 'items': ['S', 'M']}]
+        })
+        items = {item['item_name']: item['item_id'] for option in product['options'] for item in option['items']}
+        options = {option['option_name']: option['options_id'] for option in product['options']}
+        return product, options, items
+
+    @staticmethod
+    def variants(product):
+        return {(variant['option1'], variant['option2'], variant['option3']): variant for variant in product['variants']}
+
+    def test_add_option_items(self):
+        product, options, items = self.create()
+        red_s = self.variants(product)[items['red'], items['S'], None]
+        ProductService.update_variant(red_s['variant_id'], price=12, stock=1)
+
+        product = ProductService.add_option_items(product['product_id'], options['color'], ['blue'])
+        items['blue'] = product['options'][0]['items'][-1]['item_id']
+        variants = self.variants(product)
+        assert len(variants) == 6
+
+        # the existing variants are untouched
+        assert variants[items['red'], items['S'], None]['variant_id'] == red_s['variant_id']
+        assert variants[items['red'], items['S'], None]['stock'] == 1
+
+        # the new ones copy the price of the same combination with the first item
+        assert variants[items['blue'], items['S'], None]['price'] == 12
+        assert variants[items['blue'], items['S'], None]['stock'] == 0
+        assert variants[items['blue'], items['M'], None]['price'] == 10
+
+        product = ProductService.add_option_items(product['product_id'], options['size'], ['L', 'XL'], price=15,
+                                                  stock=3)
+        assert len(product['variants']) == 12
+        assert product['variants'][-1]['price'] == 15
+        assert product['variants'][-1]['stock'] == 3
+
+    def test_remove_option_item(self):
+        product, options, items = self.create()
+        kept = {variant['variant_id'] for variant in product['variants'] if variant['option2'] == items['S']}
+
+        product = ProductService.remove_option_item(product['product_id'], options['size'], items['M'])
+        assert {variant['variant_id'] for variant in product['variants']} == kept
+        assert [item['item_name'] for item in product['options'][1]['items']] == ['S']
+
+        with pytest.raises(HTTPException) as error:
+            ProductService.remove_option_item(product['product_id'], options['size'], items['S'])
+        assert error.value.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_add_option(self):
+        product, options, items = self.create()
+        before = {variant['variant_id'] for variant in product['variants']}
+
+        product = ProductService.add_option(product['product_id'], 'material', ['cotton', 'wool'])
+        items.update({item['item_name']: item['item_id'] for item in product['options'][2]['items']})
+        assert len(product['variants']) == 8
+
+        # the existing variants take the first item, the copies take the others
+        for variant in product['variants']:
+            if variant['variant_id'] in before:
+                assert (variant['option3'], variant['stock']) == (items['cotton'], 5)
+            else:
+                assert (variant['option3'], variant['stock']) == (items['wool'], 0)
+
+        with pytest.raises(HTTPException) as error:
+            ProductService.add_option(product['product_id'], 'style', ['casual'])
+        assert error.value.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_remove_option(self):
+        product, options, items = self.create()
+        red = {variant['variant_id'] for variant in product['variants'] if variant['option1'] == items['red']}
+
+        # the variants of the first item are kept, the next options move down one slot
+        product = ProductService.remove_option(product['product_id'], options['color'])
+        assert {variant['variant_id'] for variant in product['variants']} == red
+        assert set(self.variants(product)) == {(items['S'], None, None), (items['M'], None, None)}
+        assert [option['option_name'] for option in product['options']] == ['size']
+
+        product = ProductService.remove_option(product['product_id'], options['size'])
+        assert product['options'] is None
+        assert set(self.variants(product)) == {(None, None, None)}
+
+    def test_invalid_edits(self, monkeypatch):
+        product, options, items = self.create()
+
+        for edit, status_code in [
+            (lambda: ProductService.add_option_items(product['product_id'], options['size'], ['red']), 422),
+            (lambda: ProductService.add_option(product['product_id'], 'color', ['blue']), 422),
+            (lambda: ProductService.add_option_items(product['product_id'], 0, ['L']), 404),
+            (lambda: ProductService.remove_option_item(product['product_id'], options['size'], items['red']), 404),
+            (lambda: ProductService.remove_option(0, options['size']), 404)
+        ]:
+            with pytest.raises(HTTPException) as error:
+                edit()
+            assert error.value.status_code == status_code
+
+        monkeypatch.setattr(settings, 'MAX_PRODUCT_VARIANTS', 6)
+        with pytest.raises(HTTPException) as error:
+            ProductService.add_option_items(product['product_id'], options['size'], ['L', 'XL'])
+        assert error.value.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert len(ProductService.retrieve_variants(product['product_id'])) == 4
+
+    def test_derived_data_follow_edits(self):
+        product, options, items = self.create()
+        ProductFacets.current()
+        ProductService.retrieve_variants(product['product_id'])
+
+        ProductService.add_option_items(product['product_id'], options['color'], ['turquoise'])
+        assert product['product_id'] in ProductSearch.search('turquoise')
+        assert product['product_id'] in ProductFacets.filter({'color': ['turquoise']})[0]
+        assert len(ProductService.retrieve_variants(product['product_id'])) == 6
+
+        ProductService.remove_option(product['product_id'], options['color'])
+        assert ProductSearch.search('turquoise') == []
+        assert product['product_id'] not in ProductFacets.filter({'color': ['red']})[0]
+        assert len(ProductService.retrieve_variants(product['product_id'])) == 2
+
+    def test_endpoints(self):
+        product, options, items = self.create()
+        product_id = product['product_id']
+        _, access_token = FakeUser.populate_admin()
+
+        response = self.client.post(f"{self.product_endpoint}{product_id}/options/{options['size']}/items",
+                                    params={'token': access_token}, json={'items': ['L']})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(response.json()['product']['variants']) == 6
+
+        response = self.client.post(f"{self.product_endpoint}{product_id}/options", params={'token': access_token},
+                                    json={'option_name': 'material', 'items': ['cotton']})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(response.json()['product']['options']) == 3
+
+        response = self.client.delete(f"{self.product_endpoint}{product_id}/options/{options['size']}/items/"
+                                      f"{items['S']}", params={'token': access_token})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()['product']['variants']) == 4
+
+        response = self.client.delete(f"{self.product_endpoint}{product_id}/options/{options['color']}",
+                                      params={'token': access_token})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()['product']['variants']) == 2
+
+        _, user_token = FakeUser.populate_user()
+        response = self.client.post(f"{self.product_endpoint}{product_id}/options", params={'token': user_token},
+                                    json={'option_name': 'style', 'items': ['casual']})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,98 @@
+from fastapi import status
+
+from apps.accounts.faker.data import FakeUser
+from apps.products.search import ProductSearch
+from apps.products.services import ProductService
+from apps.products.tests.test_product import ProductTestBase
+from config.database import DatabaseManager
+
+
+class TestProductSearch(ProductTestBase):
+    """
+    Test the full-text search of the products, and the incremental maintenance of its index by the writes.
+    """
+
+    def setup_method(self):
+        DatabaseManager.drop_all_tables()
+        DatabaseManager.create_database_tables()
+
+    @staticmethod
+    def create(product_name, description=None, options=None, product_status='active'):
+        return ProductService.create_product({'product_name': product_name, 'description': description,
+                                              'status': product_status, 'options': options})
+
+    @staticmethod
+    def search_ids(query, **kwargs):
+        products, _ = ProductService.search_products(query, **kwargs)
+        return [product['product_id'] for product in products]
+
+    def test_search_ranking(self):
+        in_description = self.create('Plain tee', description='A shirt made of organic linen')
+        in_items = self.create('Plain top', options=[{'option_name': 'fabric', 'items': ['linen', 'cotton']}])
+        in_name = self.create('Linen shirt')
+        self.create('Wool socks')
+
+        assert self.search_ids('linen') == [in_name['product_id'], in_items['product_id'],
+                                            in_description['product_id']]
+
+    def test_search_prefix_and_all_words(self):
+        shirt = self.create('Blue linen shirt')
+        self.create('Blue wool socks')
+
+        assert self.search_ids('blu shi') == [shirt['product_id']]
+        assert self.search_ids('BLUE') != []
+        assert self.search_ids('blue linen socks') == []
+
+    def test_search_query_operators_are_words(self):
+        shirt = self.create('Shirt')
+        assert self.search_ids('"shirt" OR (NOT') == []
+        assert self.search_ids('shirt*^') == [shirt['product_id']]
+        assert self.search_ids('!!!') == []
+
+    def test_search_skips_drafts(self):
+        active = self.create('Linen shirt')
+        draft = self.create('Linen dress', product_status='draft')
+
+        assert self.search_ids('linen') == [active['product_id']]
+        assert set(self.search_ids('linen', status=None)) == {active['product_id'], draft['product_id']}
+
+    def test_update_and_delete_maintain_index(self):
+        product = self.create('Linen shirt')
+
+        ProductService.update_product(product['product_id'], product_name='Wool sweater')
+        assert self.search_ids('linen') == []
+        assert self.search_ids('sweater') == [product['product_id']]
+
+        ProductService.delete_product(product['product_id'])
+        assert self.search_ids('sweater') == []
+
+    def test_search_pagination(self):
+        product_ids = {self.create(f'Linen shirt {index}')['product_id'] for index in range(5)}
+
+        pages, cursor = [], None
+        while True:
+            products, cursor = ProductService.search_products('linen', limit=2, cursor=cursor)
+            pages.append([product['product_id'] for product in products])
+            if cursor is None:
+                break
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert set(sum(pages, [])) == product_ids
+
+    def test_rebuild_matches_incremental_index(self):
+        self.create('Linen shirt', options=[{'option_name': 'color', 'items': ['navy', 'teal']}])
+        self.create('Wool socks', description='Warm')
+        before = {query: self.search_ids(query) for query in ('linen', 'navy', 'warm', 'so')}
+
+        assert ProductSearch.rebuild() == 2
+        assert {query: self.search_ids(query) for query in before} == before
+
+    def test_search_endpoint(self):
+        product = self.create('Linen shirt')
+        _, access_token = FakeUser.populate_admin()
+
+        response = self.client.get(f"{self.product_endpoint}search", params={'token': access_token, 'q': 'linen'})
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['product_id'] for item in response.json()['products']] == [product['product_id']]
+
+        response = self.client.get(f"{self.product_endpoint}search", params={'token': access_token, 'q': 'nothing'})
+        assert response.status_code == status.HTTP_204_NO_CONTENT
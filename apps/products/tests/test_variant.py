@@ -131,3 +131,83 @@ class TestUpdateVariants(VariantTestBase):
             case _:
                 # To ensure that all case statements in my code are executed
                 raise ValueError(f"Unknown field(s): {field}")
+
+
+class TestBulkUpdateVariants(VariantTestBase):
+    """
+    Test updating many variants in a single request.
+    """
+
+    def test_bulk_update_variants(self):
+        """
+        Test each variant gets only the fields of its update, and the missing variants are reported.
+        """
+
+        _, product = FakeProduct.populate_product_with_options(get_product_obj=False)
+        variants = ProductService.retrieve_variants(product['product_id'])
+        first, second, third = variants[:3]
+
+        results = ProductService.bulk_update_variants([
+            {'variant_id': first['variant_id'], 'price': 4.99, 'stock': None},
+            {'variant_id': 0, 'price': 1, 'stock': 1},
+            {'variant_id': second['variant_id'], 'price': None, 'stock': 7},
+            {'variant_id': third['variant_id'], 'price': 0, 'stock': 0}
+        ])
+        assert results == [
+            {'variant_id': first['variant_id'], 'status': 'updated'},
+            {'variant_id': 0, 'status': 'not_found'},
+            {'variant_id': second['variant_id'], 'status': 'updated'},
+            {'variant_id': third['variant_id'], 'status': 'updated'}
+        ]
+
+        after = {variant['variant_id']: variant for variant in ProductService.retrieve_variants(product['product_id'])}
+        assert (after[first['variant_id']]['price'], after[first['variant_id']]['stock']) == (4.99, first['stock'])
+        assert (after[second['variant_id']]['price'], after[second['variant_id']]['stock']) == (second['price'], 7)
+        assert (after[third['variant_id']]['price'], after[third['variant_id']]['stock']) == (0, 0)
+        self.assert_datetime_format(after[first['variant_id']]['updated_at'])
+        assert after[variants[3]['variant_id']] == variants[3]
+
+    def test_bulk_update_documents(self, monkeypatch):
+        """
+        Test the materialized documents of the products follow the update.
+        """
+
+        from config import settings
+
+        monkeypatch.setattr(settings, 'PRODUCT_DOCUMENTS', True)
+        _, product = FakeProduct.populate_product_with_options(get_product_obj=False)
+        variant = ProductService.retrieve_variants(product['product_id'])[0]
+
+        ProductService.bulk_update_variants([{'variant_id': variant['variant_id'], 'price': 123, 'stock': None}])
+        document = ProductService.retrieve_document(product['product_id'])
+        assert document['variants'][0]['price'] == 123
+
+    def test_bulk_update_endpoint(self):
+        from apps.accounts.faker.data import FakeUser
+
+        _, product = FakeProduct.populate_product_with_options(get_product_obj=False)
+        variant = product['variants'][0]
+        _, access_token = FakeUser.populate_admin()
+
+        response = self.client.put(f"{self.variants_endpoint}bulk", params={'token': access_token}, json={
+            'variants': [{'variant_id': variant['variant_id'], 'price': 9.5}, {'variant_id': 0, 'stock': 3}]
+        })
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {'updated': 1, 'not_found': 1, 'results': [
+            {'variant_id': variant['variant_id'], 'status': 'updated'}, {'variant_id': 0, 'status': 'not_found'}
+        ]}
+        assert ProductService.retrieve_variant(variant['variant_id'])['price'] == 9.5
+
+        for payload in [
+            {'variants': []},
+            {'variants': [{'variant_id': variant['variant_id']}]},
+            {'variants': [{'variant_id': variant['variant_id'], 'price': -1}]},
+            {'variants': [{'variant_id': variant['variant_id'], 'stock': 1}] * 2}
+        ]:
+            response = self.client.put(f"{self.variants_endpoint}bulk", params={'token': access_token}, json=payload)
+            assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+        _, user_token = FakeUser.populate_user()
+        response = self.client.put(f"{self.variants_endpoint}bulk", params={'token': user_token},
+                                   json={'variants': [{'variant_id': variant['variant_id'], 'stock': 1}]})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,16 @@
+"""
+Benchmarks, each module is a script that runs against the test database:
+
+    python -m benchmarks.<module> --help
+"""
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
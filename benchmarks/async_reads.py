@@ -0,0 +1,101 @@
+"""
+Concurrency benchmark of the product read endpoints, with the sync engine vs the async engine.
+
+A mix of `GET /products/{id}`, `GET /products/{id}/variants` and `GET /products/{id}/media` requests is sent
+through the ASGI app at a fixed rate, while a share of the in-flight work is a slow query. With the sync engine the
+slow queries block the event loop and every other request waits behind them; with the async engine they don't.
+
+Usage:
+    python -m benchmarks.async_reads --requests 1000 --rate 100 --slow-ms 50
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from httpx import AsyncClient
+from sqlalchemy import event, func
+
+from apps.main import app
+from apps.products.faker.data import FakeProduct
+from apps.products.models import Product
+from benchmarks import percentile
+from config import settings
+from config.database import DatabaseManager
+
+
+def register_delay_function(engine):
+    """
+    Register `delay(ms)` on every new sqlite connection, it stands for a slow query on the database side.
+    """
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function("delay", 1, lambda ms: time.sleep(ms / 1000) or 0, deterministic=True)
+
+
+async def run(mode: str, product_ids: list[int], args):
+    """
+    Open-loop load: requests arrive at a fixed rate, and latency is measured from the arrival time, so the time a
+    request waits behind a blocked event loop is counted too.
+    """
+
+    client = AsyncClient(app=app, base_url="http://test")
+    paths = ["/products/{}", "/products/{}/variants", "/products/{}/media"]
+    latencies = []
+    interval = 1 / args.rate
+    loop = asyncio.get_running_loop()
+    begin = loop.time()
+
+    async def read(i: int):
+        arrival = begin + i * interval
+        await asyncio.sleep(max(0.0, arrival - loop.time()))
+
+        if args.slow_ms and i % args.slow_every == 0:
+            # the slow query is not measured, it only occupies the worker
+            await Product.afilter(func.delay(args.slow_ms) == 0)
+            return
+
+        path = random.choice(paths).format(random.choice(product_ids))
+        response = await client.get(path)
+        latencies.append(loop.time() - arrival)
+        assert response.status_code in (200, 204), response.text
+
+    await asyncio.gather(*(read(i) for i in range(args.requests)))
+    elapsed = loop.time() - begin
+    await client.aclose()
+
+    latencies.sort()
+    print(f"{mode:>5}: {len(latencies)} reads in {elapsed:.2f}s | "
+          f"p50 {percentile(latencies, 50) * 1000:.1f}ms | "
+          f"p95 {percentile(latencies, 95) * 1000:.1f}ms | "
+          f"p99 {percentile(latencies, 99) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rate", type=int, default=100, help="requests per second")
+    parser.add_argument("--slow-ms", type=int, default=50, help="duration of the slow query, 0 to disable it")
+    parser.add_argument("--slow-every", type=int, default=20, help="one slow query per N requests")
+    args = parser.parse_args()
+
+    DatabaseManager.create_test_database()
+    product_ids = [FakeProduct.populate_product_with_options()[1].id for _ in range(args.products)]
+
+    try:
+        for mode, is_async in (("sync", False), ("async", True)):
+            settings.DATABASE_ASYNC = is_async
+            DatabaseManager.create_test_database()
+            register_delay_function(DatabaseManager.engine)
+            DatabaseManager.engine.dispose()  # drop connections opened before the function was registered
+            if is_async:
+                register_delay_function(DatabaseManager.async_engine.sync_engine)
+            asyncio.run(run(mode, product_ids, args))
+    finally:
+        DatabaseManager.drop_all_tables()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Peak memory and time of a full catalog export, streamed (`ProductExport`) against built in memory (every product
+hydrated at once, then encoded).
+
+Usage:
+    python -m benchmarks.export_products --products 20000 50000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from apps.products.exports import ProductExport
+from apps.products.faker.data import FakeProduct
+from apps.products.services import ProductService
+from config.database import DatabaseManager
+
+
+def streamed() -> int:
+    return sum(len(chunk) for chunk in ProductExport.stream("ndjson", compress=True))
+
+
+def in_memory(product_ids: list[int]) -> int:
+    products = ProductService.hydrate_products(product_ids)
+    return len("".join(json.dumps(product) + "\n" for product in products).encode())
+
+
+def measure(export, *args) -> tuple[float, float, int]:
+    """
+    The time (s) and the peak of the memory allocated (MB) by an export, and the size of its output.
+    """
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = export(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak / 2 ** 20, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, nargs="+", default=[20000, 50000], help="catalog sizes")
+    args = parser.parse_args()
+
+    for count in args.products:
+        DatabaseManager.create_test_database()
+        try:
+            product_ids = FakeProduct.bulk_populate_products(count)
+            for name, export, export_args in (("streamed (gzip)", streamed, ()),
+                                              ("in memory", in_memory, (product_ids,))):
+                seconds, peak, size = measure(export, *export_args)
+                print(f"{count:>7} products | {name:>15} | {seconds:6.2f}s | peak {peak:7.1f}MB | {size} bytes")
+        finally:
+            DatabaseManager.drop_all_tables()
+
+
+if __name__ == "__main__":
+    main()
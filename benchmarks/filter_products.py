@@ -0,0 +1,65 @@
+"""
+Latency of the faceted filtering (`ProductService.filter_products()`) on a generated catalog, the time to build the
+in-memory facet index of a worker, and to re-index a product after a write.
+
+Usage:
+    python -m benchmarks.filter_products --products 100000 --runs 50
+"""
+import argparse
+import statistics
+import time
+
+from apps.products.facets import ProductFacets
+from apps.products.faker.data import FakeProduct
+from apps.products.services import ProductService
+from config.database import DatabaseManager
+
+QUERIES = {
+    "color=red": ({"color": ["red"]}, None, None),
+    "color=red&size=m": ({"color": ["red"], "size": ["m"]}, None, None),
+    "color=red,blue&size=m&max_price=50": ({"color": ["red", "blue"], "size": ["m"]}, None, 50),
+    "3 facets & 20.5<=price<=60.5": ({"color": ["red"], "size": ["m", "l"], "material": ["wool"]}, 20.5, 60.5),
+    "max_price=50": ({}, None, 50),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    DatabaseManager.create_test_database()
+    try:
+        start = time.perf_counter()
+        FakeProduct.bulk_populate_products(args.products, batch_size=1000)
+        print(f"seeded {args.products} products in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        ProductFacets.current()
+        print(f"facet index built in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        print(f"{'query':>36} | {'total':>6} | {'p50':>8} | {'p95':>8} | queries")
+        for label, (facets, min_price, max_price) in QUERIES.items():
+            latencies = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                with DatabaseManager.track_queries() as stats:
+                    _, total, _, _ = ProductService.filter_products(facets, min_price=min_price, max_price=max_price)
+                latencies.append((time.perf_counter() - start) * 1000)
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{label:>36} | {total:>6} | {statistics.median(latencies):6.2f}ms | {p95:6.2f}ms | {stats.count}")
+
+        index = ProductFacets.current()
+        product_ids = list(index.products)[:args.runs]
+        start = time.perf_counter()
+        ProductFacets.refresh_products(product_ids)
+        print(f"{len(index.price_buckets)} price buckets, re-indexing a written product takes "
+              f"{(time.perf_counter() - start) * 1000 / len(product_ids):.2f}ms")
+    finally:
+        ProductFacets.clear()
+        DatabaseManager.drop_all_tables()
+
+
+if __name__ == "__main__":
+    main()
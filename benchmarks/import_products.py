@@ -0,0 +1,63 @@
+"""
+Time to load a catalog: one `ProductService.create_product()` per product (what calling `POST /products/` per product
+costs, without the HTTP round trips) against the bulk import of an NDJSON file (`ProductImport`).
+
+Usage:
+    python -m benchmarks.import_products --products 5000 --batch-size 500
+"""
+import argparse
+import io
+import json
+import time
+
+from apps.products.faker.data import FakeProduct
+from apps.products.imports import ProductImport
+from apps.products.services import ProductService
+from config.database import DatabaseManager
+
+
+def payloads(count: int) -> list[dict]:
+    rows = []
+    for _ in range(count):
+        payload = FakeProduct.get_payload()
+        payload['status'] = 'active'
+        payload['options'] = FakeProduct.generate_random_options()
+        rows.append(payload)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500, help="products per transaction of the import")
+    args = parser.parse_args()
+
+    rows = payloads(args.products)
+    results = {}
+
+    DatabaseManager.create_test_database()
+    try:
+        start = time.perf_counter()
+        for payload in rows:
+            ProductService.create_product(payload)
+        results["create_product"] = time.perf_counter() - start
+    finally:
+        DatabaseManager.drop_all_tables()
+
+    DatabaseManager.create_test_database()
+    try:
+        file = io.BytesIO("\n".join(json.dumps(payload) for payload in rows).encode())
+        start = time.perf_counter()
+        job = ProductImport.run(file, "ndjson", batch_size=args.batch_size)
+        results["import"] = time.perf_counter() - start
+        assert job.created == args.products, job.to_dict()
+    finally:
+        DatabaseManager.drop_all_tables()
+
+    for name, seconds in results.items():
+        print(f"{name:>14}: {seconds:7.2f}s for {args.products} products ({args.products / seconds:8.0f} products/s)")
+    print(f"       speedup: {results['create_product'] / results['import']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Query count and latency of a `ProductService.list_products()` page, on a seeded catalog.
+
+The page is hydrated in batch (`ProductService.hydrate_products()`): one query for the page IDs, then one `IN (...)`
+query per table, whatever the page size. It's compared with the previous path, one `retrieve_product()` per product,
+and with the light product cards of `ProductService.list_product_summaries()` (one aggregated query).
+
+Usage:
+    python -m benchmarks.list_products --products 10000 --pages 20
+"""
+import argparse
+import time
+
+from apps.products.faker.data import FakeProduct
+from apps.products.services import ProductService
+from config.database import DatabaseManager
+
+PAGE_SIZES = (12, 50, 100)
+
+
+def per_product_hydration(product_ids: list[int]):
+    return [ProductService.retrieve_product(product_id) for product_id in product_ids]
+
+
+def measure(page_size: int, pages: int, hydrate):
+    """
+    Page through the first `pages` pages, returns the query counts of the pages and the mean latency (ms) of a page.
+    """
+
+    original, ProductService.hydrate_products = ProductService.hydrate_products, hydrate
+    try:
+        counts, cursor = set(), None
+        start = time.perf_counter()
+        for _ in range(pages):
+            with DatabaseManager.track_queries() as stats:
+                _, cursor = ProductService.list_products(limit=page_size, cursor=cursor)
+            counts.add(stats.count)
+        return counts, (time.perf_counter() - start) / pages * 1000
+    finally:
+        ProductService.hydrate_products = original
+
+
+def measure_summaries(page_size: int, pages: int):
+    counts, cursor = set(), None
+    start = time.perf_counter()
+    for _ in range(pages):
+        with DatabaseManager.track_queries() as stats:
+            _, cursor = ProductService.list_product_summaries(limit=page_size, cursor=cursor)
+        counts.add(stats.count)
+    return counts, (time.perf_counter() - start) / pages * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--pages", type=int, default=20, help="pages read per page size")
+    args = parser.parse_args()
+
+    DatabaseManager.create_test_database()
+    try:
+        start = time.perf_counter()
+        FakeProduct.bulk_populate_products(args.products)
+        print(f"seeded {args.products} products in {time.perf_counter() - start:.1f}s")
+
+        batched_counts = set()
+        print(f"{'page size':>9} | {'batched':>22} | {'per product':>22} | {'summaries':>22}")
+        for page_size in PAGE_SIZES:
+            counts, batched_ms = measure(page_size, args.pages, ProductService.hydrate_products)
+            batched_counts |= counts
+            legacy_counts, legacy_ms = measure(page_size, args.pages, per_product_hydration)
+            summary_counts, summary_ms = measure_summaries(page_size, args.pages)
+            print(f"{page_size:>9} | {max(counts):>4} queries {batched_ms:7.2f}ms | "
+                  f"{max(legacy_counts):>4} queries {legacy_ms:7.2f}ms | "
+                  f"{max(summary_counts):>4} queries {summary_ms:7.2f}ms")
+
+        assert len(batched_counts) == 1, f"the query count of a page depends on its size: {batched_counts}"
+    finally:
+        DatabaseManager.drop_all_tables()
+
+
+if __name__ == "__main__":
+    main()
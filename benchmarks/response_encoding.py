@@ -0,0 +1,73 @@
+"""
+Serialization time of a page of 100 products (`GET /products/?limit=100`), per encoding path.
+
+- validated: the default path of FastAPI, the service output is validated against the response model
+  (`ListProductOut`), serialized by pydantic then encoded with the stdlib json encoder (`JSONResponse`).
+- fast: `settings.FAST_JSON_RESPONSES`, the service output is encoded with orjson as it is (`ORJSONResponse`).
+
+Only the encoding is timed, the page is read from the database once.
+
+Usage:
+    python -m benchmarks.response_encoding --products 100 --rounds 200
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from apps.core.services.responses import ORJSONResponse
+from apps.products import schemas
+from apps.products.faker.data import FakeProduct
+from apps.products.services import ProductService
+from config.database import DatabaseManager
+
+FIELD = create_response_field(name="Response_list_produces", type_=schemas.ListProductOut)
+
+
+async def validated(content) -> bytes:
+    return JSONResponse(await serialize_response(field=FIELD, response_content=content)).body
+
+
+async def fast(content) -> bytes:
+    return ORJSONResponse(content).body
+
+
+async def measure(encode, content, rounds: int) -> tuple[float, int]:
+    """
+    The mean time (ms) to encode `content`, and the size of the body.
+    """
+
+    body = await encode(content)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await encode(content)
+    return (time.perf_counter() - start) / rounds * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100, help="products on the page")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    DatabaseManager.create_test_database()
+    try:
+        FakeProduct.bulk_populate_products(args.products)
+        products, next_cursor = ProductService.list_products(limit=args.products)
+        content = {"products": products, "next_cursor": next_cursor}
+    finally:
+        DatabaseManager.drop_all_tables()
+
+    results = {name: asyncio.run(measure(encode, content, args.rounds))
+               for name, encode in (("validated", validated), ("fast", fast))}
+    for name, (ms, size) in results.items():
+        per_100 = ms / len(products) * 100
+        print(f"{name:>9}: {ms:7.3f}ms per page of {len(products)} ({per_100:.3f}ms per 100 products), {size} bytes")
+    print(f"  speedup: {results['validated'][0] / results['fast'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
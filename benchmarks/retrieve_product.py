@@ -0,0 +1,102 @@
+"""
+Query count and latency of `ProductService.retrieve_product()` by product shape.
+
+The product graph is eager-loaded (`ProductService.product_graph()`), so the number of queries must not grow with the
+number of options, items and variants. It's compared with the previous lazy path: one query for the product, one for
+the options plus one per option for its items, then one for the variants and one for the media.
+
+sqlite runs in-process, so a query costs no network round trip; `--rtt-ms` adds one to every query to stand for a
+database server on the network (on localhost sqlite alone, the eager path spends a bit more CPU in the ORM).
+
+Usage:
+    python -m benchmarks.retrieve_product --reads 200 --rtt-ms 0.5
+"""
+import argparse
+import time
+
+from sqlalchemy import event
+
+from apps.products.models import Product, ProductOption, ProductOptionItem, ProductVariant, ProductMedia
+from apps.products.services import ProductService
+from config.database import DatabaseManager
+
+# (number of options, items per option)
+SHAPES = [(0, 0), (1, 5), (2, 5), (3, 3), (3, 6)]
+
+
+def lazy_retrieve(product_id: int):
+    product = Product.filter(Product.id == product_id).first()
+    options = [
+        {
+            "options_id": option.id,
+            "option_name": option.option_name,
+            "items": [
+                {"item_id": item.id, "item_name": item.item_name}
+                for item in ProductOptionItem.filter(ProductOptionItem.option_id == option.id).all()
+            ]
+        }
+        for option in ProductOption.filter(ProductOption.product_id == product_id).all()
+    ]
+    variants = ProductVariant.filter(ProductVariant.product_id == product_id).all()
+    media = ProductMedia.filter(ProductMedia.product_id == product_id).all()
+    return ProductService.product_to_dict(
+        product,
+        options or None,
+        [ProductService.variant_to_dict(variant) for variant in variants] or None,
+        [ProductService.media_to_dict(item) for item in media] or None
+    )
+
+
+def create_product(options: int, items: int):
+    return ProductService.create_product({
+        "product_name": f"Product {options}x{items}",
+        "description": "Benchmark product",
+        "status": "active",
+        "price": 10,
+        "stock": 5,
+        "options": [
+            {"option_name": f"option {o}", "items": [f"item {o}-{i}" for i in range(items)]} for o in range(options)
+        ]
+    })
+
+
+def measure(retrieve, product_id: int, reads: int):
+    with DatabaseManager.track_queries() as stats:
+        retrieve(product_id)
+    start = time.perf_counter()
+    for _ in range(reads):
+        retrieve(product_id)
+    return stats.count, (time.perf_counter() - start) / reads * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=200, help="reads per product shape")
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="network round trip added to each query")
+    args = parser.parse_args()
+
+    DatabaseManager.create_test_database()
+    if args.rtt_ms:
+        @event.listens_for(DatabaseManager.engine, "before_cursor_execute")
+        def round_trip(*_):
+            time.sleep(args.rtt_ms / 1000)
+
+    try:
+        eager_counts = set()
+        print(f"{'shape':>12} {'variants':>9} | {'eager':>18} | {'lazy':>18}")
+        for options, items in SHAPES:
+            product = create_product(options, items)
+            eager_queries, eager_ms = measure(ProductService.retrieve_product, product["product_id"], args.reads)
+            lazy_queries, lazy_ms = measure(lazy_retrieve, product["product_id"], args.reads)
+            if options:
+                eager_counts.add(eager_queries)
+            print(f"{options:>3} options x{items:>2} {len(product['variants']):>7} | "
+                  f"{eager_queries:>2} queries {eager_ms:5.2f}ms | {lazy_queries:>2} queries {lazy_ms:5.2f}ms")
+
+        assert len(eager_counts) == 1, f"the query count of retrieve_product depends on the options: {eager_counts}"
+    finally:
+        DatabaseManager.drop_all_tables()
+
+
+if __name__ == "__main__":
+    main()
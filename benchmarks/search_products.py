@@ -0,0 +1,86 @@
+"""
+Latency of the full-text product search (`ProductService.search_products()`) on a generated catalog.
+
+The catalog is seeded with `FakeProduct.bulk_populate_products()`, which indexes each batch as it's inserted, like the
+ProductService writes do. The queries are picked from the catalog: its most frequent word, a rare word, a 3-letter
+prefix, two words of the same product name and an option item, each read on the first page and on a deep page.
+
+Usage:
+    python -m benchmarks.search_products --products 100000 --runs 50
+"""
+import argparse
+import statistics
+import time
+from collections import Counter
+
+from sqlalchemy import select
+
+from apps.products.faker.data import FakeProduct
+from apps.products.models import Product
+from apps.products.services import ProductService
+from config.database import DatabaseManager
+from apps.products.search import WORD
+
+
+def pick_queries() -> dict[str, str]:
+    with DatabaseManager.session_context() as session:
+        names = session.scalars(select(Product.product_name).limit(5000)).all()
+    words = Counter(word for name in names for word in WORD.findall(name.lower()) if len(word) > 3)
+    (frequent, _), *_, (rare, _) = words.most_common()
+    two_words = next(name for name in names if len(WORD.findall(name)) >= 2)
+    return {
+        "frequent word": frequent,
+        "rare word": rare,
+        "prefix": frequent[:3],
+        "two words": " ".join(WORD.findall(two_words)[:2]),
+        "option item": "leather"
+    }
+
+
+def measure(query: str, runs: int, pages: int) -> tuple[list[float], int, int]:
+    """
+    The latencies (ms) of reading the page number `pages` of `query` (or its last page, if it has fewer), the page
+    number read and the number of queries of a page.
+    """
+
+    latencies, page, count = [], 0, 0
+    for _ in range(runs):
+        cursor = None
+        for page in range(1, pages + 1):
+            start = time.perf_counter()
+            with DatabaseManager.track_queries() as stats:
+                _, cursor = ProductService.search_products(query, limit=12, cursor=cursor)
+            elapsed = (time.perf_counter() - start) * 1000
+            count = stats.count
+            if cursor is None:
+                break
+        latencies.append(elapsed)
+    return latencies, page, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--deep-page", type=int, default=10, help="page number of the deep page reads")
+    args = parser.parse_args()
+
+    DatabaseManager.create_test_database()
+    try:
+        start = time.perf_counter()
+        FakeProduct.bulk_populate_products(args.products, batch_size=1000)
+        print(f"seeded and indexed {args.products} products in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'query':>28} | {'page':>4} | {'p50':>8} | {'p95':>8} | queries")
+        for label, query in pick_queries().items():
+            for pages in (1, args.deep_page):
+                latencies, page, count = measure(query, args.runs, pages)
+                p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+                print(f"{label + ' ' + repr(query):>28} | {page:>4} | {statistics.median(latencies):6.2f}ms | "
+                      f"{p95:6.2f}ms | {count}")
+    finally:
+        DatabaseManager.drop_all_tables()
+
+
+if __name__ == "__main__":
+    main()
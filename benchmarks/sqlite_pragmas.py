@@ -0,0 +1,65 @@
+"""
+Write and read throughput of sqlite with and without the performance profile (`settings.SQLITE_PERFORMANCE_PROFILE`).
+
+- writes: `ProductService.create_product()` of products with options, one transaction each.
+- reads: `ProductService.aretrieve_product()` of random products, from a few threads at once.
+
+Usage:
+    python -m benchmarks.sqlite_pragmas --products 500 --reads 2000 --threads 4
+"""
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from apps.products.faker.data import FakeProduct
+from apps.products.services import ProductService
+from config import settings
+from config.database import DatabaseManager
+
+
+def read(product_ids: list[int], count: int):
+    with DatabaseManager.session_scope():
+        for _ in range(count):
+            asyncio.run(ProductService.aretrieve_product(random.choice(product_ids)))
+
+
+def run(profile: str, args):
+    DatabaseManager.create_test_database()
+
+    start = time.perf_counter()
+    product_ids = [FakeProduct.populate_product_with_options()[1].id for _ in range(args.products)]
+    writes = args.products / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        for future in [executor.submit(read, product_ids, args.reads // args.threads) for _ in range(args.threads)]:
+            future.result()
+    reads = args.reads / (time.perf_counter() - start)
+
+    print(f"{profile:>8}: {writes:8.1f} product writes/s | {reads:8.1f} product reads/s")
+
+    # leave the test database in the default journal mode
+    DatabaseManager.engine.dispose()
+    with DatabaseManager.engine.connect() as connection:
+        connection.execute(text("PRAGMA journal_mode = DELETE"))
+    DatabaseManager.drop_all_tables()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    for profile, enabled in (("default", False), ("tuned", True)):
+        settings.SQLITE_PERFORMANCE_PROFILE = enabled
+        run(profile, args)
+
+
+if __name__ == "__main__":
+    main()
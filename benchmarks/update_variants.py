@@ -0,0 +1,59 @@
+"""
+Throughput of a repricing run: `ProductService.update_variant()` per variant (what `PUT /products/variants/{id}` per
+variant costs, without the HTTP round trips) against `ProductService.bulk_update_variants()` (`PUT
+/products/variants/bulk`).
+
+Usage:
+    python -m benchmarks.update_variants --variants 10000 --single 1000
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import select
+
+from apps.products.faker.data import FakeProduct
+from apps.products.models import ProductVariant
+from apps.products.services import ProductService
+from config.database import DatabaseManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", type=int, default=10000, help="variants updated by the bulk update")
+    parser.add_argument("--single", type=int, default=1000, help="variants updated one at a time (it's slow)")
+    args = parser.parse_args()
+
+    DatabaseManager.create_test_database()
+    try:
+        # ~4 variants per product with the random options of the faker
+        variant_ids = []
+        while len(variant_ids) < args.variants:
+            FakeProduct.bulk_populate_products(args.variants // 2)
+            with DatabaseManager.session_context() as session:
+                variant_ids = session.scalars(select(ProductVariant.id)).all()
+        variant_ids = variant_ids[:args.variants]
+
+        start = time.perf_counter()
+        for variant_id in variant_ids[:args.single]:
+            ProductService.update_variant(variant_id, price=round(random.uniform(1, 100), 2))
+        single = (time.perf_counter() - start) / args.single
+
+        updates = [{"variant_id": variant_id, "price": round(random.uniform(1, 100), 2), "stock": random.randint(0, 50)}
+                   for variant_id in variant_ids]
+        start = time.perf_counter()
+        results = ProductService.bulk_update_variants(updates)
+        bulk = time.perf_counter() - start
+        assert all(result["status"] == "updated" for result in results)
+    finally:
+        DatabaseManager.drop_all_tables()
+
+    print(f"  one at a time: {single * 1000:7.3f}ms per variant ({1 / single:8.0f} variants/s, "
+          f"{single * args.variants:.1f}s for {args.variants})")
+    print(f"    bulk update: {bulk / args.variants * 1000:7.3f}ms per variant ({args.variants / bulk:8.0f} variants/s, "
+          f"{bulk:.2f}s for {args.variants})")
+    print(f"        speedup: {single * args.variants / bulk:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
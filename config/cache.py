@@ -0,0 +1,223 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from . import settings
+
+# returned by `get()` on a miss, so that None can be cached too
+MISSING = object()
+
+
+class CacheStats:
+    """
+    Counters of a cache backend, per process.
+
+    Attributes:
+        hits (int): Lookups that found a live entry.
+        misses (int): Lookups that found nothing, or an expired entry.
+        evictions (int): Entries dropped to make room for new ones (`max_entries`).
+        expirations (int): Entries dropped because they outlived the TTL.
+        invalidations (int): Entries deleted on a write.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def to_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+
+class LRUCache:
+    """
+    A thread-safe in-process cache, bounded by a number of entries (least recently used first out) and a TTL.
+
+    Values are stored as they are: treat what `get()` returns as read-only.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return MISSING
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.stats.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        return {"backend": "memory", "entries": len(self._entries), "max_entries": self.max_entries,
+                "ttl": self.ttl, **self.stats.to_dict()}
+
+
+class RedisCache:
+    """
+    A cache on a Redis-protocol server (Redis, Valkey, KeyDB, ...), shared by every worker process.
+
+    Values are stored as JSON, with the TTL set on the server, which also handles the evictions (`maxmemory-policy`).
+    Needs the `redis` package: pip install redis
+    """
+
+    def __init__(self, url: str, ttl: float = 300, prefix: str = "fast_store:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis cache backend needs the `redis` package: pip install redis") from e
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+
+    def get(self, key: str):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.stats.misses += 1
+            return MISSING
+        self.stats.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(self.ttl))
+
+    def delete(self, *keys: str):
+        if keys:
+            self.stats.invalidations += self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def info(self):
+        server = self.client.info("stats")
+        return {"backend": "redis", "ttl": self.ttl, **self.stats.to_dict(),
+                "server_evictions": server.get("evicted_keys"), "server_expirations": server.get("expired_keys")}
+
+
+class CacheManager:
+    """
+    The read-through cache of the app, configured by `settings.CACHE`.
+
+    Example Usage:
+        product = CacheManager.get_or_set(f"product:{product_id}", lambda: load_product(product_id))
+        CacheManager.delete(f"product:{product_id}")  # after the product is updated
+    """
+
+    backend: LRUCache | RedisCache | None = None
+
+    @classmethod
+    def __init__(cls):
+        config = getattr(settings, "CACHE", None) or {}
+        backend = config.get("backend")
+        if backend == "memory":
+            cls.backend = LRUCache(max_entries=config.get("max_entries", 10000), ttl=config.get("ttl", 300))
+        elif backend == "redis":
+            cls.backend = RedisCache(config["url"], ttl=config.get("ttl", 300))
+        elif backend is None:
+            cls.backend = None
+        else:
+            raise ValueError(f"Unknown cache backend: {backend}")
+
+    @classmethod
+    def get(cls, key: str):
+        """
+        The cached value of `key`, or `MISSING`.
+        """
+
+        if cls.backend is None:
+            return MISSING
+        return cls.backend.get(key)
+
+    @classmethod
+    def set(cls, key: str, value):
+        if cls.backend is not None:
+            cls.backend.set(key, value)
+
+    @classmethod
+    def get_or_set(cls, key: str, load):
+        """
+        The cached value of `key`, or the value returned by `load()`, which is then cached.
+        """
+
+        value = cls.get(key)
+        if value is MISSING:
+            value = load()
+            cls.set(key, value)
+        return value
+
+    @classmethod
+    async def aget_or_set(cls, key: str, load):
+        """
+        Awaitable version of `get_or_set()`, `load()` returns an awaitable.
+        """
+
+        value = cls.get(key)
+        if value is MISSING:
+            value = await load()
+            cls.set(key, value)
+        return value
+
+    @classmethod
+    def delete(cls, *keys: str):
+        if cls.backend is not None:
+            cls.backend.delete(*keys)
+
+    @classmethod
+    def clear(cls):
+        if cls.backend is not None:
+            cls.backend.clear()
+
+    @classmethod
+    def stats(cls):
+        if cls.backend is None:
+            return {"backend": None}
+        return cls.backend.info()
+
+
+CacheManager()
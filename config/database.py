@@ -1,17 +1,190 @@
+import datetime
+import decimal
 import importlib
+import itertools
+import json
+import logging
 import os
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
 from operator import and_
 from pathlib import Path
 
 from fastapi import HTTPException
-from sqlalchemy import create_engine, URL, MetaData
+from sqlalchemy import create_engine, URL, MetaData, select, insert, update, event, Engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy.orm import sessionmaker, Session, Query
+from sqlalchemy.orm import sessionmaker, scoped_session, Session, Query
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 
 from . import settings
+from .cache import CacheManager
+from .metrics import PoolMetrics, QueryStats, QueryBudgetExceeded
+
+logger = logging.getLogger(__name__)
 
 testing = False
 
+# async drivers used for each database backend when `settings.DATABASE_ASYNC` is enabled
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg"
+}
+
+# Key of the current session scope (e.g. an HTTP request), see `DatabaseManager.session_scope()`.
+# Outside a scope (scripts, tests, the faker) each thread gets its own session.
+_session_scope: ContextVar[object | None] = ContextVar("session_scope", default=None)
+
+
+# The `AsyncSession` of the current scope, see `DatabaseManager.async_session_scope()`.
+_async_scope_session: ContextVar[AsyncSession | None] = ContextVar("async_scope_session", default=None)
+
+
+# Set while a `DatabaseManager.transaction()` is in progress, FastModel writes then flush instead of committing.
+_atomic: ContextVar[bool] = ContextVar("atomic", default=False)
+
+
+# Statements executed in the current `DatabaseManager.track_queries()` block (e.g. the current HTTP request).
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def _current_scope():
+    scope = _session_scope.get()
+    return scope if scope is not None else threading.get_ident()
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Engine "connect" listener, applies `settings.SQLITE_PRAGMAS` to a new sqlite connection.
+    """
+
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Engine "after_cursor_execute" listener, records the statement in the current `QueryStats` and logs it when it
+    is slower than `settings.SLOW_QUERY_MS`.
+
+    The slow query log leaves the parameters out, they can hold password hashes or tokens, and an executemany
+    carries thousands of rows: only their number is logged.
+    """
+
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+
+    slow_query_ms = getattr(settings, "SLOW_QUERY_MS", None)
+    if slow_query_ms is not None and duration * 1000 >= slow_query_ms:
+        if executemany:
+            logger.warning("slow query (%.1fms, executemany of %d rows): %s", duration * 1000, len(parameters),
+                           statement)
+        else:
+            logger.warning("slow query (%.1fms): %s", duration * 1000, statement)
+
+    query_log_file = getattr(settings, "QUERY_LOG_FILE", None)
+    if query_log_file and not executemany:
+        _log_query(query_log_file, statement, parameters, duration)
+
+
+_query_log_lock = threading.Lock()
+
+
+def _redact(value):
+    """
+    A placeholder of the same type as a bound parameter: the query log must not hold password hashes, OTPs or tokens,
+    and the query plans replayed by the index advisor don't depend on the values.
+    """
+
+    if value is None or isinstance(value, (bool, datetime.date, datetime.time)):
+        return value
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return 0
+    return ""
+
+
+def _log_query(path, statement, parameters, duration):
+    """
+    Append a statement to the query log (NDJSON), the input of `python -m config.index_advisor`. The parameters are
+    redacted, see `_redact()`.
+    """
+
+    if isinstance(parameters, dict):
+        parameters = {key: _redact(value) for key, value in parameters.items()}
+    else:
+        parameters = [_redact(value) for value in parameters or ()]
+    line = json.dumps({"statement": statement, "parameters": parameters, "duration_ms": round(duration * 1000, 3)},
+                      default=str)
+    with _query_log_lock, open(path, "a") as file:
+        file.write(line + "\n")
+
+
+def _handle_error(exception_context):
+    # the statement failed, "after_cursor_execute" won't run for it
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+
+def _instrument(engine: Engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class RoutingSession(Session):
+    """
+    A session that sends read-only statements to the read replicas, round-robin, and everything else to the primary.
+
+    Once the session has written something (a flush or a DML statement), it sticks to the primary, so reads that
+    follow a write see it: until the end of the scope for a sticky session scope (a request, see
+    `DatabaseManager.session_scope()`), otherwise until the session is closed (at the end of each FastModel write or
+    `DatabaseManager.transaction()`, in scripts and background threads). Without replicas, everything goes to the
+    primary.
+    """
+
+    @staticmethod
+    def binds(primary: Engine, replicas: list[Engine]):
+        """
+        The session `info` holding the engines to route to, pass it to the sessionmaker.
+        """
+
+        return {"primary": primary, "replicas": itertools.cycle(replicas) if replicas else None}
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replicas = self.info.get("replicas")
+        if replicas is None or self.info.get("wrote"):
+            return self.info["primary"]
+
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info["wrote"] = True
+            return self.info["primary"]
+
+        if getattr(clause, "is_select", False):
+            return next(replicas)
+        return self.info["primary"]
+
+    def close(self):
+        """
+        Close the session, a session that isn't sticky sends its next reads to the replicas again.
+        """
+
+        super().close()
+        if not self.info.get("sticky"):
+            self.info.pop("wrote", None)
+
 
 class DatabaseManager:
     """
@@ -21,8 +194,13 @@ class DatabaseManager:
     tables based on SQLAlchemy models, and providing a session for performing database operations.
 
     Attributes:
-        engine (Engine): The SQLAlchemy engine for the configured database.
-        session (Session): The SQLAlchemy session for database interactions.
+        engine (Engine): The SQLAlchemy engine for the configured (primary) database.
+        replica_engines (list[Engine]): Engines of the read replicas, see `RoutingSession`.
+        session (scoped_session): Registry of SQLAlchemy sessions, call it to get the session of the current scope
+            (the current request, or the current thread outside requests).
+        async_engine (AsyncEngine): The async engine, only set when `settings.DATABASE_ASYNC` is enabled.
+        async_session (async_sessionmaker): Factory of `AsyncSession` bound to `async_engine`.
+        pool_metrics (dict[str, PoolMetrics]): Connection pool statistics of each engine, see `pool_stats()`.
 
     Methods:
         __init__():
@@ -33,6 +211,16 @@ class DatabaseManager:
             Detects 'models.py' files in subdirectories of the 'apps' directory and creates corresponding
             database tables based on SQLAlchemy models.
 
+        session_scope():
+            Context manager that gives the code inside it a session of its own, e.g. one per request.
+
+        async_session_scope():
+            Async version of `session_scope()`, the scope gets an `AsyncSession` too, for the awaitable FastModel
+            methods.
+
+        transaction():
+            Context manager that runs the FastModel writes inside it as a single unit of work, with one commit.
+
     Example Usage:
         db_manager = DatabaseManager()
 
@@ -43,7 +231,11 @@ class DatabaseManager:
         DatabaseManager().create_database_tables()
     """
     engine: create_engine = None
-    session: Session = None
+    replica_engines: list[Engine] = []
+    session: scoped_session[Session] = None
+    async_engine: AsyncEngine | None = None
+    async_session: async_sessionmaker[AsyncSession] | None = None
+    pool_metrics: dict[str, PoolMetrics] = {}
 
     @classmethod
     def __init__(cls):
@@ -51,10 +243,41 @@ class DatabaseManager:
         Initializes the DatabaseManager.
 
         This method creates an SQLAlchemy engine and a session based on the specified database configuration
-        from the 'settings' module.
+        from the 'settings' module. An engine is created for each read replica in `settings.DATABASE_REPLICAS`,
+        and if `settings.DATABASE_ASYNC` is enabled, async engines are created too.
+        """
+        cls.pool_metrics = {}
+        cls.engine = cls.__create_engine(settings.DATABASES, "sync")
+        cls.replica_engines = [
+            cls.__create_engine(replica, f"replica-{index}")
+            for index, replica in enumerate(getattr(settings, "DATABASE_REPLICAS", []))
+        ]
+
+        session = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=cls.engine,
+                               info=RoutingSession.binds(cls.engine, cls.replica_engines))
+        cls.session = scoped_session(session, scopefunc=_current_scope)
+
+        cls.async_engine = None
+        cls.async_session = None
+        if getattr(settings, "DATABASE_ASYNC", False):
+            cls.async_engine = cls.__create_async_engine(cls.engine, "async")
+            async_replicas = [
+                cls.__create_async_engine(engine, f"async-replica-{index}")
+                for index, engine in enumerate(cls.replica_engines)
+            ]
+            cls.async_session = async_sessionmaker(
+                cls.async_engine, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False,
+                info=RoutingSession.binds(cls.async_engine.sync_engine, [e.sync_engine for e in async_replicas])
+            )
+
+    @classmethod
+    def __create_engine(cls, db_config: dict, name: str):
+        """
+        Create the engine of a database configuration, in the `settings.DATABASES` format.
         """
+
         global testing  # Access the global testing flag
-        db_config = settings.DATABASES.copy()
+        db_config = db_config.copy()
         if testing:
             db_config["database"] = "test_" + db_config["database"]
 
@@ -63,13 +286,226 @@ class DatabaseManager:
             db_config["database"] = os.path.join(project_root, db_config["database"])
 
             url = URL.create(**db_config)
-            cls.engine = create_engine(url, connect_args={"check_same_thread": False})
+            engine = create_engine(url, connect_args={"check_same_thread": False}, **cls.__pool_options(name))
+            if getattr(settings, "SQLITE_PERFORMANCE_PROFILE", False):
+                event.listen(engine, "connect", _set_sqlite_pragmas)
         else:
             # for postgres
-            cls.engine = create_engine(URL.create(**db_config))
+            url = URL.create(**db_config)
+            engine = create_engine(url, **cls.__pool_options(name))
+        _instrument(engine)
+        return engine
+
+    @classmethod
+    def __create_async_engine(cls, engine: Engine, name: str):
+        """
+        Create the async engine for the same database as `engine`, by swapping the driver to its async counterpart.
+        """
+
+        url = engine.url
+        backend = url.drivername.split("+")[0]
+        if backend not in ASYNC_DRIVERS:
+            raise ValueError(f"Async mode is not supported for the '{backend}' database.")
+
+        async_engine = create_async_engine(url.set(drivername=ASYNC_DRIVERS[backend]),
+                                           **cls.__pool_options(name, AsyncAdaptedQueuePool))
+        if backend == "sqlite" and getattr(settings, "SQLITE_PERFORMANCE_PROFILE", False):
+            event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        _instrument(async_engine.sync_engine)
+        return async_engine
+
+    @classmethod
+    def __pool_options(cls, name: str, pool_class=QueuePool):
+        """
+        Engine keyword arguments for the pool settings in `settings.DATABASE_POOL`, with a pool class that
+        reports its statistics to `pool_metrics[name]`.
+        """
+
+        metrics = cls.pool_metrics.setdefault(name, PoolMetrics())
+        return {"poolclass": metrics.pool_class(pool_class), **getattr(settings, "DATABASE_POOL", {})}
+
+    @classmethod
+    def pool_stats(cls):
+        """
+        Statistics of each engine's connection pool: checked-out and overflow connections, checkout wait time
+        histogram, timeouts, etc.
+        """
+
+        return {name: metrics.snapshot() for name, metrics in cls.pool_metrics.items()}
+
+    @classmethod
+    def is_async(cls):
+        return cls.async_engine is not None
+
+    @classmethod
+    @contextmanager
+    def session_scope(cls, sticky: bool = True):
+        """
+        Run the code inside the `with` block on a session of its own.
+
+        FastModel methods and services pick the session up through `DatabaseManager.session()`, so concurrent
+        requests don't share an identity map or a connection. The session is closed when the block exits.
+
+        Args:
+            sticky: After a write, send every read of the scope to the primary (read-your-writes for a request).
+                Long-lived scopes (commands, background jobs) pass False, they only stick to it until the session is
+                closed, see `RoutingSession`.
+        """
+
+        token = _session_scope.set(object())
+        try:
+            session = cls.session()
+            session.info["sticky"] = sticky
+            yield session
+        finally:
+            cls.session.remove()
+            _session_scope.reset(token)
+
+    @classmethod
+    @asynccontextmanager
+    async def async_session_scope(cls, sticky: bool = True):
+        """
+        Async version of `session_scope()`: if the async engine is enabled, the scope gets an `AsyncSession` too,
+        shared by the awaitable FastModel methods running in it and closed when the block exits.
+        """
+
+        with cls.session_scope(sticky) as session:
+            if not cls.is_async():
+                yield session
+                return
+
+            async_session = cls.async_session()
+            async_session.sync_session.info["sticky"] = sticky
+            token = _async_scope_session.set(async_session)
+            try:
+                yield session
+            finally:
+                _async_scope_session.reset(token)
+                await async_session.close()
+
+    @classmethod
+    @asynccontextmanager
+    async def async_session_context(cls):
+        """
+        The `AsyncSession` of the current scope, or outside an `async_session_scope()` a new one, closed when the
+        `with` block exits, as `session_context()` does.
+
+        The async and the sync session of a scope stick to the primary together: a read of one follows the writes of
+        the other, see `RoutingSession`.
+        """
+
+        session = _async_scope_session.get() or cls.async_session()
+        sync_session = cls.session()
+        if sync_session.info.get("wrote"):
+            session.sync_session.info["wrote"] = True
+        try:
+            yield session
+        finally:
+            await session.close()
+            if session.sync_session.info.get("wrote"):
+                sync_session.info["wrote"] = True
+
+    @classmethod
+    @contextmanager
+    def transaction(cls):
+        """
+        Run the code inside the `with` block as a single unit of work.
+
+        FastModel writes inside the block are only flushed, so the generated IDs are available right away, and the
+        transaction is committed once when the block exits, or rolled back if it raises. A nested block joins the
+        outer transaction. Instances written in the block stay loaded after the commit (they are not expired).
+
+        Example Usage:
+            with DatabaseManager.transaction():
+                product = Product.create(product_name="Example Product")
+                ProductVariant.bulk_create([{"product_id": product.id, "price": 10}])
+        """
+
+        session = cls.session()
+        if _atomic.get():
+            yield session
+            return
+
+        token = _atomic.set(True)
+        expire_on_commit, session.expire_on_commit = session.expire_on_commit, False
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.expire_on_commit = expire_on_commit
+            _atomic.reset(token)
+            session.close()
+
+    @classmethod
+    @contextmanager
+    def track_queries(cls):
+        """
+        Count and time the SQL statements executed inside the `with` block, on any engine.
+
+        Example Usage:
+            with DatabaseManager.track_queries() as stats:
+                ProductService.retrieve_product(product_id)
+            print(stats.count, stats.duration)
+        """
+
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        try:
+            yield stats
+        finally:
+            _query_stats.reset(token)
+
+    @classmethod
+    def query_stats(cls) -> QueryStats | None:
+        return _query_stats.get()
+
+    @staticmethod
+    def query_budget(max_queries: int):
+        """
+        A route dependency declaring the max number of queries an endpoint is expected to run.
+
+        Going over the budget is logged, or raises `QueryBudgetExceeded` when `settings.QUERY_BUDGET_STRICT` is
+        enabled (as it is in the tests), so N+1 regressions fail loudly.
+
+        Example Usage:
+            @router.get('/{product_id}', dependencies=[Depends(DatabaseManager.query_budget(5))])
+        """
+
+        def budget():
+            stats = _query_stats.get()
+            if stats is not None:
+                stats.budget = max_queries
+
+        return budget
+
+    @classmethod
+    def check_query_budget(cls, stats: QueryStats):
+        if not stats.over_budget():
+            return
+        if getattr(settings, "QUERY_BUDGET_STRICT", False):
+            raise QueryBudgetExceeded(stats.budget_report())
+        logger.warning("query budget exceeded: %s", stats.budget_report())
+
+    @classmethod
+    def in_transaction(cls):
+        return _atomic.get()
+
+    @classmethod
+    @contextmanager
+    def session_context(cls):
+        """
+        The session of the current scope, closed when the `with` block exits, unless a `transaction()` is in progress.
+        """
 
-        session = sessionmaker(autocommit=False, autoflush=False, bind=cls.engine)
-        cls.session = session()
+        session = cls.session()
+        if _atomic.get():
+            yield session
+        else:
+            with session:
+                yield session
 
     @classmethod
     def create_test_database(cls):
@@ -85,6 +521,10 @@ class DatabaseManager:
         cls.__init__()
         DatabaseManager.create_database_tables()
 
+        # the cached rows of a previous test database would be served for the same IDs
+        CacheManager()
+        CacheManager.clear()
+
     @classmethod
     def drop_all_tables(cls):
         """
@@ -95,7 +535,8 @@ class DatabaseManager:
             metadata = MetaData()
             metadata.reflect(bind=cls.engine)
             for table_name, table in metadata.tables.items():
-                table.drop(cls.engine)
+                # checkfirst: dropping a virtual table (e.g. FTS5) drops its shadow tables along with it
+                table.drop(cls.engine, checkfirst=True)
 
     @classmethod
     def create_database_tables(cls):
@@ -150,6 +591,15 @@ class FastModel(DeclarativeBase):
         filter(condition):
             Retrieve records from the database based on a given filter condition.
 
+        bulk_create(rows), bulk_update(rows):
+            Insert or update many records in one round trip and a single commit.
+
+        acreate(**kwargs), aget(pk), aget_or_404(pk), afilter(condition), aupdate(pk, **kwargs), adelete(instance):
+            Awaitable counterparts of the CRUD methods. They run on the async engine when it's enabled
+            (`settings.DATABASE_ASYNC`), on the `AsyncSession` of the current scope if any, see
+            `DatabaseManager.async_session_context()`. Otherwise, or inside a `DatabaseManager.transaction()` (to join
+            it), they call the sync methods.
+
     Example Usage:
         class Product(FastModel):
             ...
@@ -159,6 +609,9 @@ class FastModel(DeclarativeBase):
 
         # Filter products based on a condition
         active_products = Product.filter(Product.status == "active")
+
+        # The same inside a coroutine, without blocking the event loop
+        active_products = await Product.afilter(Product.status == "active")
     """
 
     # TODO update FastModel methods
@@ -181,16 +634,13 @@ class FastModel(DeclarativeBase):
         """
 
         instance = cls(**kwargs)
-        session = DatabaseManager.session
-        try:
-            session.add(instance)
-            session.commit()
-            session.refresh(instance)
-        except Exception:
-            session.rollback()
-            raise
-        finally:
-            session.close()
+        with DatabaseManager.session_context() as session:
+            try:
+                session.add(instance)
+                cls._commit(session, instance)
+            except Exception:
+                cls._rollback(session)
+                raise
         return instance
 
     @classmethod
@@ -205,7 +655,7 @@ class FastModel(DeclarativeBase):
             List of model instances matching the filter condition.
         """
 
-        with DatabaseManager.session as session:
+        with DatabaseManager.session_context() as session:
             query: Query = session.query(cls).filter(condition)
         return query
 
@@ -220,7 +670,7 @@ class FastModel(DeclarativeBase):
         Returns:
             The model instance with the specified primary key, or None if not found
         """
-        with DatabaseManager.session as session:
+        with DatabaseManager.session_context() as session:
             instance = session.get(cls, pk)
         return instance
 
@@ -238,7 +688,7 @@ class FastModel(DeclarativeBase):
         Raises:
             HTTPException(404): If the record is not found.
         """
-        with DatabaseManager.session as session:
+        with DatabaseManager.session_context() as session:
             instance = session.get(cls, pk)
             if not instance:
                 raise HTTPException(status_code=404, detail=f"{cls.__name__} not found")
@@ -259,7 +709,7 @@ class FastModel(DeclarativeBase):
         Raises:
             HTTPException(404): If the record is not found.
         """
-        with DatabaseManager.session as session:
+        with DatabaseManager.session_context() as session:
 
             # Retrieve the object by its primary key or raise a 404 exception
             # instance = session.query(cls).get(pk)
@@ -273,24 +723,209 @@ class FastModel(DeclarativeBase):
 
             try:
                 # Commit the transaction and refresh the instance
-                session.commit()
-                session.refresh(instance)
+                cls._commit(session, instance)
             except Exception:
-                session.rollback()
+                cls._rollback(session)
                 raise
         return instance
 
     @staticmethod
     def delete(instance):
 
-        with DatabaseManager.session as session:
+        with DatabaseManager.session_context() as session:
 
             # destroy
             session.delete(instance)
 
             try:
-                # Commit the transaction and refresh the instance
-                session.commit()
+                # Commit the transaction
+                FastModel._commit(session)
+            except Exception:
+                FastModel._rollback(session)
+                raise
+
+    @classmethod
+    def bulk_create(cls, rows: list[dict], returning: list | None = None) -> list:
+        """
+        Insert many records with a single executemany `INSERT ... RETURNING` and commit the transaction once.
+
+        Args:
+            rows: Dicts of model attributes, one per record.
+            returning: Columns to return for each record, defaults to the primary key.
+
+        Returns:
+            The primary keys of the new records (or rows of the `returning` columns), in the same order as `rows`.
+        """
+
+        if not rows:
+            return []
+
+        columns = returning or cls.__mapper__.primary_key
+        statement = insert(cls).returning(*columns, sort_by_parameter_order=True)
+        with DatabaseManager.session_context() as session:
+            try:
+                result = session.execute(statement, rows)
+                created = result.scalars().all() if returning is None else result.all()
+                cls._commit(session)
+            except Exception:
+                cls._rollback(session)
+                raise
+        return created
+
+    @classmethod
+    def bulk_update(cls, rows: list[dict]) -> list:
+        """
+        Update many records by their primary keys with a single executemany `UPDATE` and commit the transaction once.
+
+        Args:
+            rows: Dicts of model attributes, each one must contain the primary key of the record to update.
+
+        Returns:
+            The primary keys of the updated records.
+        """
+
+        if not rows:
+            return []
+
+        pk = cls.__mapper__.primary_key[0].key
+        with DatabaseManager.session_context() as session:
+            try:
+                session.execute(update(cls), rows)
+                cls._commit(session)
+            except Exception:
+                cls._rollback(session)
+                raise
+        return [row[pk] for row in rows]
+
+    @staticmethod
+    def _rollback(session: Session):
+        """
+        Roll back a failed write. Inside a `DatabaseManager.transaction()` leave it to the transaction, which rolls
+        back the whole unit of work when the error reaches it, a helper must not end it halfway.
+        """
+
+        if not DatabaseManager.in_transaction():
+            session.rollback()
+
+    @staticmethod
+    def _commit(session: Session, instance=None):
+        """
+        Commit the changes and refresh the instance. Inside a `DatabaseManager.transaction()` only flush them,
+        the transaction commits once at its end.
+        """
+
+        if DatabaseManager.in_transaction():
+            session.flush()
+            return
+
+        session.commit()
+        if instance is not None:
+            session.refresh(instance)
+
+    # -------------------------
+    # --- Awaitable methods ---
+    # -------------------------
+
+    @classmethod
+    async def acreate(cls, **kwargs):
+        """
+        Awaitable version of `create()`.
+        """
+
+        if not DatabaseManager.is_async() or DatabaseManager.in_transaction():
+            return cls.create(**kwargs)
+
+        instance = cls(**kwargs)
+        async with DatabaseManager.async_session_context() as session:
+            try:
+                session.add(instance)
+                await session.commit()
+                await session.refresh(instance)
+            except Exception:
+                await session.rollback()
+                raise
+        return instance
+
+    @classmethod
+    async def afilter(cls, condition, *options):
+        """
+        Awaitable version of `filter()`.
+
+        Unlike `filter()` the query is executed right away, because a lazy `Query` can't be awaited later, so the
+        loader options (e.g. `selectinload(...)`) are passed as arguments instead of chained.
+
+        Returns:
+            List of model instances matching the filter condition.
+        """
+
+        if not DatabaseManager.is_async() or DatabaseManager.in_transaction():
+            return cls.filter(condition).options(*options).all()
+
+        async with DatabaseManager.async_session_context() as session:
+            result = await session.scalars(select(cls).filter(condition).options(*options))
+            return list(result.all())
+
+    @classmethod
+    async def aget(cls, pk):
+        """
+        Awaitable version of `get()`.
+        """
+
+        if not DatabaseManager.is_async() or DatabaseManager.in_transaction():
+            return cls.get(pk)
+
+        async with DatabaseManager.async_session_context() as session:
+            return await session.get(cls, pk)
+
+    @classmethod
+    async def aget_or_404(cls, pk):
+        """
+        Awaitable version of `get_or_404()`.
+        """
+
+        instance = await cls.aget(pk)
+        if not instance:
+            raise HTTPException(status_code=404, detail=f"{cls.__name__} not found")
+        return instance
+
+    @classmethod
+    async def aupdate(cls, pk, **kwargs):
+        """
+        Awaitable version of `update()`.
+        """
+
+        if not DatabaseManager.is_async() or DatabaseManager.in_transaction():
+            return cls.update(pk, **kwargs)
+
+        async with DatabaseManager.async_session_context() as session:
+            instance = await session.get(cls, pk)
+            if not instance:
+                raise HTTPException(status_code=404, detail=f"{cls.__name__} not found")
+
+            for key, value in kwargs.items():
+                setattr(instance, key, value)
+
+            try:
+                await session.commit()
+                await session.refresh(instance)
+            except Exception:
+                await session.rollback()
+                raise
+        return instance
+
+    @staticmethod
+    async def adelete(instance):
+        """
+        Awaitable version of `delete()`.
+        """
+
+        if not DatabaseManager.is_async() or DatabaseManager.in_transaction():
+            return FastModel.delete(instance)
+
+        async with DatabaseManager.async_session_context() as session:
+            try:
+                await session.delete(await session.merge(instance))
+                await session.commit()
             except Exception:
-                session.rollback()
+                await session.rollback()
                 raise
@@ -0,0 +1,133 @@
+"""
+Index advisor: replays a captured query log through EXPLAIN, flags the full table scans and suggests an index for them.
+
+Capture the statements the app runs by setting `settings.QUERY_LOG_FILE`, exercise the app (the tests, a load test,
+a staging server, ...), then replay the log against a database with realistic data:
+
+    python -m config.index_advisor queries.ndjson
+
+Each distinct statement is explained once, with the parameters of its first occurrence. The suggested index puts the
+columns compared with `=`/`IN` first, then one range or ORDER BY column, it's a starting point to review, not a
+migration to apply blindly.
+"""
+import argparse
+import json
+import re
+
+from sqlalchemy import Connection
+
+from config.database import DatabaseManager
+
+EXPLAINED_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+def load_queries(path: str) -> list[dict]:
+    """
+    The distinct statements of a query log, with their number of executions and total time, slowest first.
+    """
+
+    queries = {}
+    with open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            statement = " ".join(entry["statement"].split())
+            if not statement.upper().startswith(EXPLAINED_STATEMENTS):
+                continue
+
+            query = queries.setdefault(statement, {
+                "statement": statement, "parameters": entry["parameters"], "count": 0, "total_ms": 0.0
+            })
+            query["count"] += 1
+            query["total_ms"] += entry["duration_ms"]
+    return sorted(queries.values(), key=lambda query: query["total_ms"], reverse=True)
+
+
+def explain(connection: Connection, statement: str, parameters) -> list[str]:
+    """
+    The query plan of a statement, one line per step.
+    """
+
+    if isinstance(parameters, list):
+        parameters = tuple(parameters)
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+        return [row[3] for row in rows]
+    rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters or ())
+    return [row[0] for row in rows]
+
+
+def full_scans(plan: list[str], dialect: str) -> list[str]:
+    """
+    The tables (or aliases) read with a full scan in a query plan.
+    """
+
+    if dialect == "sqlite":
+        pattern = re.compile(r"^SCAN (\w+)$")
+    else:
+        pattern = re.compile(r"Seq Scan on (\w+)")
+    return [match.group(1) for match in map(pattern.search, plan) if match]
+
+
+def suggest_index(statement: str, name: str) -> tuple[str, list[str]]:
+    """
+    The table and the columns of an index for the scan of `name` (a table or an alias) in `statement`.
+    """
+
+    alias = re.search(rf"\b(\w+) AS {name}\b", statement)
+    table = alias.group(1) if alias else name
+
+    where = re.split(r"\bORDER BY\b", statement.split(" WHERE ", 1)[-1] if " WHERE " in statement else "")[0]
+    order_by = statement.split(" ORDER BY ", 1)[1] if " ORDER BY " in statement else ""
+
+    equality = re.findall(rf"\b{name}\.(\w+)\s*(?:=|IN\b|IS\b)", where, flags=re.IGNORECASE)
+    ranges = re.findall(rf"\b{name}\.(\w+)\s*(?:<|>|!=|BETWEEN\b|LIKE\b)", where, flags=re.IGNORECASE)
+    ordering = re.findall(rf"\b{name}\.(\w+)", order_by)
+
+    index = list(dict.fromkeys(equality))
+    for column in (ranges or ordering)[:1]:
+        if column not in index:
+            index.append(column)
+    return table, index
+
+
+def advise(connection: Connection, queries: list[dict]) -> list[dict]:
+    """
+    Explain each query and return the full table scans found, with a suggested index when the statement filters or
+    sorts the scanned table.
+    """
+
+    findings = []
+    for query in queries:
+        plan = explain(connection, query["statement"], query["parameters"])
+        for name in full_scans(plan, connection.dialect.name):
+            table, columns = suggest_index(query["statement"], name)
+            suggestion = None
+            if columns:
+                suggestion = f"CREATE INDEX ix_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+            findings.append({**query, "table": table, "plan": plan, "suggestion": suggestion})
+    return findings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query_log", help="NDJSON file written by settings.QUERY_LOG_FILE")
+    args = parser.parse_args()
+
+    DatabaseManager()
+    with DatabaseManager.engine.connect() as connection:
+        findings = advise(connection, load_queries(args.query_log))
+
+    if not findings:
+        print("No full table scans found.")
+    for finding in findings:
+        print(f"full scan of '{finding['table']}' | {finding['count']} executions, {finding['total_ms']:.1f}ms total")
+        print(f"  {finding['statement']}")
+        for step in finding["plan"]:
+            print(f"  plan: {step}")
+        print(f"  suggestion: {finding['suggestion'] or 'no filter or ordering on the table, an index would not help'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+import weakref
+from collections import Counter
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool
+
+
+class Histogram:
+    """
+    A thread-safe histogram with fixed upper bounds, exported in the cumulative (Prometheus) form.
+
+    Example Usage:
+        histogram = Histogram((0.01, 0.1, 1))
+        histogram.observe(0.05)
+        histogram.to_dict()  # {'buckets': {'0.01': 0, '0.1': 1, '1': 1, '+Inf': 1}, 'count': 1, 'sum': 0.05}
+    """
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+            self.sum += value
+            self.count += 1
+
+    def to_dict(self):
+        with self._lock:
+            buckets, total = {}, 0
+            for bound, count in zip((*map(str, self.buckets), "+Inf"), self.counts):
+                total += count
+                buckets[bound] = total
+            return {"buckets": buckets, "count": self.count, "sum": round(self.sum, 6)}
+
+
+class PoolMetrics:
+    """
+    Collects the connection pool statistics of an engine.
+
+    `pool_class()` returns a subclass of the given pool class that reports to this object, pass it to
+    `create_engine(poolclass=...)`. Since SQLAlchemy recreates the pool with the same class (e.g. on `dispose()`),
+    the metrics survive pool recreation.
+
+    Attributes:
+        wait_time (Histogram): Seconds spent waiting for a connection to be checked out of the pool.
+        timeouts (int): Checkouts that gave up after `pool_timeout` seconds.
+        connects (int): New DBAPI connections opened by the pool.
+        invalidations (int): Connections invalidated, e.g. by `pool_pre_ping` after a database failover.
+    """
+
+    WAIT_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self):
+        self.wait_time = Histogram(self.WAIT_TIME_BUCKETS)
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self._pool = None
+        self._listening = False
+
+    def pool_class(self, base: type[Pool]) -> type[Pool]:
+        metrics = self
+
+        class TimedPool(base):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                metrics.watch(self)
+
+            def _do_get(self):
+                start = time.perf_counter()
+                try:
+                    return super()._do_get()
+                except exc.TimeoutError:
+                    metrics.timeouts += 1
+                    raise
+                finally:
+                    metrics.wait_time.observe(time.perf_counter() - start)
+
+        TimedPool.__name__ = f"Timed{base.__name__}"
+        return TimedPool
+
+    def watch(self, pool: Pool):
+        self._pool = weakref.ref(pool)
+
+        # a recreated pool inherits the listeners of the previous one
+        if self._listening:
+            return
+        self._listening = True
+
+        def on_connect(dbapi_connection, connection_record):
+            self.connects += 1
+
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            self.invalidations += 1
+
+        event.listen(pool, "connect", on_connect)
+        event.listen(pool, "invalidate", on_invalidate)
+
+    def snapshot(self):
+        """
+        Current statistics of the pool, numbers are per process (per uvicorn worker).
+        """
+
+        pool = self._pool() if self._pool else None
+        stats = {
+            "pid": os.getpid(),
+            "pool_class": type(pool).__name__ if pool else None,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "wait_time": self.wait_time.to_dict()
+        }
+        if pool is not None and hasattr(pool, "checkedout"):
+            stats.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0)
+            })
+        return stats
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised in strict mode (`settings.QUERY_BUDGET_STRICT`) when a request runs more queries than its budget.
+    """
+
+
+class QueryStats:
+    """
+    The SQL statements executed in a scope (e.g. an HTTP request), see `DatabaseManager.track_queries()`.
+
+    Attributes:
+        count (int): Number of statements executed.
+        duration (float): Seconds spent executing them, on the database side and in the driver.
+        statements (list[tuple[str, float]]): Each statement with its duration.
+        budget (int | None): Max number of statements the scope is expected to run, see `DatabaseManager.query_budget()`.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+        self.budget = None
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.statements.append((statement, duration))
+
+    def repeated(self):
+        """
+        Statements executed more than once, most repeated first: the usual sign of an N+1 query pattern.
+        """
+
+        counts = Counter(statement for statement, _ in self.statements)
+        return [(statement, count) for statement, count in counts.most_common() if count > 1]
+
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+    def budget_report(self):
+        report = f"{self.count} queries executed, the budget is {self.budget}."
+        for statement, count in self.repeated():
+            report += f"\n  {count}x {' '.join(statement.split())}"
+        return report
+
+    def server_timing(self):
+        """
+        The `Server-Timing` header value, e.g. `db;dur=12.5;desc="4 queries"`.
+        """
+
+        queries = 'query' if self.count == 1 else 'queries'
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} {queries}"'
@@ -0,0 +1,41 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+
+from config.database import DatabaseManager
+
+
+class DatabaseSessionMiddleware:
+    """
+    ASGI middleware that runs each HTTP request in its own database session scope.
+
+    Everything that handles the request (routers, services, FastModel methods) gets the same session from
+    `DatabaseManager.session()`, while concurrent requests get separate sessions and pooled connections. With the
+    async engine enabled, the awaitable FastModel methods share an `AsyncSession` of the request too.
+
+    The queries of the request are tracked too: their number and total time are sent in a `Server-Timing` header,
+    and the query budget of the endpoint, if it declares one, is checked (see `DatabaseManager.query_budget()`).
+    Queries executed after the response has started (e.g. by a streaming response) are not reported.
+
+    Example Usage:
+        app.add_middleware(DatabaseSessionMiddleware)
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async with DatabaseManager.async_session_scope():
+            with DatabaseManager.track_queries() as stats:
+
+                async def send_with_timing(message: Message):
+                    if message["type"] == "http.response.start":
+                        DatabaseManager.check_query_budget(stats)
+                        headers = MutableHeaders(scope=message)
+                        headers.append("Server-Timing", stats.server_timing())
+                    await send(message)
+
+                await self.app(scope, receive, send_with_timing)
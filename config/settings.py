@@ -38,6 +38,112 @@ DATABASES = {
     "database": "fast_store.db"
 }
 
+# Read replicas, in the same format as DATABASES. Read-only queries are spread over them round-robin, writes and the
+# reads that follow a write in the same request go to the primary (DATABASES), see `config.database.RoutingSession`.
+# DATABASE_REPLICAS = [
+#     {
+#         "drivername": "postgresql",
+#         "username": "postgres",
+#         "password": "admin",
+#         "host": "replica-1",
+#         "database": "fast_store",
+#         "port": 5432
+#     }
+# ]
+DATABASE_REPLICAS = []
+
+# Opt-in performance profile for sqlite on single node deployments, these pragmas are applied on every new connection:
+# - journal_mode=WAL: readers don't block the writer and the writer doesn't block readers.
+# - synchronous=NORMAL: with WAL, fsync at checkpoints instead of at every commit (still safe against corruption).
+# - cache_size: page cache per connection, a negative number is in KiB (-64000 = 64MB).
+# - mmap_size: bytes of the database file read through memory-mapped I/O.
+# - temp_store=MEMORY: keep temporary tables and indices in memory.
+# - busy_timeout: milliseconds to wait for a lock, before failing with "database is locked".
+SQLITE_PERFORMANCE_PROFILE = False
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000
+}
+
+# Connection pool of the database engines (QueuePool), size it against the number of uvicorn workers:
+# each worker process has its own pool, so the database sees up to `workers * (pool_size + max_overflow)` connections.
+# - pool_pre_ping: test connections on checkout, to drop the stale ones after a database failover/restart.
+# - pool_recycle: seconds after which a connection is replaced, keep it under the server/proxy idle timeout.
+# - pool_timeout: seconds to wait for a free connection before raising an error.
+DATABASE_POOL = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,
+    "pool_pre_ping": True
+}
+
+# Also build an async engine (aiosqlite for sqlite, asyncpg for postgres), so the awaitable FastModel methods
+# (`acreate`, `aget`, `afilter`, ...) don't block the event loop. When it's False they fall back to the sync engine.
+DATABASE_ASYNC = False
+
+# Every request reports its number of queries and their total time in a `Server-Timing: db;dur=...` header.
+# - SLOW_QUERY_MS: statements slower than this many milliseconds are logged as warnings, None to disable.
+# - QUERY_BUDGET_STRICT: raise an error when an endpoint runs more queries than its declared budget (see
+#   `DatabaseManager.query_budget()`), instead of logging a warning. It's enabled in the tests.
+# - QUERY_LOG_FILE: capture every statement to this file (NDJSON), to replay it with `python -m config.index_advisor`.
+#   The bound parameters are replaced by placeholders of the same type, the log holds no data.
+SLOW_QUERY_MS = 100
+QUERY_BUDGET_STRICT = False
+QUERY_LOG_FILE = None
+
+# ------------------------
+# --- Product Settings ---
+# ------------------------
+
+# Keep a materialized document (the ProductSchema payload) of every product in the `product_documents` table, refreshed
+# by each write, and serve the product reads from it. After enabling it, backfill the documents of the existing
+# products with `python manage.py rebuild-documents`.
+PRODUCT_DOCUMENTS = False
+
+# Encode the product responses with orjson straight from the service output, skipping their re-validation against the
+# `response_model` of the endpoints (see `apps.core.services.responses.FastResponse`). Needs `pip install orjson`.
+FAST_JSON_RESPONSES = False
+
+# Seconds after which the in-memory facet index of a worker (`apps.products.facets`) is rebuilt from the tables, to pick
+# up the writes of the other workers (a worker applies its own writes at once). None never rebuilds it, for a single
+# worker deployment.
+PRODUCT_FACETS_TTL = 60
+
+# Variants of a product, one per combination of its option items:
+# - MAX_PRODUCT_VARIANTS: creating a product whose options generate more variants fails with a 422, None for no limit
+#   (check a matrix first with `POST /products/variants/preview`).
+# - VARIANTS_BATCH_SIZE: rows per multi-row insert while the variants are generated.
+MAX_PRODUCT_VARIANTS = 1000
+VARIANTS_BATCH_SIZE = 500
+
+# Products per transaction of the bulk imports (`POST /products/imports`, `python manage.py import-products`), and per
+# read of the catalog exports (`GET /products/export`, `python manage.py export-products`).
+PRODUCT_IMPORT_BATCH_SIZE = 500
+PRODUCT_EXPORT_BATCH_SIZE = 500
+
+# ----------------------
+# --- Cache Settings ---
+# ----------------------
+
+# Read-through cache of the product reads (a product, its variants and its media), invalidated by the writes.
+# - backend: None (disabled), "memory" (an LRU cache per worker process) or "redis" (a Redis-protocol server shared by
+#   the workers, needs `pip install redis`). A write only invalidates the "memory" cache of its own worker process, so
+#   "memory" is only safe with a single worker: with several workers, the others serve the stale product (and its
+#   stale ETag) until the entry expires. Use "redis" for a multi-worker deployment.
+# - max_entries: size bound of the "memory" backend, the least recently used entries are evicted first.
+# - ttl: seconds an entry lives.
+CACHE = {
+    "backend": None,
+    "max_entries": 10000,
+    "ttl": 60,
+    "url": "redis://localhost:6379/0"
+}
+
 # ----------------------
 # --- Media Settings ---
 # ----------------------
@@ -47,6 +153,9 @@ MEDIA_DIR = BASE_DIR / "media"
 
 # int number as MB
 MAX_FILE_SIZE = 5
+
+# default and max page size of the products list, the client picks the page size with `?limit=`
 products_list_limit = 12
+products_list_max_limit = 100
 
 # TODO add settings to limit register new user or close register
@@ -0,0 +1,94 @@
+import pytest
+
+from config import settings
+from config.cache import LRUCache, CacheManager, MISSING
+
+
+class TestLRUCache:
+
+    def test_hit_and_miss(self):
+        cache = LRUCache(max_entries=10, ttl=60)
+        assert cache.get('key') is MISSING
+
+        cache.set('key', {'value': 1})
+        assert cache.get('key') == {'value': 1}
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 1
+
+    def test_cache_none(self):
+        cache = LRUCache()
+        cache.set('key', None)
+        assert cache.get('key') is None
+
+    def test_eviction(self):
+        cache = LRUCache(max_entries=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')  # 'b' is now the least recently used
+        cache.set('c', 3)
+
+        assert cache.get('b') is MISSING
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert cache.stats.evictions == 1
+
+    def test_expiration(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr('config.cache.time.monotonic', lambda: now[0])
+
+        cache = LRUCache(max_entries=10, ttl=60)
+        cache.set('key', 1)
+        now[0] += 59
+        assert cache.get('key') == 1
+        now[0] += 1
+        assert cache.get('key') is MISSING
+        assert cache.stats.expirations == 1
+
+    def test_invalidation(self):
+        cache = LRUCache()
+        cache.set('a', 1)
+        cache.delete('a', 'missing')
+        assert cache.get('a') is MISSING
+        assert cache.stats.invalidations == 1
+
+    def test_info(self):
+        cache = LRUCache(max_entries=10, ttl=60)
+        cache.set('a', 1)
+        cache.get('a')
+        info = cache.info()
+        assert info['backend'] == 'memory'
+        assert info['entries'] == 1
+        assert info['hit_ratio'] == 1.0
+
+
+class TestCacheManager:
+
+    @classmethod
+    def teardown_class(cls):
+        CacheManager()
+
+    def test_get_or_set(self, monkeypatch):
+        monkeypatch.setitem(settings.CACHE, 'backend', 'memory')
+        CacheManager()
+        CacheManager.clear()
+        calls = []
+
+        def load():
+            calls.append(1)
+            return 'value'
+
+        assert CacheManager.get_or_set('key', load) == 'value'
+        assert CacheManager.get_or_set('key', load) == 'value'
+        assert len(calls) == 1
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setitem(settings.CACHE, 'backend', None)
+        CacheManager()
+        CacheManager.set('key', 'value')
+        assert CacheManager.get('key') is MISSING
+        assert CacheManager.stats() == {'backend': None}
+
+    def test_unknown_backend(self, monkeypatch):
+        monkeypatch.setitem(settings.CACHE, 'backend', 'memcached')
+        with pytest.raises(ValueError):
+            CacheManager()
@@ -0,0 +1,529 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI, HTTPException, Depends
+from fastapi.testclient import TestClient
+from sqlalchemy import exc, text
+
+from apps.products.models import Product, ProductVariant
+from config import settings
+from config.database import DatabaseManager
+from config.metrics import Histogram, QueryBudgetExceeded
+from config.middleware import DatabaseSessionMiddleware
+
+
+class DatabaseTestBase:
+
+    @classmethod
+    def setup_class(cls):
+        DatabaseManager.create_test_database()
+
+    @classmethod
+    def teardown_class(cls):
+        DatabaseManager.drop_all_tables()
+
+
+class TestAsyncModel(DatabaseTestBase):
+    """
+    Test the awaitable FastModel methods on the async engine.
+    """
+
+    @classmethod
+    def setup_class(cls):
+        settings.DATABASE_ASYNC = True
+        super().setup_class()
+
+    @classmethod
+    def teardown_class(cls):
+        super().teardown_class()
+        settings.DATABASE_ASYNC = False
+
+    def test_async_engine(self):
+        assert DatabaseManager.is_async()
+        assert DatabaseManager.async_engine.url.drivername == 'sqlite+aiosqlite'
+        assert DatabaseManager.async_engine.url.database == DatabaseManager.engine.url.database
+
+    @pytest.mark.asyncio
+    async def test_crud(self):
+        product = await Product.acreate(product_name='Async Product', status='active')
+        assert product.id > 0
+        assert product.created_at is not None
+
+        fetched = await Product.aget(product.id)
+        assert fetched.product_name == 'Async Product'
+
+        # --- written by the async engine, visible on the sync one ---
+        assert Product.get(product.id).product_name == 'Async Product'
+
+        products = await Product.afilter(Product.product_name == 'Async Product')
+        assert [p.id for p in products] == [product.id]
+
+        updated = await Product.aupdate(product.id, product_name='Updated Async Product')
+        assert updated.product_name == 'Updated Async Product'
+
+        await Product.adelete(updated)
+        assert await Product.aget(product.id) is None
+
+    @pytest.mark.asyncio
+    async def test_get_or_404(self):
+        with pytest.raises(HTTPException) as e:
+            await Product.aget_or_404(999999999)
+        assert e.value.status_code == 404
+
+
+class TestAsyncFallback(DatabaseTestBase):
+    """
+    Test the awaitable FastModel methods fall back to the sync engine, if async mode is disabled.
+    """
+
+    @pytest.mark.asyncio
+    async def test_crud(self):
+        assert not DatabaseManager.is_async()
+
+        product = await Product.acreate(product_name='Sync Product', status='active')
+        assert (await Product.aget_or_404(product.id)).product_name == 'Sync Product'
+        assert len(await Product.afilter(Product.id == product.id)) == 1
+
+        await Product.aupdate(product.id, product_name='Updated Sync Product')
+        assert Product.get(product.id).product_name == 'Updated Sync Product'
+
+
+class TestSessionScope(DatabaseTestBase):
+    """
+    Test each scope (request) and each thread outside scopes get a session of their own.
+    """
+
+    def test_same_scope_same_session(self):
+        with DatabaseManager.session_scope() as session:
+            assert DatabaseManager.session() is session
+            assert DatabaseManager.session() is DatabaseManager.session()
+
+    def test_scopes_are_isolated(self):
+        outer = DatabaseManager.session()
+        with DatabaseManager.session_scope() as first:
+            with DatabaseManager.session_scope() as second:
+                assert second is not first
+            assert DatabaseManager.session() is first
+        assert first is not outer
+        assert DatabaseManager.session() is outer
+
+    def test_parallel_scopes(self):
+        product = Product.create(product_name='Scoped Product', status='active')
+
+        def read(_):
+            with DatabaseManager.session_scope() as session:
+                assert Product.get(product.id).product_name == 'Scoped Product'
+                return id(session)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            sessions = list(executor.map(read, range(32)))
+        assert len(set(sessions)) > 1
+
+    def test_middleware(self):
+        app = FastAPI()
+        app.add_middleware(DatabaseSessionMiddleware)
+        sessions = []
+
+        @app.get('/')
+        async def index():
+            sessions.append(DatabaseManager.session())
+            assert DatabaseManager.session() is sessions[-1]
+
+        client = TestClient(app)
+        client.get('/')
+        client.get('/')
+        assert sessions[0] is not sessions[1]
+
+
+class TestPool(DatabaseTestBase):
+    """
+    Test the pool settings are applied and the pool statistics.
+    """
+
+    pool_settings = {"pool_size": 1, "max_overflow": 0, "pool_timeout": 0.1, "pool_recycle": 600, "pool_pre_ping": True}
+
+    @classmethod
+    def setup_class(cls):
+        cls.default_pool_settings = settings.DATABASE_POOL
+        settings.DATABASE_POOL = cls.pool_settings
+        super().setup_class()
+
+    @classmethod
+    def teardown_class(cls):
+        super().teardown_class()
+        settings.DATABASE_POOL = cls.default_pool_settings
+
+    def test_pool_settings(self):
+        pool = DatabaseManager.engine.pool
+        assert pool.size() == 1
+        assert pool._max_overflow == 0
+        assert pool._timeout == 0.1
+        assert pool._recycle == 600
+        assert pool._pre_ping is True
+
+    def test_pool_stats(self):
+        DatabaseManager.engine.dispose()
+        with DatabaseManager.engine.connect():
+            stats = DatabaseManager.pool_stats()['sync']
+            assert stats['checked_out'] == 1
+            assert stats['overflow'] == 0
+            assert stats['wait_time']['count'] >= 1
+
+            # --- the only connection is checked out ---
+            with pytest.raises(exc.TimeoutError):
+                DatabaseManager.engine.connect()
+
+        stats = DatabaseManager.pool_stats()['sync']
+        assert stats['checked_out'] == 0
+        assert stats['timeouts'] == 1
+        assert stats['wait_time']['buckets']['+Inf'] == stats['wait_time']['count']
+
+    def test_histogram(self):
+        histogram = Histogram((0.01, 0.1, 1))
+        for value in (0.005, 0.05, 0.5, 5):
+            histogram.observe(value)
+
+        expected = histogram.to_dict()
+        assert expected['buckets'] == {'0.01': 1, '0.1': 2, '1': 3, '+Inf': 4}
+        assert expected['count'] == 4
+        assert expected['sum'] == 5.555
+
+
+class TestBulk(DatabaseTestBase):
+    """
+    Test multi-row insert and update of FastModel.
+    """
+
+    def test_bulk_create(self):
+        rows = [{'product_name': f'Bulk Product {i}', 'status': 'active'} for i in range(50)]
+        ids = Product.bulk_create(rows)
+
+        assert len(ids) == 50
+        assert ids == sorted(ids)
+        for pk, row in zip(ids, rows):
+            assert Product.get(pk).product_name == row['product_name']
+
+    def test_bulk_create_returning(self):
+        product = Product.create(product_name='Bulk Variants', status='active')
+        rows = [{'product_id': product.id, 'price': i, 'stock': i} for i in range(3)]
+        created = ProductVariant.bulk_create(rows, returning=[ProductVariant.id, ProductVariant.stock])
+
+        assert [row.stock for row in created] == [0, 1, 2]
+        assert all(row.id > 0 for row in created)
+
+    def test_bulk_create_empty(self):
+        assert Product.bulk_create([]) == []
+
+    def test_bulk_update(self):
+        ids = Product.bulk_create([{'product_name': f'Product {i}', 'status': 'active'} for i in range(5)])
+        updated = Product.bulk_update([{'id': pk, 'product_name': f'Updated {pk}'} for pk in ids])
+
+        assert updated == ids
+        for pk in ids:
+            assert Product.get(pk).product_name == f'Updated {pk}'
+
+
+class TestTransaction(DatabaseTestBase):
+    """
+    Test FastModel writes inside `DatabaseManager.transaction()` commit once, or not at all.
+    """
+
+    def test_commit(self):
+        with DatabaseManager.transaction():
+            product = Product.create(product_name='Atomic Product', status='active')
+            assert product.id > 0
+            ids = ProductVariant.bulk_create([{'product_id': product.id, 'price': 1, 'stock': 1}])
+
+        # --- instances stay loaded after the commit ---
+        assert product.product_name == 'Atomic Product'
+        assert ProductVariant.get(ids[0]).product_id == product.id
+
+    def test_rollback(self):
+        with pytest.raises(ValueError):
+            with DatabaseManager.transaction():
+                product = Product.create(product_name='Rolled Back Product', status='active')
+                ProductVariant.bulk_create([{'product_id': product.id, 'price': 1, 'stock': 1}])
+                raise ValueError
+
+        assert Product.filter(Product.product_name == 'Rolled Back Product').count() == 0
+        assert ProductVariant.filter(ProductVariant.product_id == product.id).count() == 0
+
+    def test_nested(self):
+        with pytest.raises(ValueError):
+            with DatabaseManager.transaction():
+                with DatabaseManager.transaction():
+                    Product.create(product_name='Nested Product', status='active')
+                assert DatabaseManager.in_transaction()
+                raise ValueError
+
+        assert not DatabaseManager.in_transaction()
+        assert Product.filter(Product.product_name == 'Nested Product').count() == 0
+
+    def test_caught_error_does_not_split_the_transaction(self):
+        with pytest.raises(exc.SQLAlchemyError):
+            with DatabaseManager.transaction():
+                Product.create(product_name='Partial Product', status='active')
+                try:
+                    ProductVariant.create(id=1, price=1, stock=1)
+                    ProductVariant.create(id=1, price=1, stock=1)
+                except exc.IntegrityError:
+                    pass  # the failed write isn't rolled back by the helper, the transaction can't go on
+                Product.create(product_name='Partial Product 2', status='active')
+
+        assert Product.filter(Product.product_name.like('Partial Product%')).count() == 0
+
+
+class TestSqlitePerformanceProfile(DatabaseTestBase):
+    """
+    Test the sqlite pragmas are applied on new connections when the performance profile is enabled.
+    """
+
+    @classmethod
+    def setup_class(cls):
+        settings.SQLITE_PERFORMANCE_PROFILE = True
+        super().setup_class()
+
+    @classmethod
+    def teardown_class(cls):
+        with DatabaseManager.engine.connect() as connection:
+            connection.execute(text("PRAGMA journal_mode = DELETE"))
+        super().teardown_class()
+        settings.SQLITE_PERFORMANCE_PROFILE = False
+
+    def test_pragmas(self):
+        with DatabaseManager.engine.connect() as connection:
+            assert connection.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+            assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert connection.execute(text("PRAGMA cache_size")).scalar() == settings.SQLITE_PRAGMAS['cache_size']
+            assert connection.execute(text("PRAGMA temp_store")).scalar() == 2  # MEMORY
+            assert connection.execute(text("PRAGMA busy_timeout")).scalar() == settings.SQLITE_PRAGMAS['busy_timeout']
+
+    def test_write_and_read(self):
+        product = Product.create(product_name='WAL Product', status='active')
+        assert Product.get(product.id).product_name == 'WAL Product'
+
+
+class TestReadReplicas(DatabaseTestBase):
+    """
+    Test read-only queries are routed to the replicas, and writes (and the reads that follow them) to the primary.
+
+    The replica is a second sqlite file that doesn't replicate anything, so the data it returns tells where a query
+    was sent.
+    """
+
+    @classmethod
+    def setup_class(cls):
+        settings.DATABASE_REPLICAS = [{"drivername": "sqlite", "database": "fast_store_replica.db"}]
+        super().setup_class()
+        replica = DatabaseManager.replica_engines[0]
+        Product.metadata.create_all(bind=replica)
+        with replica.begin() as connection:
+            connection.execute(Product.__table__.insert(), {"product_name": "Replica Product", "status": "active"})
+
+    @classmethod
+    def teardown_class(cls):
+        Product.metadata.drop_all(bind=DatabaseManager.replica_engines[0])
+        settings.DATABASE_REPLICAS = []
+        super().teardown_class()
+
+    def test_replica_engines(self):
+        assert len(DatabaseManager.replica_engines) == 1
+        assert DatabaseManager.replica_engines[0].url.database.endswith('test_fast_store_replica.db')
+        assert 'replica-0' in DatabaseManager.pool_stats()
+
+    def test_reads_go_to_replica(self):
+        with DatabaseManager.session_scope():
+            assert Product.filter(Product.product_name == 'Replica Product').count() == 1
+
+    def test_writes_go_to_primary(self):
+        with DatabaseManager.session_scope():
+            product = Product.create(product_name='Primary Product', status='active')
+
+            # read-your-writes: the rest of the scope reads from the primary
+            assert Product.get(product.id).product_name == 'Primary Product'
+            assert Product.filter(Product.product_name == 'Replica Product').count() == 0
+
+        with DatabaseManager.session_scope():
+            assert Product.filter(Product.product_name == 'Primary Product').count() == 0
+
+    def test_not_sticky_after_commit(self):
+        with DatabaseManager.session_scope(sticky=False):
+            Product.create(product_name='Committed Product', status='active')
+
+            # the write is committed, the next reads go to the replica again
+            assert Product.filter(Product.product_name == 'Committed Product').count() == 0
+            assert Product.filter(Product.product_name == 'Replica Product').count() == 1
+
+    def test_thread_session_after_commit(self):
+        # outside a scope (scripts, threads) the session of the thread is never removed
+        Product.create(product_name='Thread Product', status='active')
+        assert Product.filter(Product.product_name == 'Replica Product').count() == 1
+        DatabaseManager.session.remove()
+
+    def test_transaction_goes_to_primary(self):
+        with DatabaseManager.session_scope():
+            with DatabaseManager.transaction():
+                product = Product.create(product_name='Atomic Product', status='active')
+                assert Product.filter(Product.id == product.id).count() == 1
+
+    def test_get_bind(self):
+        with DatabaseManager.session_scope() as session:
+            assert session.get_bind(clause=Product.__table__.select()) is DatabaseManager.replica_engines[0]
+            session.info["replicas"] = None
+            assert session.get_bind(clause=Product.__table__.select()) is DatabaseManager.engine
+
+
+class TestAsyncReadReplicas(DatabaseTestBase):
+    """
+    Test the awaitable FastModel methods share the session scope: its `AsyncSession`, its stickiness to the primary
+    after a write, and its transaction.
+    """
+
+    @classmethod
+    def setup_class(cls):
+        settings.DATABASE_ASYNC = True
+        settings.DATABASE_REPLICAS = [{"drivername": "sqlite", "database": "fast_store_replica.db"}]
+        super().setup_class()
+        replica = DatabaseManager.replica_engines[0]
+        Product.metadata.create_all(bind=replica)
+        with replica.begin() as connection:
+            connection.execute(Product.__table__.insert(), {"product_name": "Replica Product", "status": "active"})
+
+    @classmethod
+    def teardown_class(cls):
+        Product.metadata.drop_all(bind=DatabaseManager.replica_engines[0])
+        settings.DATABASE_REPLICAS = []
+        settings.DATABASE_ASYNC = False
+        super().teardown_class()
+
+    @pytest.mark.asyncio
+    async def test_reads_go_to_replica(self):
+        async with DatabaseManager.async_session_scope():
+            assert len(await Product.afilter(Product.product_name == 'Replica Product')) == 1
+
+    @pytest.mark.asyncio
+    async def test_scope_session(self):
+        async with DatabaseManager.async_session_scope():
+            async with DatabaseManager.async_session_context() as first:
+                pass
+            async with DatabaseManager.async_session_context() as second:
+                assert second is first
+
+        async with DatabaseManager.async_session_context() as session:
+            assert session is not first
+
+    @pytest.mark.asyncio
+    async def test_async_write_sticks_to_primary(self):
+        async with DatabaseManager.async_session_scope():
+            product = await Product.acreate(product_name='Async Primary Product', status='active')
+
+            # read-your-writes, on both sessions of the scope
+            assert (await Product.aget(product.id)).product_name == 'Async Primary Product'
+            assert len(await Product.afilter(Product.product_name == 'Replica Product')) == 0
+            assert Product.filter(Product.product_name == 'Replica Product').count() == 0
+
+        async with DatabaseManager.async_session_scope():
+            assert len(await Product.afilter(Product.product_name == 'Async Primary Product')) == 0
+
+    @pytest.mark.asyncio
+    async def test_sync_write_sticks_to_primary(self):
+        async with DatabaseManager.async_session_scope():
+            product = Product.create(product_name='Sync Primary Product', status='active')
+            assert len(await Product.afilter(Product.id == product.id)) == 1
+
+    @pytest.mark.asyncio
+    async def test_not_sticky(self):
+        async with DatabaseManager.async_session_scope(sticky=False):
+            await Product.acreate(product_name='Async Committed Product', status='active')
+            assert len(await Product.afilter(Product.product_name == 'Async Committed Product')) == 0
+
+    @pytest.mark.asyncio
+    async def test_transaction(self):
+        async with DatabaseManager.async_session_scope():
+            with pytest.raises(ValueError):
+                with DatabaseManager.transaction():
+                    product = await Product.acreate(product_name='Async Atomic Product', status='active')
+                    assert len(await Product.afilter(Product.id == product.id)) == 1
+                    raise ValueError
+
+        assert Product.filter(Product.product_name == 'Async Atomic Product').count() == 0
+
+
+class TestQueryInstrumentation(DatabaseTestBase):
+    """
+    Test the queries are counted, timed and checked against the endpoint budgets.
+    """
+
+    @classmethod
+    def setup_class(cls):
+        super().setup_class()
+        cls.product = Product.create(product_name='Counted Product', status='active')
+
+        app = FastAPI()
+        app.add_middleware(DatabaseSessionMiddleware)
+
+        @app.get('/products/{product_id}', dependencies=[Depends(DatabaseManager.query_budget(2))])
+        async def retrieve(product_id: int, repeat: int = 1):
+            for _ in range(repeat):
+                Product.get(product_id)
+            return {'product_id': product_id}
+
+        cls.client = TestClient(app)
+
+    def test_track_queries(self):
+        with DatabaseManager.track_queries() as stats:
+            Product.get(self.product.id)
+            Product.filter(Product.id == self.product.id).count()
+            assert DatabaseManager.query_stats() is stats
+
+        assert stats.count == 2
+        assert stats.duration > 0
+        assert DatabaseManager.query_stats() is None
+
+    def test_repeated(self):
+        with DatabaseManager.track_queries() as stats:
+            for _ in range(3):
+                Product.get(self.product.id)
+
+        assert len(stats.repeated()) == 1
+        assert stats.repeated()[0][1] == 3
+
+    def test_slow_query_log(self, caplog, monkeypatch):
+        monkeypatch.setattr(settings, 'SLOW_QUERY_MS', 0)
+        Product.get(self.product.id)
+        assert any('slow query' in record.message for record in caplog.records)
+
+    def test_slow_query_log_parameters(self, caplog, monkeypatch):
+        monkeypatch.setattr(settings, 'SLOW_QUERY_MS', 0)
+        Product.filter(Product.product_name == 'secret-value').count()
+        Product.bulk_create([{'product_name': f'secret-{index}', 'status': 'draft'} for index in range(3)])
+
+        messages = [record.message for record in caplog.records if 'slow query' in record.message]
+        assert not any('secret' in message for message in messages)
+        assert any('executemany of 3 rows' in message for message in messages)
+
+    def test_failed_statement(self):
+        with DatabaseManager.track_queries() as stats:
+            with pytest.raises(exc.OperationalError):
+                with DatabaseManager.engine.connect() as connection:
+                    connection.execute(text("SELECT * FROM missing_table"))
+            Product.get(self.product.id)
+
+        assert stats.count == 1
+
+    def test_server_timing_header(self):
+        response = self.client.get(f'/products/{self.product.id}')
+        assert response.status_code == 200
+        assert response.headers['server-timing'].startswith('db;dur=')
+        assert response.headers['server-timing'].endswith('desc="1 query"')
+
+    def test_budget_exceeded_strict(self, monkeypatch):
+        monkeypatch.setattr(settings, 'QUERY_BUDGET_STRICT', True)
+        with pytest.raises(QueryBudgetExceeded, match='3 queries executed, the budget is 2'):
+            self.client.get(f'/products/{self.product.id}', params={'repeat': 3})
+
+    def test_budget_exceeded_warning(self, caplog, monkeypatch):
+        monkeypatch.setattr(settings, 'QUERY_BUDGET_STRICT', False)
+        response = self.client.get(f'/products/{self.product.id}', params={'repeat': 3})
+        assert response.status_code == 200
+        assert any('query budget exceeded' in record.message for record in caplog.records)
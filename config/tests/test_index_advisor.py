@@ -0,0 +1,90 @@
+import json
+
+from apps.products.models import Product, ProductVariant
+from config import settings
+from config.database import DatabaseManager
+from config.index_advisor import load_queries, advise, suggest_index, full_scans
+
+
+class TestIndexAdvisor:
+    """
+    Test the query log capture and its replay through EXPLAIN QUERY PLAN.
+    """
+
+    @classmethod
+    def setup_class(cls):
+        DatabaseManager.create_test_database()
+
+    @classmethod
+    def teardown_class(cls):
+        DatabaseManager.drop_all_tables()
+
+    def capture(self, tmp_path, monkeypatch, *conditions):
+        query_log = tmp_path / 'queries.ndjson'
+        monkeypatch.setattr(settings, 'QUERY_LOG_FILE', str(query_log))
+        for model, condition in conditions:
+            model.filter(condition).all()
+        monkeypatch.setattr(settings, 'QUERY_LOG_FILE', None)
+        return str(query_log)
+
+    def test_query_log(self, tmp_path, monkeypatch):
+        query_log = self.capture(tmp_path, monkeypatch, (Product, Product.product_name == 'Logged Product'))
+
+        with open(query_log) as file:
+            entry = json.loads(file.readline())
+        assert entry['statement'].startswith('SELECT')
+        assert entry['parameters'] == ['']  # redacted
+        assert entry['duration_ms'] >= 0
+
+    def test_query_log_is_redacted(self, tmp_path, monkeypatch):
+        query_log = self.capture(tmp_path, monkeypatch,
+                                 (Product, (Product.product_name == 'secret-hash') & (Product.id > 41)))
+
+        with open(query_log) as file:
+            line = file.readline()
+        assert 'secret' not in line
+        assert json.loads(line)['parameters'] == ['', 0]
+
+    def test_full_scan(self, tmp_path, monkeypatch):
+        query_log = self.capture(tmp_path, monkeypatch, (Product, Product.product_name == 'Scanned Product'))
+
+        with DatabaseManager.engine.connect() as connection:
+            findings = advise(connection, load_queries(query_log))
+
+        assert len(findings) == 1
+        assert findings[0]['table'] == 'products'
+        assert findings[0]['suggestion'] == 'CREATE INDEX ix_products_product_name ON products (product_name)'
+
+    def test_indexed_lookups(self, tmp_path, monkeypatch):
+        query_log = self.capture(
+            tmp_path, monkeypatch,
+            (Product, Product.status == 'active'),
+            (ProductVariant, ProductVariant.product_id == 1)
+        )
+
+        with DatabaseManager.engine.connect() as connection:
+            assert advise(connection, load_queries(query_log)) == []
+
+    def test_load_queries(self, tmp_path, monkeypatch):
+        query_log = self.capture(
+            tmp_path, monkeypatch,
+            *[(Product, Product.id == product_id) for product_id in range(3)]
+        )
+
+        queries = load_queries(query_log)
+        assert len(queries) == 1
+        assert queries[0]['count'] == 3
+
+    def test_suggest_index(self):
+        statement = ("SELECT p.id FROM product_variants AS p WHERE p.product_id = ? AND p.stock > ? "
+                     "ORDER BY p.price")
+        assert suggest_index(statement, 'p') == ('product_variants', ['product_id', 'stock'])
+
+        statement = "SELECT products.id FROM products WHERE products.status = ? ORDER BY products.created_at DESC"
+        assert suggest_index(statement, 'products') == ('products', ['status', 'created_at'])
+
+    def test_full_scans(self):
+        plan = ['SCAN products', 'SEARCH product_variants USING INDEX ix_product_variants_product_id (product_id=?)',
+                'SCAN product_media USING INDEX ix_product_media_product_id']
+        assert full_scans(plan, 'sqlite') == ['products']
+        assert full_scans(['Seq Scan on products  (cost=0.00..1.01 rows=1 width=4)'], 'postgresql') == ['products']
@@ -0,0 +1,14 @@
+import pytest
+
+from config import settings
+
+
+@pytest.fixture(scope='session', autouse=True)
+def strict_query_budget():
+    """
+    Fail the tests of any endpoint that runs more queries than its declared budget.
+    """
+
+    settings.QUERY_BUDGET_STRICT = True
+    yield
+    settings.QUERY_BUDGET_STRICT = False
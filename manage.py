@@ -0,0 +1,101 @@
+"""
+Management commands of the app.
+
+Usage:
+    python manage.py rebuild-documents [--batch-size 500]
+    python manage.py rebuild-search-index
+    python manage.py import-products catalog.ndjson [--format ndjson|csv] [--batch-size 500]
+    python manage.py export-products catalog.ndjson.gz [--format ndjson|csv] [--gzip] [--status active]
+"""
+import argparse
+
+from config import settings
+from config.database import DatabaseManager
+
+
+def rebuild_documents(args):
+    from apps.products.services import ProductService
+
+    if not settings.PRODUCT_DOCUMENTS:
+        print("settings.PRODUCT_DOCUMENTS is disabled, the documents would not be used. Rebuilding them anyway.")
+    settings.PRODUCT_DOCUMENTS = True
+    count = ProductService.rebuild_documents(batch_size=args.batch_size)
+    print(f"{count} product documents rebuilt.")
+
+
+def rebuild_search_index(args):
+    from apps.products.search import ProductSearch
+
+    count = ProductSearch.rebuild()
+    print(f"{count} products indexed.")
+
+
+def import_products(args):
+    from fastapi import HTTPException
+
+    from apps.products.imports import ProductImport
+
+    def progress(job):
+        print(f"{job.processed} rows read, {job.created} products created, {job.failed} rows rejected")
+
+    try:
+        file_format = ProductImport.detect_format(args.file, args.format)
+    except HTTPException as e:
+        raise SystemExit(e.detail)
+    with open(args.file, "rb") as file:
+        job = ProductImport.run(file, file_format, batch_size=args.batch_size, on_progress=progress)
+
+    for error in job.errors:
+        print(f"row {error['row']}: {'; '.join(error['errors'])}")
+    if job.status == "failed":
+        raise SystemExit(f"Import failed: {job.detail}")
+    print(f"{job.created} products imported, {job.failed} rows rejected.")
+
+
+def export_products(args):
+    from apps.products.exports import ProductExport
+
+    file_format = args.format or ("csv" if ".csv" in args.file else "ndjson")
+    compress = args.gzip or args.file.endswith(".gz")
+    size = 0
+    with open(args.file, "wb") as file:
+        for chunk in ProductExport.stream(file_format, compress=compress, status=args.status,
+                                          batch_size=args.batch_size):
+            file.write(chunk)
+            size += len(chunk)
+    print(f"Catalog exported to {args.file} ({size} bytes).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("rebuild-documents", help="backfill or repair the materialized product documents")
+    command.add_argument("--batch-size", type=int, default=500, help="products per transaction")
+    command.set_defaults(handler=rebuild_documents)
+
+    command = commands.add_parser("rebuild-search-index", help="backfill or repair the full-text index of the products")
+    command.set_defaults(handler=rebuild_search_index)
+
+    command = commands.add_parser("import-products", help="bulk import products from an NDJSON or CSV file")
+    command.add_argument("file", help="path of the file to import")
+    command.add_argument("--format", choices=["ndjson", "csv"], help="defaults to the file extension")
+    command.add_argument("--batch-size", type=int, default=None, help="products per transaction")
+    command.set_defaults(handler=import_products)
+
+    command = commands.add_parser("export-products", help="export the catalog to an NDJSON or CSV file")
+    command.add_argument("file", help="path of the file to write, gzipped if it ends with .gz")
+    command.add_argument("--format", choices=["ndjson", "csv"], help="defaults to the file extension")
+    command.add_argument("--gzip", action="store_true", help="gzip the file")
+    command.add_argument("--status", help="only export the products of this status")
+    command.add_argument("--batch-size", type=int, default=None, help="products per read")
+    command.set_defaults(handler=export_products)
+
+    args = parser.parse_args()
+    DatabaseManager().create_database_tables()
+    with DatabaseManager.session_scope(sticky=False):
+        args.handler(args)
+
+
+if __name__ == "__main__":
+    main()